@@ -1,5 +1,8 @@
 import argparse
+import hashlib
 import json
+import os
+import random
 from pathlib import Path
 import sys
 ROOT = Path(__file__).resolve().parents[1]
@@ -11,10 +14,14 @@ from agent.core.memory import MemoryStore
 from agent.core.planner import Planner
 from agent.core.navigator import Navigator
 from agent.core.executor import Executor
+from agent.core.events import CollectSink, JsonlSink
 from agent.core.reporter import Reporter
-from agent.core.llm import configure as llm_configure
+from agent.core.llm import configure as llm_configure, set_cache as llm_set_cache
+from agent.core.llm_cache import CacheMiss, ResponseCache
 from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from agent.core.charts import metrics_to_svg
+from agent.core import trace
 
 def load_grid(path: Path):
     with path.open("r", encoding="utf-8") as f:
@@ -28,23 +35,50 @@ def load_config(path: Path):
     with path.open("r", encoding="utf-8") as f:
         return json.load(f)
 
+def configure_llm(api_key, base_url, config: dict, cache_mode: str = None, cache_dir: str = None):
+    lc = config.get('llm', {})
+    if api_key and base_url:
+        llm_configure(api_key, base_url, max_concurrency=lc.get('max_concurrency'),
+                      timeout=lc.get('timeout_s'), retries=lc.get('retries'))
+    mode = cache_mode or lc.get('cache', 'off')
+    root = Path(cache_dir or lc.get('cache_dir', 'cache/llm'))
+    if not root.is_absolute():
+        root = ROOT / root
+    llm_set_cache(ResponseCache(root, mode, lc.get('cache_max_entries', 5000), lc.get('cache_max_mb', 64) << 20) if mode != 'off' else None)
+
+def load_distances(root: Path, navigator, locations):
+    from agent.core.distances import LocationDistances
+    return LocationDistances(root / 'maps' / 'distances.json', navigator.costmap, locations)
+
+def optimize_order(plan: dict, locations: dict, config: dict, distances):
+    from agent.core.ordering import optimize_plan_order
+    oc = config.get('order_opt', {})
+    if not oc.get('enabled', True):
+        return plan
+    return optimize_plan_order(plan, locations, config.get('start', {'x':0,'y':0}), distances,
+                               exact_max=oc.get('exact_max', 11), time_budget=oc.get('time_budget_ms', 200) / 1000.0)
+
 def cmd_show_plan(args):
     root = ROOT
     grid = load_grid(root / 'maps' / 'grid.json')
     locations = load_locations(root / 'maps' / 'locations.json')
     config = load_config(root / 'config.json')
-    if getattr(args, 'api_key', None) and getattr(args, 'base_url', None):
-        llm_configure(args.api_key, args.base_url)
-    memory = MemoryStore(root / 'memory')
+    configure_llm(args.api_key, args.base_url, config, args.llm_cache, args.llm_cache_dir)
+    memory = MemoryStore(root / 'memory', config.get('memory'))
     memory_ctx = memory.retrieve(args.task, locations, k=5)
+    navigator = Navigator(grid, memory.semantic, mode=config.get('route_mode', 'astar'), hpa_store=root / 'maps' / 'hpa.json')
+    distances = load_distances(root, navigator, locations)
     planner = Planner()
     try:
         plan = planner.plan(args.task, memory_ctx, locations, config)
+    except CacheMiss:
+        raise
     except Exception as e:
         from agent.core.baselines import plan_greedy_distance
-        plan = plan_greedy_distance(args.task, locations, config.get('start', {'x':0,'y':0}))
+        plan = plan_greedy_distance(args.task, locations, config.get('start', {'x':0,'y':0}), distances=distances)
         console = Console()
         console.print(f"[yellow]LLM unavailable, using baseline greedy distance[/yellow]")
+    plan = optimize_order(plan, locations, config, distances)
     out_dir = root / 'out'
     out_dir.mkdir(parents=True, exist_ok=True)
     with (out_dir / 'plan.json').open('w', encoding='utf-8') as f:
@@ -56,6 +90,10 @@ def cmd_show_plan(args):
         table.add_row(s.get('type',''), s.get('target',''))
     console = Console()
     console.print(table)
+    oo = plan.get('order_opt')
+    if oo:
+        from agent.core.ordering import describe_order_opt
+        console.print(f"Order ({oo['method']}): {describe_order_opt(oo)}")
     console.print('Plan saved at ' + str(out_dir / 'plan.json'))
 
 def cmd_run(args):
@@ -63,10 +101,12 @@ def cmd_run(args):
     grid = load_grid(root / 'maps' / 'grid.json')
     locations = load_locations(root / 'maps' / 'locations.json')
     config = load_config(root / 'config.json')
-    if getattr(args, 'api_key', None) and getattr(args, 'base_url', None):
-        llm_configure(args.api_key, args.base_url)
-    memory = MemoryStore(root / 'memory')
+    configure_llm(args.api_key, args.base_url, config, args.llm_cache, args.llm_cache_dir)
+    run_trace = trace.start('run') if args.trace or args.trace_chrome else None
+    memory = MemoryStore(root / 'memory', config.get('memory'))
     memory_ctx = memory.retrieve(args.task, locations, k=5)
+    navigator = Navigator(grid, memory.semantic, mode=config.get('route_mode', 'astar'), hpa_store=root / 'maps' / 'hpa.json')
+    distances = load_distances(root, navigator, locations)
     planner = Planner()
     try:
         plan = planner.plan(args.task, memory_ctx, locations, config)
@@ -74,16 +114,121 @@ def cmd_run(args):
         console = Console()
         console.print(f"[red]Planner error:[/red] {e}")
         console.print("[yellow]Hint:[/yellow] provide --api_key and --base_url to enable LLM planning")
+        trace.stop()
         return
-    navigator = Navigator(grid, memory.semantic)
-    executor = Executor(navigator, memory)
-    trajectory, logs = executor.run(plan, locations, config)
+    with trace.span('order.optimize'):
+        plan = optimize_order(plan, locations, config, distances)
+    # reflection runs while the report is written; close() waits for it
+    executor = Executor(navigator, memory, reflect='background')
+    collect = CollectSink()
+    sinks = [collect]
+    if args.events:
+        sinks.append(JsonlSink(Path(args.events)))
+    executor.execute(plan, locations, config, sinks)
+    trajectory, logs = collect.trajectory, collect.logs
     reporter = Reporter()
     out_dir = root / 'out'
     out_dir.mkdir(parents=True, exist_ok=True)
-    reporter.export(plan, trajectory, logs, memory_ctx, out_dir)
+    if run_trace is not None:
+        # the traced summary should include reflection and its LLM call
+        memory.drain()
+    reporter.export(plan, trajectory, logs, memory_ctx, out_dir, config.get('visual'), fmt=args.export_format,
+                    run_trace=run_trace)
+    memory.close()
+    trace.stop()
     console = Console()
     console.print('[green]Report generated[/green] at ' + str(out_dir / 'report.md'))
+    if args.trace_chrome:
+        run_trace.write_chrome(Path(args.trace_chrome))
+        console.print('Trace written to ' + args.trace_chrome)
+
+def cmd_fleet(args):
+    from agent.core.fleet import Fleet, random_missions
+    root = ROOT
+    grid = load_grid(root / 'maps' / 'grid.json')
+    locations = load_locations(root / 'maps' / 'locations.json')
+    config = load_config(root / 'config.json')
+    memory = MemoryStore(root / 'memory', config.get('memory'))
+    rng = random.Random(args.seed)
+    places = None
+    if args.places:
+        # any free cell inside a place's radius, so robots do not all queue for its centre
+        g = grid['grid']
+        places = [(x, y) for p in locations.get('places', []) for y in range(p['y'] - p.get('r', 0), p['y'] + p.get('r', 0) + 1)
+                  for x in range(p['x'] - p.get('r', 0), p['x'] + p.get('r', 0) + 1)
+                  if 0 <= y < len(g) and 0 <= x < len(g[y]) and g[y][x] == 0]
+    fleet = Fleet(grid, memory, window=args.window, replan_every=args.replan_every, dwell=args.dwell,
+                  block_rate=args.block_rate, rng=rng)
+    for start, goals in random_missions(grid, args.robots, args.goals, rng, places):
+        fleet.add_robot(start, goals)
+    summary = fleet.run(args.ticks)
+    if args.persist:
+        # blocks the robots ran into go back to semantic memory
+        memory.save(semantic=['dynamic_blocks'])
+        memory.close()
+    out_dir = root / 'out'
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with (out_dir / 'fleet.json').open('w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    rows = fleet.tick_rows
+    with (out_dir / 'fleet_ticks.csv').open('w', encoding='utf-8') as f:
+        if rows:
+            f.write(','.join(rows[0]) + '\n')
+            for r in rows:
+                f.write(','.join(str(v) for v in r.values()) + '\n')
+    table = Table(title="Fleet")
+    table.add_column("Metric")
+    table.add_column("Value")
+    for k, v in summary.items():
+        table.add_row(k, str(v))
+    console = Console()
+    console.print(table)
+    console.print('Fleet stats saved at ' + str(out_dir / 'fleet.json'))
+
+def cmd_bench(args):
+    from agent.core import bench
+    root = ROOT
+    config = load_config(root / 'config.json')
+    cases = [c.strip() for c in args.cases.split(',') if c.strip()] if args.cases else None
+    unknown = [c for c in cases or [] if c not in bench.CASES]
+    if unknown:
+        raise SystemExit(f"unknown bench cases: {', '.join(unknown)} (choose from {', '.join(bench.CASES)})")
+    work = Path(args.work_dir) if args.work_dir else root / 'cache' / 'bench' / f'{args.size}-{args.seed}'
+    result = bench.run(work, args.size, config, seed=args.seed, repeat=args.repeat, cases=cases,
+                       llm_latency=args.llm_latency_ms / 1000.0,
+                       overrides={'width': args.width, 'height': args.height, 'episodes': args.episodes, 'places': args.places})
+    baseline_path = Path(args.baseline)
+    if not baseline_path.is_absolute():
+        baseline_path = root / baseline_path
+    baseline = load_config(baseline_path) if baseline_path.exists() else {}
+    rows = bench.compare(result, baseline)
+    result['comparison'] = rows
+    out_path = Path(args.out) if args.out else root / 'out' / 'bench.json'
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open('w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    console = Console()
+    table = Table(title=f"Bench {args.size} ({result['spec']['width']}x{result['spec']['height']}, {result['spec']['episodes']} episodes)")
+    for c in ('Case', 'min ms', 'p50 ms', 'p95 ms', 'Baseline ms', 'Ratio'):
+        table.add_column(c)
+    ref = {r['case']: r for r in rows}
+    for name, r in result['cases'].items():
+        b = ref.get(name)
+        mark = '' if b is None else (f"[red]{b['ratio']}[/red]" if b['regressed'] else str(b['ratio']))
+        table.add_row(name, str(r['min_ms']), str(r['p50_ms']), str(r['p95_ms']), '' if b is None else str(b['baseline_ms']), mark)
+    console.print(table)
+    console.print('Bench results saved at ' + str(out_path))
+    if args.update_baseline:
+        bench.update_baseline(baseline, result)
+        tmp = baseline_path.with_name(f'{baseline_path.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(baseline, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        os.replace(tmp, baseline_path)
+        console.print('Baseline updated at ' + str(baseline_path))
+        return
+    regressed = [r['case'] for r in rows if r['regressed']]
+    if regressed:
+        console.print(f"[red]Regressions:[/red] {', '.join(regressed)}")
+        sys.exit(1)
 
 def cmd_clean(args):
     root = ROOT
@@ -107,18 +252,61 @@ def main():
     p1.add_argument('task', type=str)
     p1.add_argument('--api_key', type=str, default=None)
     p1.add_argument('--base_url', type=str, default=None)
+    p1.add_argument('--llm_cache', type=str, choices=['off','on','record','replay'], default=None)
+    p1.add_argument('--llm_cache_dir', type=str, default=None)
     p1.set_defaults(func=cmd_show_plan)
     p2 = sub.add_parser('run')
     p2.add_argument('task', type=str)
     p2.add_argument('--api_key', type=str, default=None)
     p2.add_argument('--base_url', type=str, default=None)
+    p2.add_argument('--llm_cache', type=str, choices=['off','on','record','replay'], default=None)
+    p2.add_argument('--llm_cache_dir', type=str, default=None)
+    p2.add_argument('--export_format', type=str, choices=['json','binary'], default='json')
+    p2.add_argument('--events', type=str, default=None, help='stream execution events to this JSONL file')
+    p2.add_argument('--trace', action='store_true', help='time pipeline stages; summary goes to logs.json and report.md')
+    p2.add_argument('--trace_chrome', type=str, default=None, help='also write a Chrome trace-event JSON file (implies --trace)')
     p2.set_defaults(func=cmd_run)
     p3 = sub.add_parser('eval')
     p3.add_argument('tasks_file', type=str, nargs='?', default='eval/tasks.txt')
     p3.add_argument('--api_key', type=str, default=None)
     p3.add_argument('--base_url', type=str, default=None)
+    p3.add_argument('--llm_cache', type=str, choices=['off','on','record','replay'], default=None)
+    p3.add_argument('--llm_cache_dir', type=str, default=None)
     p3.add_argument('--baseline', type=str, choices=['random','greedy'], default='greedy')
+    p3.add_argument('--workers', type=int, default=1)
+    p3.add_argument('--seed', type=int, default=0)
+    p3.add_argument('--prefetch', action='store_true', help='plan all tasks up front with concurrent LLM calls')
+    p3.add_argument('--reflect', type=str, choices=['sync','background'], default='sync',
+                    help='background: batch reflection on a worker thread, drained before metrics are written')
+    p3.add_argument('--trace', action='store_true', help='add per-task stage timings and counters to metrics.csv')
     p3.set_defaults(func=cmd_eval)
+    p5 = sub.add_parser('fleet')
+    p5.add_argument('--robots', type=int, default=20)
+    p5.add_argument('--goals', type=int, default=4, help='goals per robot')
+    p5.add_argument('--ticks', type=int, default=2000, help='stop after this many ticks')
+    p5.add_argument('--window', type=int, default=16, help='space-time planning horizon in ticks')
+    p5.add_argument('--replan_every', type=int, default=None, help='ticks between planning rounds (default window/2)')
+    p5.add_argument('--dwell', type=int, default=2, help='ticks spent at each goal')
+    p5.add_argument('--block_rate', type=float, default=0.0, help='chance that a move finds its next cell blocked')
+    p5.add_argument('--seed', type=int, default=0)
+    p5.add_argument('--places', action='store_true', help='draw goals from maps/locations.json instead of any free cell')
+    p5.add_argument('--persist', action='store_true', help='save dynamic blocks found by the fleet to memory')
+    p5.set_defaults(func=cmd_fleet)
+    p6 = sub.add_parser('bench')
+    p6.add_argument('--size', type=str, choices=['small','medium','large'], default='small')
+    p6.add_argument('--cases', type=str, default=None, help='comma separated subset of the bench cases')
+    p6.add_argument('--repeat', type=int, default=5, help='timed operations per case')
+    p6.add_argument('--seed', type=int, default=0)
+    p6.add_argument('--width', type=int, default=None)
+    p6.add_argument('--height', type=int, default=None)
+    p6.add_argument('--episodes', type=int, default=None)
+    p6.add_argument('--places', type=int, default=None)
+    p6.add_argument('--llm_latency_ms', type=float, default=0.0, help='latency of the stub LLM in the e2e case')
+    p6.add_argument('--work_dir', type=str, default=None, help='synthetic world and scratch files (default cache/bench/<size>-<seed>)')
+    p6.add_argument('--baseline', type=str, default='eval/bench_baseline.json')
+    p6.add_argument('--update_baseline', action='store_true', help='store this run as the baseline for its size')
+    p6.add_argument('--out', type=str, default=None, help='result JSON (default out/bench.json)')
+    p6.set_defaults(func=cmd_bench)
     p4 = sub.add_parser('clean')
     p4.set_defaults(func=cmd_clean)
     args = parser.parse_args()
@@ -126,39 +314,137 @@ def main():
         parser.print_help()
         return
     args.func(args)
-def _run_once(task: str, use_memory: bool, api_key: str, base_url: str, baseline: str = 'greedy'):
+def _run_once(task: str, use_memory: bool, api_key: str, base_url: str, baseline: str = 'greedy', memory=None, seed=None, env=None, plan=None, reflect: str = 'sync'):
     root = ROOT
-    grid = load_grid(root / 'maps' / 'grid.json')
-    locations = load_locations(root / 'maps' / 'locations.json')
-    config = load_config(root / 'config.json')
-    if api_key and base_url:
-        llm_configure(api_key, base_url)
+    if env is not None:
+        grid, locations, config = env['grid'], env['locations'], env['config']
+    else:
+        grid = load_grid(root / 'maps' / 'grid.json')
+        locations = load_locations(root / 'maps' / 'locations.json')
+        config = load_config(root / 'config.json')
+    if env is None:
+        configure_llm(api_key, base_url, config)
+    rng = random.Random(seed) if seed is not None else None
     if use_memory:
-        memory = MemoryStore(root / 'memory')
+        memory = memory or MemoryStore(root / 'memory', config.get('memory'))
         memory_ctx = memory.retrieve(task, locations, k=5)
     else:
         from agent.core.memory import NoOpMemory
-        memory = NoOpMemory(root / 'memory')
+        memory = memory or NoOpMemory(root / 'memory', config.get('memory'))
         memory_ctx = {'episodes':[], 'semantic': memory.semantic, 'procedural': memory.procedural}
+    navigator = Navigator(grid, memory.semantic if use_memory else {'high_cost_zones': []}, mode=config.get('route_mode', 'astar'), hpa_store=root / 'maps' / 'hpa.json')
+    distances = load_distances(root, navigator, locations)
     planner = Planner()
     t0 = perf_counter()
+    reorder = True
     try:
-        plan = planner.plan(task, memory_ctx, locations, config)
+        # a prefetched plan (or the exception its planning raised) skips the LLM call
+        if isinstance(plan, Exception):
+            raise plan
+        if plan is None:
+            plan = planner.plan(task, memory_ctx, locations, config)
+    except CacheMiss:
+        raise
     except Exception:
         if baseline == 'random':
             from agent.core.baselines import plan_random
-            plan = plan_random(task, locations)
+            plan = plan_random(task, locations, rng=rng)
+            # the random baseline keeps its random order unless config opts in
+            reorder = config.get('order_opt', {}).get('random_baseline', False)
         else:
             from agent.core.baselines import plan_greedy_distance
-            plan = plan_greedy_distance(task, locations, config.get('start', {'x':0,'y':0}))
-    navigator = Navigator(grid, memory.semantic if use_memory else {'high_cost_zones': []})
-    executor = Executor(navigator, memory if use_memory else memory)
+            plan = plan_greedy_distance(task, locations, config.get('start', {'x':0,'y':0}), distances=distances)
+    if reorder:
+        plan = optimize_order(plan, locations, config, distances)
+    executor = Executor(navigator, memory if use_memory else memory, rng=rng, reflect=reflect)
     trajectory, logs = executor.run(plan, locations, config)
     t1 = perf_counter()
     length = len(trajectory)
     blocked = sum(1 for l in logs if l.get('result') == 'blocked')
     return {'task': task, 'use_memory': use_memory, 'time_sec': round(t1 - t0, 4), 'path_len': length, 'blocked': blocked}
 
+# Per-process eval state: map, config and memory stores are loaded once per
+# worker (or once for the in-process sequential run) by _eval_init.
+#
+# Only the parent process owns the real MemoryStore, and memory-on jobs run
+# there in job order, so each one sees exactly what the earlier ones learned
+# whatever --workers is. Memory-off jobs (the only ones pool workers get)
+# read a snapshot of semantic/procedural memory taken before the batch.
+_EVAL = {}
+
+def _eval_snapshot(memory) -> str:
+    return json.dumps({'semantic': memory.semantic, 'procedural': memory.procedural}, ensure_ascii=False)
+
+def _eval_init(api_key: str, base_url: str, baseline: str, cache_mode: str = None, cache_dir: str = None, reflect: str = 'sync',
+               tracing: bool = False, snapshot: str = None):
+    from agent.core.memory import NoOpMemory
+    from agent.core.dynblocks import DynamicBlocks
+    root = ROOT
+    config = load_config(root / 'config.json')
+    memory = None
+    if snapshot is None:
+        memory = MemoryStore(root / 'memory', config.get('memory'))
+        snapshot = _eval_snapshot(memory)
+    snap = json.loads(snapshot)
+    noop = NoOpMemory(root / 'memory', config.get('memory'))
+    noop.semantic = snap['semantic']
+    noop.semantic['dynamic_blocks'] = DynamicBlocks(noop.semantic.get('dynamic_blocks', []))
+    noop.procedural = snap['procedural']
+    _EVAL.clear()
+    _EVAL.update({
+        'grid': load_grid(root / 'maps' / 'grid.json'),
+        'locations': load_locations(root / 'maps' / 'locations.json'),
+        'config': config,
+        'api_key': api_key,
+        'base_url': base_url,
+        'baseline': baseline,
+        'reflect': reflect,
+        'trace': tracing,
+        'memory': memory,
+        'noop': noop,
+    })
+    configure_llm(api_key, base_url, config, cache_mode, cache_dir)
+
+def _eval_prefetch(jobs):
+    # Plans every job up front with concurrent LLM calls, using the memory
+    # context as it is before the batch starts.
+    e = _EVAL
+    locations = e['locations']
+    config = e['config']
+    noop_ctx = {'episodes': [], 'semantic': e['noop'].semantic, 'procedural': e['noop'].procedural}
+    reqs = []
+    for _, task, use_memory, _ in jobs:
+        ctx = e['memory'].retrieve(task, locations, k=5) if use_memory else noop_ctx
+        reqs.append({'task_text': task, 'memory_ctx': ctx, 'locations': locations, 'config': config})
+    return Planner().plan_many(reqs)
+
+def _eval_task(job, plan=None):
+    idx, task, use_memory, seed = job
+    e = _EVAL
+    if e.get('trace'):
+        trace.start(f'{idx}:{task}')
+    try:
+        r = _run_once(task, use_memory, e['api_key'], e['base_url'], e['baseline'],
+                      memory=e['memory'] if use_memory else e['noop'], seed=seed, env=e, plan=plan, reflect=e['reflect'])
+    finally:
+        t = trace.stop()
+    if t is not None:
+        r['trace'] = t.summary()
+    return idx, r
+
+def task_seed(seed: int, index: int, task: str, use_memory: bool) -> int:
+    h = hashlib.blake2b(f'{seed}:{index}:{int(use_memory)}:{task}'.encode('utf-8'), digest_size=8)
+    return int.from_bytes(h.digest(), 'big')
+
+def _metrics_row(r: dict) -> str:
+    row = f"{r['task']},{int(r['use_memory'])},{r['time_sec']},{r['path_len']},{r['blocked']}"
+    if 'trace' in r:
+        row += ',' + ','.join(str(v) for v in trace.csv_values(r['trace']))
+    return row + '\n'
+
+METRICS_HEADER = 'task,use_memory,time_sec,path_len,blocked\n'
+TRACE_HEADER = METRICS_HEADER[:-1] + ',' + ','.join(c for c, _, _ in trace.CSV_COLUMNS) + '\n'
+
 def cmd_eval(args):
     tasks_path = Path(args.tasks_file)
     if not tasks_path.is_absolute():
@@ -170,20 +456,53 @@ def cmd_eval(args):
             if not line:
                 continue
             tasks.append(line)
-    results = []
-    for t in tasks:
-        r0 = _run_once(t, use_memory=False, api_key=args.api_key, base_url=args.base_url, baseline=args.baseline)
-        r1 = _run_once(t, use_memory=True, api_key=args.api_key, base_url=args.base_url, baseline=args.baseline)
-        results.extend([r0, r1])
+    jobs = []
+    for i, t in enumerate(tasks):
+        for use_memory in (False, True):
+            jobs.append((len(jobs), t, use_memory, task_seed(args.seed, i, t, use_memory)))
     out_dir = ROOT / 'out'
     out_dir.mkdir(parents=True, exist_ok=True)
     metrics_csv = out_dir / 'metrics.csv'
+    results = [None] * len(jobs)
+    workers = max(1, int(args.workers or 1))
+    header = TRACE_HEADER if args.trace else METRICS_HEADER
+    # rows are streamed in completion order, then rewritten in job order
     with metrics_csv.open('w', encoding='utf-8') as f:
-        f.write('task,use_memory,time_sec,path_len,blocked\n')
+        f.write(header)
+        def emit(idx, r):
+            results[idx] = r
+            f.write(_metrics_row(r))
+            f.flush()
+        init_args = (args.api_key, args.base_url, args.baseline, args.llm_cache, args.llm_cache_dir, args.reflect, args.trace)
+        _eval_init(*init_args)
+        plans = _eval_prefetch(jobs) if args.prefetch else [None] * len(jobs)
+        if workers == 1:
+            for job, plan in zip(jobs, plans):
+                emit(*_eval_task(job, plan))
+        else:
+            # memory-off jobs go to the pool; memory-on ones run here, in
+            # order, meanwhile (see _EVAL)
+            snapshot = _eval_snapshot(_EVAL['memory'])
+            with ProcessPoolExecutor(max_workers=workers, initializer=_eval_init,
+                                     initargs=init_args + (snapshot,)) as pool:
+                futures = [pool.submit(_eval_task, job, plan) for job, plan in zip(jobs, plans) if not job[2]]
+                for job, plan in zip(jobs, plans):
+                    if job[2]:
+                        emit(*_eval_task(job, plan))
+                for fut in as_completed(futures):
+                    emit(*fut.result())
+        _EVAL['memory'].close()
+    tmp = metrics_csv.with_name(metrics_csv.name + '.tmp')
+    with tmp.open('w', encoding='utf-8') as f:
+        f.write(header)
         for r in results:
-            f.write(f"{r['task']},{int(r['use_memory'])},{r['time_sec']},{r['path_len']},{r['blocked']}\n")
+            f.write(_metrics_row(r))
+    os.replace(tmp, metrics_csv)
     svg_path = out_dir / 'metrics.svg'
     metrics_to_svg(str(metrics_csv), str(svg_path))
+    from agent.core import llm
+    if llm.CACHE is not None:
+        print('LLM cache', llm.CACHE.stats())
     print('Metrics saved at', str(metrics_csv))
     print('Chart saved at', str(svg_path))
 
@@ -13,23 +13,26 @@ def _extract_order(task_text: str, location_names):
             ordered.append(s)
     return ordered
 
-def plan_random(task_text: str, locations: dict):
+def plan_random(task_text: str, locations: dict, rng=None):
     names = [p['name'] for p in locations.get('places', [])]
     import random
-    random.shuffle(names)
+    (rng or random).shuffle(names)
     steps = []
     for n in names:
         steps.append({'type':'navigate','target':n})
         steps.append({'type':'inspect','target':n})
     return {'task': task_text, 'steps': steps, 'constraints': {}}
 
-def plan_greedy_distance(task_text: str, locations: dict, start: dict):
+def plan_greedy_distance(task_text: str, locations: dict, start: dict, distances=None):
+    # distances: optional LocationDistances; road costs replace Manhattan
+    # distance when given (unreachable places sort last).
     loc_map = {p['name']:(int(p['x']), int(p['y'])) for p in locations.get('places', [])}
     order_hint = _extract_order(task_text, list(loc_map.keys()))
     remaining = list(loc_map.keys())
     if order_hint:
         remaining = [n for n in remaining if n in order_hint] + [n for n in remaining if n not in order_hint]
     cur = (int(start.get('x',0)), int(start.get('y',0)))
+    cur_name = None
     ordered = []
     rem = set(remaining)
     while rem:
@@ -37,12 +40,18 @@ def plan_greedy_distance(task_text: str, locations: dict, start: dict):
         best_d = None
         for n in list(rem):
             xy = loc_map[n]
-            d = abs(cur[0]-xy[0]) + abs(cur[1]-xy[1])
+            if distances is not None:
+                d = distances.cost(cur_name, n) if cur_name else distances.cost_from(cur, n)
+                if d is None:
+                    d = math.inf
+            else:
+                d = abs(cur[0]-xy[0]) + abs(cur[1]-xy[1])
             if best is None or d < best_d:
                 best = n
                 best_d = d
         ordered.append(best)
         cur = loc_map[best]
+        cur_name = best
         rem.remove(best)
     steps = []
     for n in ordered:
@@ -0,0 +1,272 @@
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+from agent.core import llm
+from agent.core.synth import write_world, make_logs
+from agent.core.memory import MemoryStore
+from agent.core.navigator import Navigator
+from agent.core.pathcache import PathCache
+from agent.core.episodic import EpisodicIndex
+from agent.core.executor import Executor
+from agent.core.reporter import Reporter
+from agent.core.records import Trajectory
+
+# Benchmarks on seeded synthetic worlds (see synth.py). Every case times
+# `repeat` operations after `warmup` untimed ones and reports min/p50/p95/
+# max/mean in ms plus case counters. Results are plain JSON so runs can be
+# diffed and checked against a stored baseline (compare()).
+
+SIZES = {
+    'small': {'width': 40, 'height': 30, 'places': 8, 'episodes': 10000, 'logs': 200, 'routes': 20},
+    'medium': {'width': 400, 'height': 300, 'places': 20, 'episodes': 100000, 'logs': 2000, 'routes': 20},
+    'large': {'width': 2000, 'height': 2000, 'places': 40, 'episodes': 1000000, 'logs': 20000, 'routes': 10},
+}
+CASES = ('route_astar', 'route_jps', 'route_hpa', 'index_cold', 'retrieve', 'reflect', 'export_json',
+         'export_binary', 'e2e')
+
+def _pct(v: list, q: float) -> float:
+    return v[min(len(v) - 1, int(q * len(v)))] if v else 0.0
+
+def measure(op, repeat: int, warmup: int = 1) -> dict:
+    # op(i) for i in range(warmup + repeat); only the last repeat are timed
+    for i in range(warmup):
+        op(i)
+    ms = []
+    for i in range(warmup, warmup + repeat):
+        t = time.perf_counter()
+        op(i)
+        ms.append((time.perf_counter() - t) * 1000)
+    s = sorted(ms)
+    return {'ops': len(ms), 'min_ms': round(s[0], 3), 'p50_ms': round(_pct(s, 0.5), 3), 'p95_ms': round(_pct(s, 0.95), 3),
+            'max_ms': round(s[-1], 3), 'mean_ms': round(sum(s) / len(s), 3)}
+
+class Bench:
+    def __init__(self, root: Path, spec: dict, config: dict, seed: int = 0, repeat: int = 5, llm_latency: float = 0.0):
+        self.root = Path(root)
+        self.spec = dict(spec)
+        self.config = config or {}
+        self.seed = seed
+        self.repeat = max(1, int(repeat))
+        self.llm_latency = llm_latency
+        self.world = write_world(self.root / 'world', spec['width'], spec['height'], spec['places'], spec['episodes'], seed)
+        self.maps = self.root / 'world' / 'maps'
+        with (self.maps / 'grid.json').open('r', encoding='utf-8') as f:
+            self.grid = json.load(f)
+        with (self.maps / 'locations.json').open('r', encoding='utf-8') as f:
+            self.locations = json.load(f)
+        self.names = [p['name'] for p in self.locations['places']]
+        rng = random.Random(seed)
+        xy = {p['name']: (p['x'], p['y']) for p in self.locations['places']}
+        self.pairs = [tuple(xy[n] for n in rng.sample(self.names, 2)) for _ in range(spec['routes'])]
+        self.logs = make_logs(self.locations, spec['logs'], rng)
+        self.task = f"巡检{'→'.join(self.names[:4])}，优先{self.names[0]}，拥堵则绕行"
+
+    def _memory(self, case: str) -> MemoryStore:
+        # Cases write to memory, so each gets a fresh copy of the world's.
+        # One directory per case: the episodic index, writer and JSON
+        # documents are shared per path and must not see a swapped file.
+        d = self.root / 'scratch' / case / 'memory'
+        if d.exists():
+            shutil.rmtree(d)
+        shutil.copytree(self.root / 'world' / 'memory', d)
+        return MemoryStore(d, self.config.get('memory'))
+
+    def run(self, cases=None) -> dict:
+        out = {}
+        for name in cases or CASES:
+            t = time.perf_counter()
+            out[name] = getattr(self, 'case_' + name)()
+            out[name]['wall_s'] = round(time.perf_counter() - t, 3)
+        return out
+
+    def _route(self, mode: str) -> dict:
+        mem = self._memory('route_' + mode)
+        t = time.perf_counter()
+        nav = Navigator(self.grid, mem.semantic, cache=None, mode=mode)
+        setup = (time.perf_counter() - t) * 1000
+        found = []
+        def op(i):
+            found.clear()
+            for a, b in self.pairs:
+                found.append(len(nav.route(a, b)))
+        nav.stats['expanded'] = 0
+        r = measure(op, self.repeat)
+        n = len(self.pairs) * (self.repeat + 1)
+        r.update({'setup_ms': round(setup, 3), 'routes': len(self.pairs), 'ms_per_route': round(r['p50_ms'] / max(1, len(self.pairs)), 3),
+                  'expanded_per_route': round(nav.stats['expanded'] / n, 1), 'path_len_mean': round(sum(found) / max(1, len(found)), 1)})
+        mem.close()
+        return r
+
+    def case_route_astar(self) -> dict:
+        return self._route('astar')
+
+    def case_route_jps(self) -> dict:
+        return self._route('jps')
+
+    def case_route_hpa(self) -> dict:
+        return self._route('hpa')
+
+    def case_index_cold(self) -> dict:
+        # parse the whole episodic file into a fresh index, then one top-k
+        path = self.root / 'world' / 'memory' / 'episodic.jsonl'
+        now = int(time.time())
+        def op(i):
+            idx = EpisodicIndex(path)
+            idx.refresh()
+            idx.top(5, self.names, now)
+        r = measure(op, max(1, self.repeat // 2), warmup=0)
+        r.update({'episodes': self.spec['episodes'], 'bytes': path.stat().st_size})
+        return r
+
+    def case_retrieve(self) -> dict:
+        # MemoryStore.retrieve with the index already resident
+        mem = self._memory('retrieve')
+        r = measure(lambda i: mem.retrieve(self.task, self.locations, k=5), self.repeat)
+        mem.close()
+        return r
+
+    def case_reflect(self) -> dict:
+        # local reflection and the incremental save; no LLM is configured
+        # here, so the tip call returns at once (e2e covers the LLM path)
+        mem = self._memory('reflect')
+        r = measure(lambda i: mem.reflect(self.logs), self.repeat)
+        mem.close()
+        r['logs'] = len(self.logs)
+        return r
+
+    def _export(self, fmt: str) -> dict:
+        mem = self._memory('export_' + fmt)
+        ctx = mem.retrieve(self.task, self.locations, k=5)
+        nav = Navigator(self.grid, mem.semantic, cache=None)
+        traj = Trajectory()
+        for a, b in self.pairs:
+            for p in nav.route(a, b):
+                traj.append(p)
+        plan = {'task': self.task, 'steps': [{'type': 'navigate', 'target': n} for n in self.names[:4]]}
+        out = self.root / 'scratch' / ('export_' + fmt) / 'out'
+        out.mkdir(parents=True, exist_ok=True)
+        rep = Reporter()
+        r = measure(lambda i: rep.export(plan, traj, self.logs, ctx, out, self.config.get('visual'), fmt=fmt, maps_dir=self.maps),
+                    self.repeat)
+        mem.close()
+        r.update({'points': len(traj), 'logs': len(self.logs), 'bytes': sum(p.stat().st_size for p in out.iterdir() if p.is_file())})
+        return r
+
+    def case_export_json(self) -> dict:
+        return self._export('json')
+
+    def case_export_binary(self) -> dict:
+        return self._export('binary')
+
+    def case_e2e(self) -> dict:
+        # retrieve -> plan (LLM stub) -> order -> execute -> reflect ->
+        # export, as cmd_run does. Without the openai package the planner
+        # fails over to the greedy baseline, as in cmd_eval; the planned_by_*
+        # counters say which happened.
+        from agent.core.llm_stub import StubServer
+        from agent.core.planner import Planner
+        from agent.core.distances import LocationDistances
+        from agent.core.ordering import optimize_plan_order
+        from agent.core.baselines import plan_greedy_distance
+        config = dict(self.config)
+        config['plan_cache'] = {'enabled': False}
+        start = config.get('start', {'x': 0, 'y': 0})
+        lc = config.get('llm', {})
+        oc = config.get('order_opt', {})
+        out = self.root / 'scratch' / 'e2e' / 'out'
+        out.mkdir(parents=True, exist_ok=True)
+        # the distance matrix starts cold every bench run, as on a new map
+        dist_path = out.parent / 'distances.json'
+        if dist_path.exists():
+            dist_path.unlink()
+        used = {'llm': 0, 'fallback': 0}
+        calls = llm.STATS['calls']
+        with StubServer(latency=self.llm_latency) as stub:
+            saved = (llm.API_KEY, llm.BASE_URL, llm.CLIENT, llm.CACHE)
+            llm.configure('bench', stub.base_url, max_concurrency=lc.get('max_concurrency'), timeout=lc.get('timeout_s'), retries=0)
+            llm.set_cache(None)
+            mem = self._memory('e2e')
+            def op(i):
+                ctx = mem.retrieve(self.task, self.locations, k=5)
+                nav = Navigator(self.grid, mem.semantic, cache=PathCache(), mode=config.get('route_mode', 'astar'))
+                dist = LocationDistances(dist_path, nav.costmap, self.locations)
+                try:
+                    plan = Planner().plan(self.task, ctx, self.locations, config)
+                    used['llm'] += 1
+                except Exception:
+                    plan = plan_greedy_distance(self.task, self.locations, start, distances=dist)
+                    used['fallback'] += 1
+                if oc.get('enabled', True):
+                    plan = optimize_plan_order(plan, self.locations, start, dist, exact_max=oc.get('exact_max', 11),
+                                               time_budget=oc.get('time_budget_ms', 200) / 1000.0)
+                ex = Executor(nav, mem, rng=random.Random(self.seed + i))
+                traj, logs = ex.run(plan, self.locations, config)
+                Reporter().export(plan, traj, logs, ctx, out, config.get('visual'), maps_dir=self.maps)
+            try:
+                r = measure(op, self.repeat)
+            finally:
+                mem.close()
+                llm.API_KEY, llm.BASE_URL, llm.CLIENT, llm.CACHE = saved
+            r.update({'llm_latency_ms': round(self.llm_latency * 1000, 1), 'llm_requests': stub.requests,
+                      'llm_calls': llm.STATS['calls'] - calls, 'planned_by_llm': used['llm'], 'planned_by_fallback': used['fallback']})
+        return r
+
+def run(root: Path, size: str, config: dict, seed: int = 0, repeat: int = 5, cases=None, llm_latency: float = 0.0,
+        overrides: dict = None) -> dict:
+    spec = dict(SIZES[size])
+    spec.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    t = time.perf_counter()
+    b = Bench(root, spec, config, seed, repeat, llm_latency)
+    setup = time.perf_counter() - t
+    return {
+        'version': 1,
+        'size': size,
+        'spec': spec,
+        'seed': seed,
+        'repeat': b.repeat,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'ts': int(time.time()),
+        'world': dict(b.world, setup_s=round(setup, 3)),
+        'cases': b.run(cases),
+    }
+
+def compare(result: dict, baseline: dict) -> list:
+    # Each case against the baseline for the same size, on the baseline's
+    # 'metric' (min_ms by default: the fastest repeat is the least disturbed
+    # by other load on the machine). A case regresses when it is slower by
+    # more than its tolerance (a fraction, per case in 'thresholds' or the
+    # global 'tolerance') and by more than min_delta_ms, which keeps
+    # sub-millisecond noise from failing a run.
+    ref = (baseline.get('sizes') or {}).get(result['size'], {})
+    metric = baseline.get('metric', 'min_ms')
+    tol = float(baseline.get('tolerance', 0.5))
+    per = baseline.get('thresholds', {})
+    min_delta = float(baseline.get('min_delta_ms', 1.0))
+    rows = []
+    for name, r in result['cases'].items():
+        b = ref.get(name)
+        if not b or not b.get(metric):
+            continue
+        limit = float(per.get(name, tol))
+        ratio = r[metric] / b[metric]
+        rows.append({'case': name, 'metric': metric, 'baseline_ms': b[metric], 'ms': r[metric], 'ratio': round(ratio, 3),
+                     'limit': limit, 'regressed': ratio > 1 + limit and r[metric] - b[metric] > min_delta})
+    return rows
+
+def update_baseline(baseline: dict, result: dict) -> dict:
+    sizes = baseline.setdefault('sizes', {})
+    sizes[result['size']] = {name: {'min_ms': r['min_ms'], 'p50_ms': r['p50_ms']} for name, r in result['cases'].items()}
+    baseline.setdefault('metric', 'min_ms')
+    baseline.setdefault('tolerance', 0.5)
+    baseline.setdefault('min_delta_ms', 1.0)
+    baseline.setdefault('thresholds', {})
+    baseline.setdefault('meta', {})[result['size']] = {'python': result['python'], 'platform': result['platform'],
+                                                        'cpus': result['cpus'], 'repeat': result['repeat'], 'ts': result['ts']}
+    return baseline
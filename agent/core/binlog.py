@@ -0,0 +1,257 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from agent.core.records import Trajectory, as_dicts
+
+# run.bin: a 16 byte header, then sections of (tag, length, payload) with
+# every payload starting on an 8 byte boundary. All numbers little-endian.
+#   TRAJ  coordinate typecode ('h' int16 or 'i' int32), then x0 y0 x1 y1 ...
+#   STRS  interned strings: count, count+1 offsets (u32), utf-8 blob
+#   COLN  one log column: name string id, kind, presence bytes, values
+# Column kinds: 'q' int64, 'd' float64, 'b' bool, 's' string id (i32),
+# 'p' int pair (2 x i32, e.g. pos), 'j' JSON text id for anything else.
+MAGIC = b'AGRB'
+VERSION = 1
+_HEADER = struct.Struct('<4sHxxII')
+_SECTION = struct.Struct('<4s4xQ')
+_COLUMN = struct.Struct('<Ic3xQ')
+_LITTLE = sys.byteorder == 'little'
+
+def _pad(n: int) -> int:
+    return (-n) % 8
+
+def _le(a: array) -> bytes:
+    if not _LITTLE:
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+def _is_int(v) -> bool:
+    return type(v) is int and -(1 << 63) <= v < (1 << 63)
+
+def _is_pair(v) -> bool:
+    return isinstance(v, (list, tuple)) and len(v) == 2 and all(_is_int(c) and -(1 << 31) <= c < (1 << 31) for c in v)
+
+def _kind(values: list) -> str:
+    vs = [v for v in values if v is not _MISSING]
+    if all(type(v) is bool for v in vs):
+        return 'b'
+    if all(_is_int(v) for v in vs):
+        return 'q'
+    if all(type(v) is float for v in vs):
+        return 'd'
+    if all(type(v) is str for v in vs):
+        return 's'
+    if all(_is_pair(v) for v in vs):
+        return 'p'
+    return 'j'
+
+_MISSING = object()
+
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+        self.items = []
+
+    def id(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            i = len(self.items)
+            self.ids[s] = i
+            self.items.append(s)
+        return i
+
+    def payload(self) -> bytes:
+        blobs = [s.encode('utf-8') for s in self.items]
+        offs = array('I', [0])
+        for b in blobs:
+            offs.append(offs[-1] + len(b))
+        return struct.pack('<I', len(blobs)) + _le(offs) + b''.join(blobs)
+
+def encode_run(trajectory: list, logs: list) -> bytes:
+    trajectory = trajectory or []
+    logs = as_dicts(logs or [])
+    if isinstance(trajectory, Trajectory):
+        coords = trajectory.coords
+    else:
+        coords = [c for p in trajectory for c in (int(p[0]), int(p[1]))]
+    tc = 'h' if not coords or -32768 <= min(coords) and max(coords) < 32768 else 'i'
+    sections = [(b'TRAJ', tc.encode() + b'\0' * 7 + _le(array(tc, coords)))]
+    strings = _Strings()
+    names = list(dict.fromkeys(k for l in logs for k in l))
+    n = len(logs)
+    for name in names:
+        values = [l.get(name, _MISSING) for l in logs]
+        present = bytes(0 if v is _MISSING else 1 for v in values)
+        kind = _kind(values)
+        if kind == 'p':
+            out = array('i')
+            for v in values:
+                out.extend((0, 0) if v is _MISSING else (v[0], v[1]))
+        elif kind in ('s', 'j'):
+            out = array('i', [-1 if v is _MISSING else strings.id(v if kind == 's' else json.dumps(v, ensure_ascii=False)) for v in values])
+        else:
+            tc = {'b': 'b', 'q': 'q', 'd': 'd'}[kind]
+            zero = 0.0 if kind == 'd' else 0
+            out = array(tc, [zero if v is _MISSING else v for v in values])
+        data = _le(out)
+        body = _COLUMN.pack(strings.id(name), kind.encode(), len(data)) + present + b'\0' * _pad(n) + data
+        sections.append((b'COLN', body))
+    sections.insert(1, (b'STRS', strings.payload()))
+    parts = [_HEADER.pack(MAGIC, VERSION, len(trajectory), n)]
+    for tag, body in sections:
+        parts.append(_SECTION.pack(tag, len(body)))
+        parts.append(body)
+        parts.append(b'\0' * _pad(len(body)))
+    return b''.join(parts)
+
+def write_run(path: Path, trajectory: list, logs: list) -> int:
+    data = encode_run(trajectory, logs)
+    path = Path(path)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return len(data)
+
+class BinaryRun:
+    # Memory-mapped reader for run.bin. Columns are decoded on first use;
+    # column_view() hands out zero-copy views for analytics.
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open('rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buf = memoryview(self.mm)
+        self._strings = None
+        self._columns = None
+        magic, version, self.n_points, self.n_logs = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.path}: not a run.bin v{VERSION} file')
+        self.sections = []
+        off = _HEADER.size
+        while off < len(self.buf):
+            tag, length = _SECTION.unpack_from(self.buf, off)
+            off += _SECTION.size
+            self.sections.append((tag, off, length))
+            off += length + _pad(length)
+
+    def close(self):
+        if self._columns:
+            for _, present, vals in self._columns.values():
+                present.release()
+                if isinstance(vals, memoryview):
+                    vals.release()
+        self._columns = None
+        self.buf.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            # a caller still holds a view; the map goes away with it
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _view(self, off: int, length: int, tc: str):
+        mv = self.buf[off:off + length]
+        if _LITTLE:
+            return mv.cast(tc)
+        a = array(tc, mv.tobytes())
+        a.byteswap()
+        return a
+
+    def _section(self, tag: bytes):
+        for t, off, length in self.sections:
+            if t == tag:
+                return off, length
+        raise KeyError(tag)
+
+    def coords(self):
+        # flat x0 y0 x1 y1 ... view
+        off, length = self._section(b'TRAJ')
+        tc = chr(self.buf[off])
+        return self._view(off + 8, length - 8, tc)
+
+    @property
+    def trajectory(self) -> list:
+        c = self.coords()
+        return [(c[i], c[i + 1]) for i in range(0, len(c), 2)]
+
+    @property
+    def strings(self) -> list:
+        if self._strings is None:
+            off, _ = self._section(b'STRS')
+            count = struct.unpack_from('<I', self.buf, off)[0]
+            offs = self._view(off + 4, 4 * (count + 1), 'I')
+            base = off + 4 + 4 * (count + 1)
+            blob = self.buf[base:base + offs[count]].tobytes()
+            self._strings = [blob[offs[i]:offs[i + 1]].decode('utf-8') for i in range(count)]
+        return self._strings
+
+    @property
+    def columns(self) -> dict:
+        # name -> (kind, presence view, values view)
+        if self._columns is None:
+            cols = {}
+            n = self.n_logs
+            for tag, off, _ in self.sections:
+                if tag != b'COLN':
+                    continue
+                name_id, kind, size = _COLUMN.unpack_from(self.buf, off)
+                kind = kind.decode()
+                p = off + _COLUMN.size
+                present = self.buf[p:p + n]
+                p += n + _pad(n)
+                tc = {'q': 'q', 'd': 'd', 'b': 'b', 's': 'i', 'p': 'i', 'j': 'i'}[kind]
+                cols[self.strings[name_id]] = (kind, present, self._view(p, size, tc))
+            self._columns = cols
+        return self._columns
+
+    def column_view(self, name: str):
+        return self.columns[name]
+
+    def column(self, name: str) -> list:
+        # Decoded values, None where the record has no such key.
+        kind, present, vals = self.columns[name]
+        strs = self.strings
+        out = []
+        for i in range(self.n_logs):
+            if not present[i]:
+                out.append(None)
+            elif kind == 's':
+                out.append(strs[vals[i]])
+            elif kind == 'j':
+                out.append(json.loads(strs[vals[i]]))
+            elif kind == 'p':
+                out.append([vals[2 * i], vals[2 * i + 1]])
+            elif kind == 'b':
+                out.append(bool(vals[i]))
+            else:
+                out.append(vals[i])
+        return out
+
+    @property
+    def logs(self) -> list:
+        rows = [{} for _ in range(self.n_logs)]
+        for name, (kind, present, _) in self.columns.items():
+            vals = self.column(name)
+            for i, row in enumerate(rows):
+                if present[i]:
+                    row[name] = vals[i]
+        return rows
+
+def read_run(path: Path) -> dict:
+    with BinaryRun(path) as r:
+        return {'trajectory': r.trajectory, 'logs': r.logs}
+
+def iter_runs(root: Path, pattern: str = '**/run.bin'):
+    # Opens every archived run under root; callers close them.
+    for p in sorted(Path(root).glob(pattern)):
+        yield BinaryRun(p)
@@ -0,0 +1,99 @@
+import hashlib
+from array import array
+
+def block_penalty(ob: dict) -> int:
+    return int(max(1, round(10 * float(ob.get('confidence', 0.5)))))
+
+class CostMap:
+    # Flat row-major layers: passable[i] and step[i] for cell i = y * width + x.
+    # step = base (1 + high_cost_zones) + dyn (dynamic_blocks), kept apart so
+    # dynamic blocks can be patched without touching the static layer.
+    def __init__(self, grid: dict, semantic: dict):
+        self.grid = grid
+        self.semantic = semantic
+        self.width = int(grid['width'])
+        self.height = int(grid['height'])
+        self.version = 0
+        self.listeners = []
+        self._fp = None
+        self._fp_version = -1
+        self.build()
+
+    def build(self):
+        w = self.width
+        H = self.height
+        n = w * H
+        g = self.grid['grid']
+        passable = array('b', bytes(n))
+        # Short or missing rows leave the remaining cells impassable.
+        for y in range(min(H, len(g))):
+            row = g[y]
+            off = y * w
+            for x in range(min(w, len(row))):
+                if row[x] == 0:
+                    passable[off + x] = 1
+        for ob in self.semantic.get('obstacles', []):
+            if ob.get('label') != 'pillar':
+                continue
+            ox = int(ob.get('x'))
+            oy = int(ob.get('y'))
+            if 0 <= ox < w and 0 <= oy < H:
+                passable[oy * w + ox] = 0
+        base = array('i', [1]) * n
+        for z in self.semantic.get('high_cost_zones', []):
+            c = z.get('cost', 1)
+            x0 = max(0, int(z['xmin']))
+            x1 = min(w - 1, int(z['xmax']))
+            for y in range(max(0, int(z['ymin'])), min(H - 1, int(z['ymax'])) + 1):
+                off = y * w
+                for i in range(off + x0, off + x1 + 1):
+                    base[i] += c
+        self.passable = passable
+        self.base = base
+        self.dyn = array('i', bytes(4 * n))
+        self.step = array('i', base)
+        for ob in self.semantic.get('dynamic_blocks', []):
+            self.add_block(ob)
+        self.version += 1
+        for fn in self.listeners:
+            fn(None)
+
+    def fingerprint(self) -> str:
+        if self._fp_version != self.version:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(f'{self.width}x{self.height}'.encode())
+            h.update(self.passable.tobytes())
+            h.update(self.step.tobytes())
+            self._fp = h.hexdigest()
+            self._fp_version = self.version
+        return self._fp
+
+    def index(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def cost(self, x: int, y: int) -> int:
+        return self.step[y * self.width + x]
+
+    def is_passable(self, x: int, y: int) -> bool:
+        return self.passable[y * self.width + x] == 1
+
+    def _patch_dyn(self, ob: dict, sign: int):
+        x = int(ob.get('x'))
+        y = int(ob.get('y'))
+        if not self.in_bounds(x, y):
+            return
+        i = y * self.width + x
+        self.dyn[i] += sign * block_penalty(ob)
+        self.step[i] = self.base[i] + self.dyn[i]
+        self.version += 1
+        for fn in self.listeners:
+            fn(i)
+
+    def add_block(self, ob: dict):
+        self._patch_dyn(ob, 1)
+
+    def remove_block(self, ob: dict):
+        self._patch_dyn(ob, -1)
@@ -0,0 +1,125 @@
+import hashlib
+import heapq
+import json
+import os
+import time
+from pathlib import Path
+from agent.core import trace
+
+def _dijkstra(cm, src, targets):
+    # Forward costs from src over the cost map, stopping once every target
+    # cell is settled.
+    w = cm.width
+    H = cm.height
+    passable = cm.passable
+    step = cm.step
+    dist = {src: 0}
+    heap = [(0, src)]
+    left = set(targets)
+    left.discard(src)
+    done = set()
+    while heap and left:
+        d, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        left.discard(u)
+        uy, ux = divmod(u, w)
+        for nx, ny in ((ux + 1, uy), (ux - 1, uy), (ux, uy + 1), (ux, uy - 1)):
+            if 0 <= nx < w and 0 <= ny < H:
+                v = ny * w + nx
+                if passable[v]:
+                    nd = d + step[v]
+                    if nd < dist.get(v, nd + 1):
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+    return dist
+
+class LocationDistances:
+    # Road-distance matrix between named places, computed with one
+    # multi-target Dijkstra per place over the current CostMap. Persisted in
+    # maps/distances.json under a fingerprint of the cost map and places, so
+    # a changed map or semantic memory triggers a lazy rebuild.
+    keep = 8
+
+    def __init__(self, path: Path, costmap, locations: dict):
+        self.path = Path(path)
+        self.cm = costmap
+        self.places = {p['name']: (int(p['x']), int(p['y'])) for p in locations.get('places', [])}
+        self.matrix = {}
+        self.fp = None
+        self._version = -1
+        self._from = {}
+        self.builds = 0
+
+    def fingerprint(self) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.cm.fingerprint().encode())
+        h.update(json.dumps(sorted(self.places.items()), ensure_ascii=False).encode('utf-8'))
+        return h.hexdigest()
+
+    def ensure(self):
+        if self._version == self.cm.version and self.fp is not None:
+            return
+        fp = self.fingerprint()
+        self._version = self.cm.version
+        if fp == self.fp:
+            return
+        self.fp = fp
+        self._from = {}
+        stored = self._read()
+        entry = stored.get(fp)
+        if entry is not None:
+            self.matrix = entry['matrix']
+            return
+        with trace.span('distances.build', places=len(self.places)):
+            self.matrix = self._build()
+        stored[fp] = {'ts': int(time.time()), 'matrix': self.matrix}
+        self._write(stored)
+
+    def _build(self):
+        cm = self.cm
+        w = cm.width
+        cells = {n: y * w + x for n, (x, y) in self.places.items() if cm.in_bounds(x, y)}
+        matrix = {}
+        for a, s in cells.items():
+            dist = _dijkstra(cm, s, cells.values())
+            trace.count('distances.dijkstra')
+            matrix[a] = {b: dist[t] for b, t in cells.items() if t in dist}
+        self.builds += 1
+        return matrix
+
+    def _read(self):
+        if not self.path.exists():
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            return data.get('entries', {})
+        except Exception:
+            return {}
+
+    def _write(self, entries):
+        if len(entries) > self.keep:
+            newest = sorted(entries.items(), key=lambda kv: kv[1].get('ts', 0), reverse=True)[:self.keep]
+            entries = dict(newest)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'entries': entries}, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    def cost(self, a: str, b: str):
+        # None when either place is unknown or b is unreachable from a.
+        self.ensure()
+        return self.matrix.get(a, {}).get(b)
+
+    def cost_from(self, xy, b: str):
+        # From an arbitrary cell (e.g. config start) to a place; one Dijkstra
+        # per distinct cell, memoized until the map changes.
+        self.ensure()
+        x, y = int(xy[0]), int(xy[1])
+        if (x, y) not in self._from:
+            w = self.cm.width
+            cells = {n: py * w + px for n, (px, py) in self.places.items() if self.cm.in_bounds(px, py)}
+            trace.count('distances.dijkstra')
+            dist = _dijkstra(self.cm, y * w + x, cells.values()) if self.cm.in_bounds(x, y) else {}
+            self._from[(x, y)] = {n: dist[t] for n, t in cells.items() if t in dist}
+        return self._from[(x, y)].get(b)
@@ -0,0 +1,195 @@
+import heapq
+from array import array
+
+INF = float('inf')
+
+class DStarLite:
+    # D* Lite (Koenig & Likhachev) over CostMap cell indices. The search runs
+    # from the goal, so g[u] is the cost from u to the goal and stays valid as
+    # the robot moves; cost map patches only re-open the cells around them.
+    def __init__(self, costmap, goal):
+        self.cm = costmap
+        self.goal = (int(goal[0]), int(goal[1]))
+        self.expanded = 0
+        self.repaired = 0
+        self.pending = set()
+        self.reset_needed = False
+        self._reset()
+        costmap.listeners.append(self._on_change)
+
+    def _reset(self):
+        n = self.cm.width * self.cm.height
+        self.g = array('d', [INF]) * n
+        self.rhs = array('d', [INF]) * n
+        self.heap = []
+        self.qkey = {}
+        self.km = 0
+        self.last = None
+        self.pending.clear()
+        self.reset_needed = False
+        gx, gy = self.goal
+        if self.cm.in_bounds(gx, gy):
+            t = gy * self.cm.width + gx
+            self.rhs[t] = 0
+            self.t = t
+        else:
+            self.t = -1
+
+    def close(self):
+        try:
+            self.cm.listeners.remove(self._on_change)
+        except ValueError:
+            pass
+
+    def _on_change(self, i):
+        if i is None:
+            self.reset_needed = True
+        else:
+            self.pending.add(i)
+
+    def _neighbors(self, u):
+        w = self.cm.width
+        y, x = divmod(u, w)
+        if x + 1 < w:
+            yield u + 1
+        if x > 0:
+            yield u - 1
+        if y + 1 < self.cm.height:
+            yield u + w
+        if y > 0:
+            yield u - w
+
+    def _h(self, u):
+        w = self.cm.width
+        uy, ux = divmod(u, w)
+        sy, sx = divmod(self.s, w)
+        return abs(ux - sx) + abs(uy - sy)
+
+    def _key(self, u):
+        # Ties on k1 go to the larger g (closer to the robot), which keeps the
+        # search as narrow as forward A* on open floors. Underconsistent cells
+        # (g < rhs, raised by a cost increase) win every tie so stale low
+        # g-values are always cleared before the start can be declared final.
+        g = self.g[u]
+        rhs = self.rhs[u]
+        if g < rhs:
+            return (g + self._h(u) + self.km, -INF)
+        return (rhs + self._h(u) + self.km, -rhs)
+
+    def _push(self, u):
+        k = self._key(u)
+        self.qkey[u] = k
+        heapq.heappush(self.heap, (k[0], k[1], u))
+
+    def _update(self, u):
+        if u != self.t:
+            passable = self.cm.passable
+            step = self.cm.step
+            g = self.g
+            best = INF
+            for v in self._neighbors(u):
+                if passable[v]:
+                    c = step[v] + g[v]
+                    if c < best:
+                        best = c
+            self.rhs[u] = best
+        self.qkey.pop(u, None)
+        if self.g[u] != self.rhs[u]:
+            self._push(u)
+
+    def _top(self):
+        heap = self.heap
+        qkey = self.qkey
+        while heap:
+            k1, k2, u = heap[0]
+            if qkey.get(u) == (k1, k2):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _compute(self):
+        s = self.s
+        g = self.g
+        rhs = self.rhs
+        expanded = 0
+        while True:
+            top = self._top()
+            ks = self._key(s)
+            if top is None or ((top[0], top[1]) >= ks and rhs[s] == g[s]):
+                break
+            k1, k2, u = heapq.heappop(self.heap)
+            del self.qkey[u]
+            expanded += 1
+            knew = self._key(u)
+            if (k1, k2) < knew:
+                self._push(u)
+            elif g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for v in self._neighbors(u):
+                    self._update(v)
+            else:
+                g[u] = INF
+                self._update(u)
+                for v in self._neighbors(u):
+                    self._update(v)
+        self.expanded = expanded
+
+    def plan(self, start):
+        cm = self.cm
+        w = cm.width
+        self.expanded = 0
+        self.repaired = 0
+        sx, sy = int(start[0]), int(start[1])
+        if (sx, sy) == self.goal:
+            return [(sx, sy)]
+        if self.t < 0 or not cm.in_bounds(sx, sy):
+            return []
+        if self.reset_needed:
+            self._reset()
+        s = sy * w + sx
+        self.s = s
+        if self.last is None:
+            self._push(self.t)
+        else:
+            ly, lx = divmod(self.last, w)
+            self.km += abs(lx - sx) + abs(ly - sy)
+        self.last = s
+        if self.pending:
+            touched = set()
+            for i in self.pending:
+                touched.update(self._neighbors(i))
+            self.pending.clear()
+            for u in touched:
+                self._update(u)
+            self.repaired = len(touched)
+        self._compute()
+        return self._extract(s)
+
+    def _extract(self, s):
+        cm = self.cm
+        w = cm.width
+        passable = cm.passable
+        step = cm.step
+        g = self.g
+        if g[s] == INF:
+            return []
+        path = [s]
+        cur = s
+        for _ in range(w * cm.height):
+            if cur == self.t:
+                break
+            best = None
+            best_c = INF
+            for v in self._neighbors(cur):
+                if passable[v]:
+                    c = step[v] + g[v]
+                    if c < best_c:
+                        best_c = c
+                        best = v
+            if best is None:
+                return []
+            path.append(best)
+            cur = best
+        if cur != self.t:
+            return []
+        return [(i % w, i // w) for i in path]
@@ -0,0 +1,186 @@
+import heapq
+import weakref
+from itertools import count
+
+class DynamicBlocks(list):
+    # semantic['dynamic_blocks'] as a list of the same dicts (so JSON output
+    # and readers that iterate it are unchanged), indexed by cell for O(1)
+    # lookup and with an expire_ts heap for O(log n) TTL eviction. Heap
+    # entries are checked against the block's current expire_ts when popped,
+    # so refreshing a block just pushes a new entry. Cost maps registered with
+    # watch() are patched on every add, update and removal.
+    #
+    # Every list mutator goes through the index, and removals keep the order
+    # of the remaining blocks, so semantic.json only changes where blocks
+    # did. Several blocks may share a cell (hand-edited or merged files): as
+    # before, their penalties add up and get() returns the first, the one a
+    # new sighting refreshes.
+    def __init__(self, items=()):
+        super().__init__()
+        self.cells = {}
+        self.live = {}
+        self.heap = []
+        self.seq = count()
+        self.watchers = weakref.WeakSet()
+        self.extend(items)
+
+    def watch(self, costmap):
+        self.watchers.add(costmap)
+
+    def _cell(self, x, y):
+        return (int(x), int(y))
+
+    def get(self, x, y):
+        obs = self.cells.get(self._cell(x, y))
+        return obs[0] if obs else None
+
+    def _attach(self, ob: dict, appended: bool = True):
+        # a cell's blocks stay in list order; only an append can skip the scan
+        cell = self._cell(ob.get('x'), ob.get('y'))
+        if appended or cell not in self.cells:
+            self.cells.setdefault(cell, []).append(ob)
+        else:
+            self.cells[cell] = [o for o in self if self._cell(o.get('x'), o.get('y')) == cell]
+        self.live[id(ob)] = self.live.get(id(ob), 0) + 1
+        self._push(ob)
+        for cm in self.watchers:
+            cm.add_block(ob)
+
+    def _detach(self, ob: dict):
+        cell = self._cell(ob.get('x'), ob.get('y'))
+        obs = self.cells[cell]
+        for i, o in enumerate(obs):
+            if o is ob:
+                del obs[i]
+                break
+        if not obs:
+            del self.cells[cell]
+        n = self.live[id(ob)] - 1
+        if n:
+            self.live[id(ob)] = n
+        else:
+            del self.live[id(ob)]
+        for cm in self.watchers:
+            cm.remove_block(ob)
+
+    def add(self, ob: dict):
+        self.append(ob)
+        return ob
+
+    def append(self, ob: dict):
+        super().append(ob)
+        self._attach(ob)
+
+    def extend(self, items):
+        for ob in list(items):
+            self.append(ob)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, n):
+        items = list(self)
+        self.clear()
+        for _ in range(max(0, n)):
+            self.extend(items)
+        return self
+
+    def insert(self, i, ob: dict):
+        super().insert(i, ob)
+        self._attach(ob, appended=False)
+
+    def pop(self, i=-1):
+        ob = super().pop(i)
+        self._detach(ob)
+        return ob
+
+    def remove(self, ob: dict):
+        # list semantics: the first block equal to ob
+        self.pop(self.index(ob))
+
+    def clear(self):
+        items = list(self)
+        super().clear()
+        for ob in items:
+            self._detach(ob)
+
+    def __setitem__(self, i, value):
+        old = self[i]
+        if isinstance(i, slice):
+            value = list(value)
+        super().__setitem__(i, value)
+        for ob in (old if isinstance(i, slice) else [old]):
+            self._detach(ob)
+        for ob in (value if isinstance(i, slice) else [value]):
+            self._attach(ob, appended=False)
+
+    def __delitem__(self, i):
+        old = self[i]
+        super().__delitem__(i)
+        for ob in (old if isinstance(i, slice) else [old]):
+            self._detach(ob)
+
+    def _reorder(self):
+        cells = {}
+        for o in self:
+            cells.setdefault(self._cell(o.get('x'), o.get('y')), []).append(o)
+        self.cells = cells
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._reorder()
+
+    def reverse(self):
+        super().reverse()
+        self._reorder()
+
+    def update(self, ob: dict, **fields):
+        for cm in self.watchers:
+            cm.remove_block(ob)
+        ob.update(fields)
+        for cm in self.watchers:
+            cm.add_block(ob)
+        if 'expire_ts' in fields:
+            self._push(ob)
+        return ob
+
+    def _drop(self, obs: list):
+        # one pass over the list, keeping the order of the rest
+        gone = {id(o) for o in obs}
+        kept = []
+        removed = []
+        for o in self:
+            (removed if id(o) in gone else kept).append(o)
+        super().__setitem__(slice(None), kept)
+        for ob in removed:
+            self._detach(ob)
+
+    def discard(self, x, y) -> list:
+        # Removes every block on the cell; returns them.
+        obs = list(self.cells.get(self._cell(x, y), ()))
+        if obs:
+            self._drop(obs)
+        return obs
+
+    def _push(self, ob):
+        # entries hold the block itself, so its id stays unique while queued
+        heapq.heappush(self.heap, (int(ob.get('expire_ts', 0)), next(self.seq), ob))
+        if len(self.heap) > 2 * len(self) + 64:
+            self.heap = [(int(o.get('expire_ts', 0)), next(self.seq), o) for o in self]
+            heapq.heapify(self.heap)
+
+    def expire(self, now: int):
+        # Removes and returns blocks with expire_ts <= now.
+        out = []
+        seen = set()
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            ts, _, ob = heapq.heappop(heap)
+            if id(ob) not in self.live or id(ob) in seen or int(ob.get('expire_ts', 0)) != ts:
+                continue
+            seen.add(id(ob))
+            out.append(ob)
+        if out:
+            self._drop(out)
+        return out
@@ -0,0 +1,240 @@
+import atexit
+import heapq
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from agent.core import trace
+
+DAY = 86400.0
+
+class EpisodicIndex:
+    # Resident index over episodic.jsonl. Only bytes appended since the last
+    # refresh are parsed. Episodes are posted by (place, failed) with their
+    # ts; within a posting the retrieve score only grows with ts, so top-k
+    # needs at most k newest (plus ties) and k oldest stale entries from each
+    # posting instead of a scan and sort of the whole history. Records are
+    # kept as file offsets and re-read for the few that are returned.
+    _shared = {}
+
+    @classmethod
+    def for_path(cls, path: Path):
+        key = str(Path(path).resolve())
+        idx = cls._shared.get(key)
+        if idx is None:
+            idx = cls(path)
+            cls._shared[key] = idx
+        return idx
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.count = 0
+        self.line_start = array('q')
+        self.line_len = array('l')
+        self.postings = {}
+        self.undated = {}
+        self.ordered = True
+
+    def refresh(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            self.reset()
+            return
+        if size < self.offset:
+            self.reset()
+        if size == self.offset:
+            return
+        with self.path.open('rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b'\n')
+        if end < 0:
+            return
+        trace.count('episodic.bytes_parsed', end + 1)
+        pos = 0
+        base = self.offset
+        while pos <= end:
+            nl = data.index(b'\n', pos)
+            line = data[pos:nl].strip()
+            if line:
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    rec = None
+                if isinstance(rec, dict):
+                    self._add(rec, base + pos, nl - pos)
+            pos = nl + 1
+        self.offset = base + end + 1
+
+    def _add(self, rec, start, length):
+        seq = self.count
+        self.count += 1
+        self.line_start.append(start)
+        self.line_len.append(length)
+        key = (rec.get('place'), rec.get('result') in ('blocked', 'fail'))
+        try:
+            ts = int(rec['ts'])
+        except Exception:
+            self.undated.setdefault(key, array('q')).append(seq)
+            return
+        p = self.postings.get(key)
+        if p is None:
+            p = (array('q'), array('q'))
+            self.postings[key] = p
+        if p[0] and ts < p[0][-1]:
+            self.ordered = False
+        p[0].append(ts)
+        p[1].append(seq)
+
+    def _read(self, seqs):
+        out = {}
+        with self.path.open('rb') as f:
+            for seq in seqs:
+                f.seek(self.line_start[seq])
+                out[seq] = json.loads(f.read(self.line_len[seq]))
+        return out
+
+    def top(self, k: int, place_names, now: int):
+        # Same score and tie order (earlier line first) as a stable full sort.
+        self.refresh()
+        if k <= 0:
+            return []
+        names = set(place_names)
+        def static(key):
+            return (0.3 if key[0] in names else 0.0), (0.5 * 0.4 if key[1] else 0.0)
+        cands = []
+        for key, (tss, seqs) in self.postings.items():
+            tag, fail = static(key)
+            if self.ordered:
+                lo = bisect_right(tss, now - DAY)
+                n = len(tss)
+                first = lo
+                if n - lo > k:
+                    first = bisect_left(tss, tss[n - k], lo)
+                picks = list(range(first, n)) + list(range(min(k, lo)))
+            else:
+                picks = range(len(tss))
+            for j in picks:
+                recency = max(0, 1.0 - (now - tss[j]) / DAY)
+                cands.append((recency * 0.6 + tag - fail, -seqs[j]))
+        for key, seqs in self.undated.items():
+            tag, fail = static(key)
+            for seq in seqs[:k]:
+                cands.append((1.0 * 0.6 + tag - fail, -seq))
+        best = heapq.nlargest(k, cands)
+        recs = self._read([-s for _, s in best])
+        return [recs[-s] for _, s in best]
+
+DURABILITY = ('buffered', 'flush', 'fsync')
+
+class EpisodicWriter:
+    # Batches episodic records in memory and appends them to the file when a
+    # batch reaches max_records / max_bytes / max_delay, on flush() (reflect,
+    # retrieve) and at interpreter exit. max_delay is kept by a timer armed
+    # with the batch, so it holds even when no later write() comes. Durability per batch: 'buffered'
+    # leaves it in the file object's buffer, 'flush' hands it to the OS,
+    # 'fsync' also forces it to disk.
+    _shared = {}
+
+    @classmethod
+    def for_path(cls, path: Path, **opts):
+        key = str(Path(path).resolve())
+        w = cls._shared.get(key)
+        if w is None:
+            w = cls(path, **opts)
+            cls._shared[key] = w
+        elif opts:
+            w.configure(**opts)
+        return w
+
+    def __init__(self, path: Path, durability: str = 'flush', max_records: int = 64,
+                 max_bytes: int = 1 << 16, max_delay: float = 1.0):
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        self.buf = []
+        self.size = 0
+        self.first = None
+        self.fh = None
+        self.timer = None
+        self.flushes = 0
+        self.fsyncs = 0
+        self.written = 0
+        self.configure(durability, max_records, max_bytes, max_delay)
+        atexit.register(self.close)
+
+    def configure(self, durability: str = 'flush', max_records: int = 64,
+                  max_bytes: int = 1 << 16, max_delay: float = 1.0):
+        if durability not in DURABILITY:
+            raise ValueError(f'durability must be one of {DURABILITY}')
+        self.durability = durability
+        self.max_records = max(1, int(max_records))
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_delay = float(max_delay)
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            if self.first is None:
+                self.first = time.monotonic()
+            self.buf.append(line)
+            self.size += len(line)
+            if (len(self.buf) >= self.max_records or self.size >= self.max_bytes
+                    or time.monotonic() - self.first >= self.max_delay):
+                self.flush()
+            elif self.timer is None or not self.timer.is_alive():
+                # (a timer inherited through fork never runs in the child)
+                self.timer = threading.Timer(self.max_delay, self._due)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _due(self):
+        with self.lock:
+            if self.timer is threading.current_thread():
+                self.timer = None
+                self.flush()
+
+    def flush(self, sync: bool = False):
+        # sync=True pushes everything to the OS regardless of durability, so
+        # readers of the file (EpisodicIndex) see every record written so far.
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.buf:
+                if self.fh is None:
+                    self.fh = self.path.open('a', encoding='utf-8')
+                data = ''.join(self.buf)
+                self.fh.write(data)
+                if trace.active():
+                    trace.count('io.bytes_written', len(data.encode('utf-8')))
+                self.written += len(self.buf)
+                self.buf = []
+                self.size = 0
+                self.first = None
+                self.flushes += 1
+                if self.durability != 'buffered':
+                    self.fh.flush()
+                if self.durability == 'fsync':
+                    os.fsync(self.fh.fileno())
+                    self.fsyncs += 1
+            if sync and self.fh is not None:
+                self.fh.flush()
+
+    def close(self):
+        with self.lock:
+            self.flush(sync=True)
+            if self.fh is not None:
+                self.fh.close()
+                self.fh = None
+
+    def stats(self):
+        return {'durability': self.durability, 'pending': len(self.buf), 'written': self.written,
+                'flushes': self.flushes, 'fsyncs': self.fsyncs}
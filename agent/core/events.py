@@ -0,0 +1,184 @@
+import json
+import time
+from pathlib import Path
+from agent.core.records import Trajectory
+
+# Events yielded by Executor.stream(). Move carries one trajectory cell; the
+# record events carry the log entry (a records.LogRecord) and, when the step
+# is worth remembering, the episodic record (records.Episode) for it.
+
+class Event:
+    __slots__ = ('seq',)
+    kind = 'event'
+
+    def __init__(self, seq: int):
+        self.seq = seq
+
+    def to_dict(self) -> dict:
+        return {'seq': self.seq, 'kind': self.kind}
+
+class Move(Event):
+    __slots__ = ('pos',)
+    kind = 'move'
+
+    def __init__(self, seq: int, pos: tuple):
+        self.seq = seq
+        self.pos = pos
+
+    def to_dict(self) -> dict:
+        return {'seq': self.seq, 'kind': self.kind, 'pos': list(self.pos)}
+
+class Record(Event):
+    __slots__ = ('record', 'episode')
+    kind = 'record'
+
+    def __init__(self, seq: int, record: dict, episode: dict = None):
+        self.seq = seq
+        self.record = record
+        self.episode = episode
+
+    def to_dict(self) -> dict:
+        d = {'seq': self.seq, 'kind': self.kind}
+        d.update(self.record.to_dict())
+        return d
+
+class Step(Record):
+    __slots__ = ()
+    kind = 'step'
+
+class Block(Record):
+    __slots__ = ()
+    kind = 'block'
+
+class Replan(Record):
+    __slots__ = ()
+    kind = 'replan'
+
+class Fallback(Record):
+    __slots__ = ()
+    kind = 'fallback'
+
+# Sinks: emit(event) for every event, then close() once the stream ends or
+# abort() if it failed part way.
+
+class Sink:
+    def emit(self, ev: Event):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        self.close()
+
+class CollectSink(Sink):
+    # Rebuilds run()'s trajectory and log list.
+    def __init__(self):
+        self.trajectory = Trajectory()
+        self.logs = []
+
+    def emit(self, ev: Event):
+        if ev.kind == 'move':
+            self.trajectory.append(ev.pos)
+        else:
+            self.logs.append(ev.record)
+
+class EpisodicSink(Sink):
+    # Hands episodic records to the memory store's buffered writer.
+    def __init__(self, memory):
+        self.memory = memory
+
+    def emit(self, ev: Event):
+        if ev.kind != 'move' and ev.episode is not None:
+            self.memory.append_episodic(ev.episode)
+
+class ReflectSink(Sink):
+    # Keeps only the log records (not the trajectory) and reflects on close;
+    # mode 'background' uses the memory's reflection queue.
+    def __init__(self, memory, mode: str = 'sync'):
+        self.memory = memory
+        self.mode = mode
+        self.logs = []
+        self.result = None
+
+    def emit(self, ev: Event):
+        if ev.kind != 'move':
+            self.logs.append(ev.record)
+
+    def close(self):
+        if self.mode == 'background':
+            self.result = self.memory.submit_reflection(self.logs)
+        else:
+            self.result = self.memory.reflect(self.logs)
+
+    def abort(self):
+        # an unfinished run is not reflected on, as before
+        pass
+
+class JsonlSink(Sink):
+    # One JSON line per event, flushed every flush_every events so a tail -f
+    # or dashboard sees progress while the run is going.
+    def __init__(self, path: Path, flush_every: int = 64):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = self.path.open('w', encoding='utf-8')
+        self.flush_every = max(1, int(flush_every))
+        self.count = 0
+
+    def emit(self, ev: Event):
+        self.f.write(json.dumps(ev.to_dict(), ensure_ascii=False))
+        self.f.write('\n')
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class MetricsSink(Sink):
+    # Live counters; snapshot() is safe to call from another thread.
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.first_ms = None
+        self.counts = {}
+        self.results = {}
+        self.pos = None
+        self.done = False
+
+    def emit(self, ev: Event):
+        if self.first_ms is None:
+            self.first_ms = (time.perf_counter() - self.t0) * 1000
+        k = ev.kind
+        self.counts[k] = self.counts.get(k, 0) + 1
+        if k == 'move':
+            self.pos = ev.pos
+        else:
+            r = ev.record.get('result')
+            if r is not None:
+                self.results[r] = self.results.get(r, 0) + 1
+
+    def close(self):
+        self.done = True
+
+    def snapshot(self) -> dict:
+        return {'events': sum(self.counts.values()), 'counts': dict(self.counts), 'results': dict(self.results),
+                'pos': self.pos, 'first_event_ms': self.first_ms,
+                'elapsed_ms': (time.perf_counter() - self.t0) * 1000, 'done': self.done}
+
+def dispatch(events, sinks: list):
+    # Drives an event stream through the sinks in order; each event reaches
+    # every sink before the stream resumes.
+    try:
+        for ev in events:
+            for s in sinks:
+                s.emit(ev)
+    except BaseException:
+        for s in sinks:
+            try:
+                s.abort()
+            except Exception:
+                pass
+        raise
+    for s in sinks:
+        s.close()
+    return sinks
@@ -1,79 +1,108 @@
 import random
+from itertools import count
+from agent.core.records import LogRecord, Episode
+from agent.core.events import Move, Step, Block, Replan, Fallback, CollectSink, EpisodicSink, ReflectSink, dispatch
+from agent.core import trace
 
 class Executor:
-    def __init__(self, navigator, memory_store):
+    def __init__(self, navigator, memory_store, rng=None, reflect: str = 'sync'):
         self.navigator = navigator
         self.memory = memory_store
+        # 'background': reflection goes to the memory's queue (drain() waits)
+        self.reflect = reflect
+        # random.Random for reproducible runs; the shared global RNG otherwise
+        self.rng = rng or random
 
     def run(self, plan: dict, locations: dict, config: dict):
+        # Collects the whole stream; see stream() for incremental use.
+        collect = CollectSink()
+        self.execute(plan, locations, config, [collect])
+        return collect.trajectory, collect.logs
+
+    def execute(self, plan: dict, locations: dict, config: dict, sinks: list = ()):
+        # Runs the plan through the given sinks plus the memory ones
+        # (episodic writes, then reflection once the plan is done).
+        with trace.span('executor.execute', steps=len(plan.get('steps', []))):
+            return dispatch(self.stream(plan, locations, config),
+                            list(sinks) + [EpisodicSink(self.memory), ReflectSink(self.memory, self.reflect)])
+
+    def stream(self, plan: dict, locations: dict, config: dict):
+        # Yields Move/Step/Block/Replan/Fallback events as the plan executes.
+        # Nothing is kept here and memory is not touched; episodic records
+        # ride on the events for EpisodicSink.
+        seq = count()
         start = config.get('start', {'x':0,'y':0})
         pos = (int(start['x']), int(start['y']))
-        logs = []
-        trajectory = [pos]
+        yield Move(next(seq), pos)
         for step in plan.get('steps', []):
             if step['type'] == 'navigate':
                 target_name = step['target']
                 tgt = self._loc_xy(locations, target_name)
                 if not tgt:
-                    logs.append({'type':'navigate','target':target_name,'result':'fail','reason':'unknown_target','pos':pos})
+                    yield Step(next(seq), LogRecord('navigate', target=target_name, result='fail', reason='unknown_target', pos=pos))
                     continue
-                path = self.navigator.route(pos, tgt)
-                if not path:
-                    logs.append({'type':'navigate','target':target_name,'result':'fail','reason':'no_path','pos':pos})
-                    self.memory.append_episodic({'place':target_name,'action':'navigate','result':'fail','cost':0,'reason':'no_path'})
+                # walked lazily: in hpa mode a segment is refined only when
+                # reached, so a replan drops the unrefined rest
+                cells = self.navigator.iter_route(pos, tgt)
+                if cells is None:
+                    yield Step(next(seq), LogRecord('navigate', target=target_name, result='fail', reason='no_path', pos=pos),
+                               Episode(target_name, 'navigate', 'fail', 0, 'no_path'))
                     continue
-                i = 0
+                walked = 0
                 blocked_count = 0
-                while i < len(path):
-                    p = path[i]
-                    trajectory.append(p)
+                while True:
+                    p = next(cells, None)
+                    if p is None:
+                        break
                     pos = p
-                    if random.random() < 0.05:
-                        logs.append({'type':'navigate','target':target_name,'result':'blocked','reason':'dynamic','pos':pos})
-                        self.memory.append_episodic({'place':target_name,'action':'navigate','result':'blocked','cost':0,'reason':'dynamic'})
+                    walked += 1
+                    yield Move(next(seq), p)
+                    if self.rng.random() < 0.05:
+                        yield Block(next(seq), LogRecord('navigate', target=target_name, result='blocked', reason='dynamic', pos=pos),
+                                    Episode(target_name, 'navigate', 'blocked', 0, 'dynamic'))
                         blocked_count += 1
                         if blocked_count >= 2:
                             adj = self._adjacent_point(locations, target_name)
                             if adj:
-                                logs.append({'type':'fallback','target':target_name,'action':'inspect_adjacent','adjacent':adj,'result':'ok'})
-                                self.memory.append_episodic({'place':target_name,'action':'inspect_adjacent','result':'ok','cost':1,'reason':'busy'})
+                                yield Fallback(next(seq), LogRecord('fallback', target=target_name, action='inspect_adjacent', adjacent=adj, result='ok'),
+                                               Episode(target_name, 'inspect_adjacent', 'ok', 1, 'busy'))
                                 break
-                        new_path = self.navigator.route(pos, tgt)
-                        path = new_path
-                        i = 0
-                        continue
-                    i += 1
-                logs.append({'type':'navigate','target':target_name,'result':'ok','pos':pos})
-                self.memory.append_episodic({'place':target_name,'action':'navigate','result':'ok','cost':len(path),'reason':'none'})
+                        # the cell ahead is what blocked us; the replan patches
+                        # it into the cost map and repairs around it
+                        new_path = self.navigator.replan(pos, tgt, blocked=next(cells, None))
+                        st = self.navigator.last_stats
+                        yield Replan(next(seq), LogRecord('replan', target=target_name, pos=pos, result='ok' if new_path else 'fail', repaired=st.get('repaired', 0), expanded=st.get('expanded', 0)))
+                        cells = iter(new_path)
+                        walked = 0
+                yield Step(next(seq), LogRecord('navigate', target=target_name, result='ok', pos=pos),
+                           Episode(target_name, 'navigate', 'ok', walked, 'none'))
             elif step['type'] == 'navigate_alt':
                 target_name = step['target']
-                logs.append({'type':'navigate_alt','target':target_name,'reason': step.get('reason','')})
+                yield Step(next(seq), LogRecord('navigate_alt', target=target_name, reason=step.get('reason','')))
                 tgt = self._loc_xy(locations, target_name)
                 path = self.navigator.route(pos, tgt)
                 for p in path:
-                    trajectory.append(p)
                     pos = p
-                logs.append({'type':'navigate_alt','target':target_name,'result':'ok','pos':pos})
+                    yield Move(next(seq), p)
+                yield Step(next(seq), LogRecord('navigate_alt', target=target_name, result='ok', pos=pos))
             elif step['type'] == 'inspect_or_adjacent':
                 target_name = step['target']
-                busy = random.random() < 0.2
+                busy = self.rng.random() < 0.2
                 if busy:
                     adj = self._adjacent_point(locations, target_name)
                     if adj:
-                        logs.append({'type':'inspect_adjacent','target':target_name,'adjacent':adj,'result':'ok'})
-                        self.memory.append_episodic({'place':target_name,'action':'inspect_adjacent','result':'ok','cost':1,'reason':'busy'})
+                        yield Fallback(next(seq), LogRecord('inspect_adjacent', target=target_name, adjacent=adj, result='ok'),
+                                       Episode(target_name, 'inspect_adjacent', 'ok', 1, 'busy'))
                         continue
-                logs.append({'type':'inspect','target':target_name,'result':'ok'})
-                self.memory.append_episodic({'place':target_name,'action':'inspect','result':'ok','cost':1,'reason':'none'})
+                yield Step(next(seq), LogRecord('inspect', target=target_name, result='ok'),
+                           Episode(target_name, 'inspect', 'ok', 1, 'none'))
             elif step['type'] == 'inspect':
-                logs.append({'type':'inspect','target':step['target'],'result':'ok'})
-                self.memory.append_episodic({'place':step['target'],'action':'inspect','result':'ok','cost':1,'reason':'none'})
+                yield Step(next(seq), LogRecord('inspect', target=step['target'], result='ok'),
+                           Episode(step['target'], 'inspect', 'ok', 1, 'none'))
             elif step['type'] == 'wait':
-                logs.append({'type':'wait','duration': step.get('duration', 0), 'result':'ok', 'reason': step.get('reason','')})
+                yield Step(next(seq), LogRecord('wait', duration=step.get('duration', 0), result='ok', reason=step.get('reason','')))
             elif step['type'] == 'note':
-                logs.append({'type':'note','text': step.get('text','')})
-        delta = self.memory.reflect(logs)
-        return trajectory, logs
+                yield Step(next(seq), LogRecord('note', text=step.get('text','')))
 
     def _loc_xy(self, locations, name):
         for p in locations.get('places', []):
@@ -0,0 +1,476 @@
+import heapq
+import random
+import time
+from array import array
+from collections import OrderedDict, deque
+from agent.core.costmap import CostMap
+from agent.core.dynblocks import DynamicBlocks
+from agent.core.records import Trajectory
+
+class ReservationTable:
+    # Space-time reservations for cooperative planning: (t, cell) -> robot
+    # for occupancy and (t, a, b) -> robot for a move from cell a at t to b at
+    # t + 1 (used to forbid head-on swaps). Each robot's keys are tracked so
+    # its future can be released and replanned on its own.
+    def __init__(self):
+        self.cells = {}
+        self.edges = {}
+        self.owned = {}
+
+    def clear(self):
+        self.cells.clear()
+        self.edges.clear()
+        self.owned.clear()
+
+    def free(self, t: int, cell: int, rid: int) -> bool:
+        owner = self.cells.get((t, cell))
+        return owner is None or owner == rid
+
+    def edge_free(self, t: int, a: int, b: int, rid: int) -> bool:
+        # moving a -> b during [t, t+1] is a swap if someone moves b -> a
+        owner = self.edges.get((t, b, a))
+        return owner is None or owner == rid
+
+    def hold(self, rid: int, t: int, cell: int):
+        key = (t, cell)
+        if self.cells.get(key, rid) == rid:
+            self.cells[key] = rid
+            self.owned.setdefault(rid, ([], []))[0].append(key)
+
+    def reserve(self, rid: int, t0: int, cells: list, tail: int = 1):
+        # cells[k] at t0 + k; the last cell is also held for tail more ticks
+        own = self.owned.setdefault(rid, ([], []))
+        for k, c in enumerate(cells):
+            key = (t0 + k, c)
+            if self.cells.get(key, rid) == rid:
+                self.cells[key] = rid
+                own[0].append(key)
+            if k + 1 < len(cells) and cells[k + 1] != c:
+                e = (t0 + k, c, cells[k + 1])
+                self.edges[e] = rid
+                own[1].append(e)
+        end = t0 + len(cells) - 1
+        for k in range(1, tail + 1):
+            self.hold(rid, end + k, cells[-1])
+
+    def release(self, rid: int):
+        own = self.owned.pop(rid, None)
+        if own is None:
+            return
+        for key in own[0]:
+            if self.cells.get(key) == rid:
+                del self.cells[key]
+        for e in own[1]:
+            if self.edges.get(e) == rid:
+                del self.edges[e]
+
+class SpaceTimeAStar:
+    # Windowed cooperative A* (WHCA*) over (cell, tick) states. Actions are
+    # the four moves (cost: the cost map step of the target cell) and waiting
+    # (cost 1); states reserved by other robots are skipped. The heuristic is
+    # the unit-cost BFS distance to the goal, which only depends on the
+    # passable layer and so stays valid (admissible) as dynamic blocks come
+    # and go; it is cached per goal. The search stops at the goal, once the
+    # goal is free for the dwell time, or at the window horizon. Cost map
+    # penalties past the horizon are not seen, so a robot facing more
+    # penalty than the window is long would rather wait forever; a plan that
+    # makes no progress is therefore redone with unit move costs.
+    def __init__(self, costmap: CostMap, window: int = 16, h_cache: int = 512):
+        self.cm = costmap
+        self.window = max(2, int(window))
+        self.h_cache = h_cache
+        self.heuristics = OrderedDict()
+        self.expanded = 0
+
+    def heuristic(self, goal: int):
+        h = self.heuristics.get(goal)
+        if h is not None:
+            self.heuristics.move_to_end(goal)
+            return h
+        cm = self.cm
+        w = cm.width
+        n = w * cm.height
+        passable = cm.passable
+        h = array('i', [-1]) * n
+        if passable[goal]:
+            h[goal] = 0
+            q = deque([goal])
+            while q:
+                c = q.popleft()
+                d = h[c] + 1
+                cx = c % w
+                for ni in (c + 1 if cx + 1 < w else -1, c - 1 if cx > 0 else -1, c + w if c + w < n else -1, c - w):
+                    if ni >= 0 and passable[ni] and h[ni] < 0:
+                        h[ni] = d
+                        q.append(ni)
+        self.heuristics[goal] = h
+        while len(self.heuristics) > self.h_cache:
+            self.heuristics.popitem(last=False)
+        return h
+
+    def plan(self, rid: int, start: int, goal: int, t0: int, res: ReservationTable, dwell: int = 0):
+        # Cells for ticks t0, t0+1, ...; None if the goal is unreachable on
+        # the static map. With every action blocked the robot waits in place.
+        h = self.heuristic(goal)
+        if h[start] < 0:
+            return None
+        path = self._search(rid, start, goal, t0, res, dwell, h, self.cm.step)
+        if start != goal and h[path[-1]] >= h[start]:
+            expanded = self.expanded
+            path = self._search(rid, start, goal, t0, res, dwell, h, None)
+            self.expanded += expanded
+        return path
+
+    def _search(self, rid, start, goal, t0, res, dwell, h, step):
+        # step None: every move costs 1
+        cm = self.cm
+        w = cm.width
+        n = w * cm.height
+        passable = cm.passable
+        W = self.window
+        free = res.free
+        edge_free = res.edge_free
+        g = {start: 0}
+        parent = {}
+        heap = [(h[start], h[start], 0, start)]
+        push = heapq.heappush
+        pop = heapq.heappop
+        closed = set()
+        best = None
+        expanded = 0
+        while heap:
+            _, hc, dt, cell = pop(heap)
+            key = dt * n + cell
+            if key in closed:
+                continue
+            closed.add(key)
+            expanded += 1
+            if cell == goal and all(free(t0 + dt + k, goal, rid) for k in range(1, dwell + 1)):
+                best = key
+                break
+            if dt == W:
+                best = key
+                break
+            gc = g[key]
+            nt = dt + 1
+            t = t0 + dt
+            cx = cell % w
+            for ni in (cell, cell + 1 if cx + 1 < w else -1, cell - 1 if cx > 0 else -1,
+                       cell + w if cell + w < n else -1, cell - w):
+                if ni < 0 or not passable[ni] or h[ni] < 0:
+                    continue
+                nkey = nt * n + ni
+                if nkey in closed or not free(t + 1, ni, rid):
+                    continue
+                if ni != cell and not edge_free(t, cell, ni, rid):
+                    continue
+                ng = gc + (1 if ni == cell or step is None else step[ni])
+                old = g.get(nkey)
+                if old is None or ng < old:
+                    g[nkey] = ng
+                    parent[nkey] = key
+                    push(heap, (ng + h[ni], h[ni], nt, ni))
+        self.expanded = expanded
+        if best is None:
+            return [start]
+        path = []
+        key = best
+        while key is not None:
+            path.append(key % n)
+            key = parent.get(key)
+        path.reverse()
+        return path
+
+class Robot:
+    __slots__ = ('rid', 'pos', 'goals', 'goal', 'path', 'dwell', 'state', 'trajectory', 'reached', 'waits', 'blocked',
+                 'replan', 'stuck')
+
+    def __init__(self, rid: int, pos: int, goals: list):
+        self.rid = rid
+        self.pos = pos
+        self.goals = deque(goals)
+        self.goal = None
+        self.path = [pos]
+        self.dwell = 0
+        self.state = 'moving'
+        self.trajectory = None
+        self.reached = 0
+        self.waits = 0
+        self.blocked = 0
+        self.replan = True
+        self.stuck = 0
+
+class Fleet:
+    # N robots on one grid, one tick at a time. Every replan_every ticks all
+    # active robots replan in priority order against a cleared reservation
+    # table; in between a robot replans alone when it starts a
+    # new goal or had to give way. Before each round every robot holds its
+    # current cell for the next tick, so a higher priority robot cannot plan
+    # into a cell whose owner may be unable to leave. Moves are checked again
+    # at execution (vertex and swap conflicts resolved by priority), so the
+    # simulation stays collision-free even when planning could not avoid a
+    # conflict. Priority goes to the robot that has been on its current goal
+    # longest (then robot id), so nobody is kept waiting for ever. Robots
+    # share the memory's semantic map: a dynamic block seen by one robot is
+    # noted in memory and patches the shared cost map. A robot that finishes
+    # its mission leaves the floor.
+    def __init__(self, grid: dict, memory, window: int = 16, replan_every: int = None, dwell: int = 2,
+                 block_rate: float = 0.0, rng=None, keep_trajectories: bool = False):
+        self.memory = memory
+        semantic = memory.semantic
+        self.cm = CostMap(grid, semantic)
+        blocks = semantic.get('dynamic_blocks')
+        if isinstance(blocks, DynamicBlocks):
+            blocks.watch(self.cm)
+        self.planner = SpaceTimeAStar(self.cm, window)
+        self.res = ReservationTable()
+        self.window = self.planner.window
+        self.replan_every = max(1, int(replan_every or self.window // 2))
+        self.dwell = max(0, int(dwell))
+        self.block_rate = float(block_rate)
+        self.rng = rng or random
+        self.keep_trajectories = keep_trajectories
+        self.restarts = 3
+        self.robots = []
+        self.now = 0
+        self.plan_ms = []
+        self.tick_rows = []
+        self.stats = {'ticks': 0, 'moves': 0, 'waits': 0, 'yields': 0, 'plans': 0, 'expanded': 0, 'goals': 0,
+                      'unreachable': 0, 'blocks': 0, 'collisions': 0, 'restarts': 0}
+
+    def cell(self, x: int, y: int) -> int:
+        return y * self.cm.width + x
+
+    def xy(self, c: int) -> tuple:
+        return (c % self.cm.width, c // self.cm.width)
+
+    def add_robot(self, start: tuple, goals: list) -> Robot:
+        r = Robot(len(self.robots), self.cell(*start), [self.cell(*g) for g in goals])
+        if self.keep_trajectories:
+            r.trajectory = Trajectory([start])
+        self.robots.append(r)
+        return r
+
+    def active(self) -> list:
+        return [r for r in self.robots if r.state != 'done']
+
+    def _next_goal(self, r: Robot) -> bool:
+        h = None
+        while r.goals:
+            r.goal = r.goals.popleft()
+            h = self.planner.heuristic(r.goal)
+            if h[r.pos] >= 0:
+                return True
+            self.stats['unreachable'] += 1
+        r.goal = None
+        r.state = 'done'
+        self.res.release(r.rid)
+        return False
+
+    def _plan(self, r: Robot):
+        self.res.release(r.rid)
+        if r.state == 'dwell':
+            # stay put until the inspection is over
+            self.res.reserve(r.rid, self.now, [r.pos] * (r.dwell + 1), max(1, self.window - r.dwell))
+            r.path = [r.pos] * (r.dwell + 1)
+            r.replan = False
+            return
+        if r.goal is None and not self._next_goal(r):
+            return
+        t = time.perf_counter()
+        path = self.planner.plan(r.rid, r.pos, r.goal, self.now, self.res, self.dwell)
+        self.plan_ms.append((time.perf_counter() - t) * 1000)
+        self.stats['plans'] += 1
+        self.stats['expanded'] += self.planner.expanded
+        if path is None:
+            self.stats['unreachable'] += 1
+            r.goal = None
+            self._plan(r)
+            return
+        # the robot stays at the end of its plan until it replans, so that
+        # cell is held to the horizon (and for the dwell at a goal)
+        tail = max(self.window - (len(path) - 1), self.dwell if path[-1] == r.goal else 1)
+        self.res.reserve(r.rid, self.now, path, tail)
+        r.path = path
+        r.replan = False
+
+    def _order(self, robots: list) -> list:
+        return sorted(robots, key=lambda r: (-r.stuck, r.rid))
+
+    def _round(self, robots: list):
+        # A robot left with no plan at all was boxed in by higher priority
+        # reservations (head-on in a corridor, say): the round is planned
+        # again with the boxed-in robots first, so the others make room.
+        first = []
+        for _ in range(self.restarts + 1):
+            self.res.clear()
+            for r in robots:
+                self.res.hold(r.rid, self.now, r.pos)
+                self.res.hold(r.rid, self.now + 1, r.pos)
+            boxed = []
+            for r in robots:
+                self._plan(r)
+                if r.state == 'moving' and len(r.path) == 1 and r.goal is not None and r.pos != r.goal:
+                    boxed.append(r)
+            if not boxed:
+                return
+            self.stats['restarts'] += 1
+            first += [r for r in boxed if r not in first]
+            robots = first + [r for r in robots if r not in first]
+
+    def tick(self) -> dict:
+        t0 = time.perf_counter()
+        robots = self._order(self.active())
+        plans = self.stats['plans']
+        if self.now % self.replan_every == 0:
+            self._round(robots)
+        else:
+            for r in robots:
+                if r.replan or len(r.path) < 2:
+                    self._plan(r)
+        robots = [r for r in robots if r.state != 'done']
+        # intended moves, then conflicts resolved by priority until stable
+        at = {r.pos: r for r in robots}
+        nxt = {}
+        blocked = []
+        for r in robots:
+            c = r.path[1] if len(r.path) > 1 else r.pos
+            if c != r.pos and self.block_rate and self.rng.random() < self.block_rate:
+                # the next cell turned out blocked: note it for everyone
+                blocked.append(c)
+                r.blocked += 1
+                r.replan = True
+                c = r.pos
+            nxt[r.rid] = c
+        for c in blocked:
+            self.memory.note_block(*self.xy(c))
+        yielded = set()
+        changed = True
+        while changed:
+            changed = False
+            owner = {}
+            for r in robots:
+                c = nxt[r.rid]
+                o = owner.get(c)
+                if o is None:
+                    owner[c] = r
+                    continue
+                # the lower priority mover gives way; a robot staying put
+                # keeps its cell against anyone moving in
+                mover = r if c != r.pos else o
+                nxt[mover.rid] = mover.pos
+                yielded.add(mover.rid)
+                changed = True
+                break
+            if changed:
+                continue
+            for r in robots:
+                c = nxt[r.rid]
+                if c == r.pos:
+                    continue
+                o = at.get(c)
+                if o is not None and o is not r and nxt[o.rid] == r.pos:
+                    nxt[r.rid] = r.pos
+                    nxt[o.rid] = o.pos
+                    yielded.add(r.rid)
+                    yielded.add(o.rid)
+                    changed = True
+                    break
+        moves = waits = reached = 0
+        for r in robots:
+            c = nxt[r.rid]
+            if r.rid in yielded or r.replan:
+                # gave way or was blocked: stays and replans next tick
+                r.replan = True
+                r.waits += 1
+                r.stuck += 1
+                waits += 1
+                if r.trajectory is not None:
+                    r.trajectory.append(self.xy(r.pos))
+                continue
+            if c != r.pos:
+                moves += 1
+            else:
+                waits += 1
+                r.waits += 1
+            if r.state != 'dwell':
+                r.stuck += 1
+            r.pos = c
+            r.path = r.path[1:] if len(r.path) > 1 else [c]
+            if r.trajectory is not None:
+                r.trajectory.append(self.xy(c))
+            if r.state == 'dwell':
+                r.dwell -= 1
+                if r.dwell <= 0:
+                    r.state = 'moving'
+                    r.goal = None
+                    r.replan = True
+            elif c == r.goal and len(r.path) == 1:
+                reached += 1
+                r.reached += 1
+                r.stuck = 0
+                if self.dwell:
+                    r.state = 'dwell'
+                    r.dwell = self.dwell
+                else:
+                    r.goal = None
+                    r.replan = True
+        # every active robot on a distinct cell
+        cells = [r.pos for r in robots]
+        self.stats['collisions'] += len(cells) - len(set(cells))
+        self.now += 1
+        ms = (time.perf_counter() - t0) * 1000
+        row = {'tick': self.now, 'active': len(robots), 'moves': moves, 'waits': waits, 'yields': len(yielded),
+               'blocks': len(blocked), 'goals': reached, 'plans': self.stats['plans'] - plans, 'ms': round(ms, 3)}
+        self.tick_rows.append(row)
+        s = self.stats
+        s['ticks'] += 1
+        s['moves'] += moves
+        s['waits'] += waits
+        s['yields'] += len(yielded)
+        s['blocks'] += len(blocked)
+        s['goals'] += reached
+        return row
+
+    def run(self, max_ticks: int) -> dict:
+        t0 = time.perf_counter()
+        while self.now < max_ticks and self.active():
+            self.tick()
+        return self.summary(time.perf_counter() - t0)
+
+    def summary(self, wall_s: float) -> dict:
+        s = dict(self.stats)
+        ms = sorted(self.plan_ms)
+        tick_ms = sorted(r['ms'] for r in self.tick_rows)
+        def pct(v, q):
+            return round(v[min(len(v) - 1, int(q * len(v)))], 3) if v else 0.0
+        s.update({
+            'robots': len(self.robots),
+            'finished': sum(1 for r in self.robots if r.state == 'done'),
+            'window': self.window,
+            'replan_every': self.replan_every,
+            'wall_s': round(wall_s, 3),
+            'robot_steps_per_s': round(sum(r['active'] for r in self.tick_rows) / wall_s, 1) if wall_s > 0 else 0.0,
+            'ticks_per_s': round(s['ticks'] / wall_s, 1) if wall_s > 0 else 0.0,
+            'tick_ms_p50': pct(tick_ms, 0.5),
+            'tick_ms_p95': pct(tick_ms, 0.95),
+            'tick_ms_max': pct(tick_ms, 1.0),
+            'plan_ms_p50': pct(ms, 0.5),
+            'plan_ms_p95': pct(ms, 0.95),
+            'plan_ms_max': pct(ms, 1.0),
+        })
+        return s
+
+def random_missions(grid: dict, robots: int, goals_per_robot: int, rng=None, places: list = None):
+    # Distinct free start cells and goal lists per robot; goals are drawn
+    # from places ((x, y) list) when given, else from every free cell.
+    rng = rng or random
+    w = int(grid['width'])
+    H = int(grid['height'])
+    g = grid['grid']
+    free = [(x, y) for y in range(min(H, len(g))) for x in range(min(w, len(g[y]))) if g[y][x] == 0]
+    if robots > len(free):
+        raise ValueError(f'{robots} robots do not fit on {len(free)} free cells')
+    starts = rng.sample(free, robots)
+    pool = places or free
+    return [(s, [rng.choice(pool) for _ in range(goals_per_robot)]) for s in starts]
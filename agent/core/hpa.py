@@ -0,0 +1,363 @@
+import heapq
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from agent.core import trace
+
+# Abstract graphs already built in this process, keyed by (cost map
+# fingerprint, cluster size): every Navigator of a CLI run or eval worker on
+# an unchanged map shares one build.
+GRAPHS = OrderedDict()
+
+class HierarchicalRouter:
+    # HPA* over a CostMap: the grid is cut into cluster_size x cluster_size
+    # clusters, entrances on shared borders become abstract nodes, and each
+    # cluster stores the cost between its own nodes. Edge costs are directed
+    # (entering a cell costs its step value), matching GridAStar.
+    #
+    # The cluster graph is reused across routers: from GRAPHS in-process and,
+    # with a store path (maps/hpa.json), across runs under the cost map
+    # fingerprint, as LocationDistances does for its matrix.
+    keep = 4
+
+    def __init__(self, costmap, cluster_size: int = 16, store: Path = None):
+        self.cm = costmap
+        self.store = Path(store) if store is not None else None
+        self.cs = max(2, int(cluster_size))
+        self.cw = (costmap.width + self.cs - 1) // self.cs
+        self.ch = (costmap.height + self.cs - 1) // self.cs
+        self.dirty = set()
+        self.stale = True
+        self.expanded = 0
+        self.refined = 0
+        self.rebuilt = 0
+        costmap.listeners.append(self._on_change)
+
+    def close(self):
+        try:
+            self.cm.listeners.remove(self._on_change)
+        except ValueError:
+            pass
+
+    def _on_change(self, i):
+        if i is None:
+            self.stale = True
+        else:
+            self.dirty.add(self._cluster_of(i))
+
+    def _cluster_of(self, i):
+        y, x = divmod(i, self.cm.width)
+        return (y // self.cs) * self.cw + (x // self.cs)
+
+    def _bounds(self, c):
+        cy, cx = divmod(c, self.cw)
+        x0 = cx * self.cs
+        y0 = cy * self.cs
+        return x0, min(self.cm.width, x0 + self.cs) - 1, y0, min(self.cm.height, y0 + self.cs) - 1
+
+    def build(self):
+        key = (self.cm.fingerprint(), self.cs)
+        graph = GRAPHS.get(key)
+        if graph is None and self.store is not None:
+            graph = self._read().get(f'{key[0]}:{self.cs}')
+        if graph is not None:
+            trace.count('hpa.graph_reused')
+            self._load(graph)
+            self.rebuilt = 0
+        else:
+            with trace.span('hpa.build', clusters=self.cw * self.ch):
+                self._build()
+            self.rebuilt = self.cw * self.ch
+            graph = self._dump()
+            if self.store is not None:
+                stored = self._read()
+                stored[f'{key[0]}:{self.cs}'] = graph
+                self._write(stored)
+        GRAPHS[key] = graph
+        GRAPHS.move_to_end(key)
+        while len(GRAPHS) > self.keep:
+            GRAPHS.popitem(last=False)
+        self.stale = False
+        self.dirty.clear()
+
+    def _dump(self):
+        # JSON-ready and never mutated; refresh() patches the router's own copy
+        return {'ts': int(time.time()),
+                'nodes': [[c, sorted(v)] for c, v in self.nodes.items() if v],
+                'inter': [[u, sorted(v)] for u, v in self.inter.items()],
+                'edges': [[u, [x for v, c in e.items() for x in (v, c)]] for u, e in self.edges.items()]}
+
+    def _load(self, graph):
+        self.nodes = {c: set() for c in range(self.cw * self.ch)}
+        for c, cells in graph['nodes']:
+            self.nodes[c] = set(cells)
+        self.inter = {u: set(v) for u, v in graph['inter']}
+        self.edges = {u: dict(zip(e[::2], e[1::2])) for u, e in graph['edges']}
+
+    def _read(self):
+        if not self.store.exists():
+            return {}
+        try:
+            return json.loads(self.store.read_text(encoding='utf-8')).get('entries', {})
+        except Exception:
+            return {}
+
+    def _write(self, entries):
+        if len(entries) > self.keep:
+            entries = dict(sorted(entries.items(), key=lambda kv: kv[1].get('ts', 0), reverse=True)[:self.keep])
+        tmp = self.store.with_name(f'{self.store.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'entries': entries}, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, self.store)
+
+    def _build(self):
+        cm = self.cm
+        w = cm.width
+        passable = cm.passable
+        self.nodes = {c: set() for c in range(self.cw * self.ch)}
+        self.edges = {}
+        self.inter = {}
+        def link(a, b):
+            self.nodes[self._cluster_of(a)].add(a)
+            self.nodes[self._cluster_of(b)].add(b)
+            self.inter.setdefault(a, set()).add(b)
+            self.inter.setdefault(b, set()).add(a)
+        def scan(cells):
+            # cells: (a, b) pairs across one border; one transition per short
+            # entrance, two (its ends) for entrances of 6 cells or more.
+            run = []
+            for a, b in cells + [(None, None)]:
+                if a is not None and passable[a] and passable[b]:
+                    run.append((a, b))
+                    continue
+                if run:
+                    if len(run) < 6:
+                        link(*run[len(run) // 2])
+                    else:
+                        link(*run[0])
+                        link(*run[-1])
+                    run = []
+        for c in range(self.cw * self.ch):
+            x0, x1, y0, y1 = self._bounds(c)
+            if x1 + 1 < w:
+                scan([(y * w + x1, y * w + x1 + 1) for y in range(y0, y1 + 1)])
+            if y1 + 1 < cm.height:
+                scan([(y1 * w + x, (y1 + 1) * w + x) for x in range(x0, x1 + 1)])
+        for c in range(self.cw * self.ch):
+            self._build_cluster(c)
+
+    def _build_cluster(self, c):
+        step = self.cm.step
+        nodes = self.nodes[c]
+        for u in nodes:
+            e = {v: step[v] for v in self.inter.get(u, ())}
+            dist, _ = self._local(u, self._bounds(c), nodes)
+            for v in nodes:
+                if v != u and v in dist:
+                    e[v] = dist[v]
+            self.edges[u] = e
+
+    def refresh(self):
+        if self.stale:
+            self.build()
+            return
+        self.rebuilt = 0
+        if not self.dirty:
+            return
+        step = self.cm.step
+        for c in self.dirty:
+            self._build_cluster(c)
+            # inter edges entering this cluster carry the entered cell's cost
+            for u in self.nodes[c]:
+                for v in self.inter.get(u, ()):
+                    self.edges[v][u] = step[u]
+        self.rebuilt = len(self.dirty)
+        self.dirty.clear()
+
+    def _local(self, src, bounds, targets=None, goal=None, reverse=False):
+        # Dijkstra confined to one cluster. Forward: cost src -> cell.
+        # Reverse: cost cell -> src (pays each entered cell, src included).
+        cm = self.cm
+        w = cm.width
+        passable = cm.passable
+        step = cm.step
+        x0, x1, y0, y1 = bounds
+        dist = {src: 0}
+        parent = {src: -1}
+        heap = [(0, src)]
+        left = len(targets) if targets else -1
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            self.expanded += 1
+            if u == goal:
+                break
+            if targets and u in targets:
+                left -= 1
+                if left == 0:
+                    break
+            uy, ux = divmod(u, w)
+            for nx, ny in ((ux + 1, uy), (ux - 1, uy), (ux, uy + 1), (ux, uy - 1)):
+                if nx < x0 or nx > x1 or ny < y0 or ny > y1:
+                    continue
+                v = ny * w + nx
+                if not passable[v]:
+                    continue
+                nd = d + (step[u] if reverse else step[v])
+                if v not in dist or nd < dist[v]:
+                    dist[v] = nd
+                    parent[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return dist, parent
+
+    def _connect(self, src, other, reverse=False):
+        # Costs between a query endpoint and the abstract nodes of its own
+        # cluster, plus those reached through a direct border step out of
+        # (or into) it. `other` is included when it is found on the way.
+        cm = self.cm
+        w = cm.width
+        step = cm.step
+        c = self._cluster_of(src)
+        dist, _ = self._local(src, self._bounds(c), self.nodes[c] | {other}, reverse=reverse)
+        out = {v: dist[v] for v in self.nodes[c] | {other} if v in dist and v != src}
+        y, x = divmod(src, w)
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if not cm.in_bounds(nx, ny):
+                continue
+            v = ny * w + nx
+            cv = self._cluster_of(v)
+            if cv == c or not cm.passable[v]:
+                continue
+            hop = step[src] if reverse else step[v]
+            d2, _ = self._local(v, self._bounds(cv), self.nodes[cv] | {other}, reverse=reverse)
+            for n, d in d2.items():
+                if n in self.nodes[cv] or n == other:
+                    if n != src and (n not in out or hop + d < out[n]):
+                        out[n] = hop + d
+        return out
+
+    def abstract_route(self, start, goal):
+        cm = self.cm
+        w = cm.width
+        self.refresh()
+        self.expanded = 0
+        sx, sy = int(start[0]), int(start[1])
+        gx, gy = int(goal[0]), int(goal[1])
+        if not (cm.in_bounds(sx, sy) and cm.in_bounds(gx, gy)):
+            return []
+        s = sy * w + sx
+        t = gy * w + gx
+        if s == t:
+            return [s]
+        if not cm.passable[t]:
+            return []
+        out_s = self._connect(s, t)
+        into_t = self._connect(t, s, reverse=True)
+        def succ(u):
+            if u == s:
+                yield from out_s.items()
+                return
+            for v, c in self.edges.get(u, {}).items():
+                yield v, c
+            if u in into_t:
+                yield t, into_t[u]
+        def h(u):
+            uy, ux = divmod(u, w)
+            return abs(ux - gx) + abs(uy - gy)
+        g = {s: 0}
+        parent = {s: None}
+        heap = [(h(s), 0, s)]
+        closed = set()
+        while heap:
+            _, gu, u = heapq.heappop(heap)
+            if u in closed:
+                continue
+            closed.add(u)
+            self.expanded += 1
+            if u == t:
+                break
+            for v, c in succ(u):
+                if v in closed:
+                    continue
+                ng = gu + c
+                if v not in g or ng < g[v]:
+                    g[v] = ng
+                    parent[v] = u
+                    heapq.heappush(heap, (ng + h(v), ng, v))
+        if t not in closed:
+            return []
+        out = []
+        cur = t
+        while cur is not None:
+            out.append(cur)
+            cur = parent[cur]
+        out.reverse()
+        return out
+
+    def refine(self, a, b):
+        # Concrete cells from abstract node a to b (a excluded).
+        if b in self.inter.get(a, ()):
+            self.refined += 1
+            return [b]
+        ba = self._bounds(self._cluster_of(a))
+        bb = self._bounds(self._cluster_of(b))
+        # endpoint links may step across a border: search both clusters then
+        bounds = (min(ba[0], bb[0]), max(ba[1], bb[1]), min(ba[2], bb[2]), max(ba[3], bb[3]))
+        _, parent = self._local(a, bounds, goal=b)
+        if b not in parent:
+            return []
+        seg = []
+        cur = b
+        while cur != a:
+            seg.append(cur)
+            cur = parent[cur]
+        seg.reverse()
+        self.refined += 1
+        return seg
+
+    def iter_route(self, start, goal):
+        return self.iter_refined(self.abstract_route(start, goal))
+
+    def iter_refined(self, abstract):
+        # Yields cells segment by segment; a segment is refined only when the
+        # consumer reaches it, so abandoned tails (replans) cost nothing.
+        w = self.cm.width
+        if not abstract:
+            return
+        y, x = divmod(abstract[0], w)
+        yield (x, y)
+        for a, b in zip(abstract, abstract[1:]):
+            for c in self.refine(a, b):
+                y, x = divmod(c, w)
+                yield (x, y)
+
+    def route(self, start, goal):
+        self.refined = 0
+        return list(self.iter_route(start, goal))
+
+def measure_quality(navigator, router, pairs):
+    # Path cost and latency of HPA* against flat A* on the same cost map.
+    rows = []
+    for a, b in pairs:
+        t0 = time.perf_counter()
+        flat = navigator.astar.search(a, b)
+        t1 = time.perf_counter()
+        hier = router.route(a, b)
+        t2 = time.perf_counter()
+        fc = navigator.path_cost(flat) if flat else None
+        hc = navigator.path_cost(hier) if hier else None
+        rows.append({'start': a, 'goal': b, 'flat_cost': fc, 'hpa_cost': hc,
+                     'ratio': (hc / fc) if fc and hc is not None else (1.0 if fc == hc else None),
+                     'flat_ms': round((t1 - t0) * 1000, 3), 'hpa_ms': round((t2 - t1) * 1000, 3)})
+    found = [r for r in rows if r['ratio'] is not None]
+    summary = {
+        'pairs': len(rows),
+        'mismatch': sum(1 for r in rows if (r['flat_cost'] is None) != (r['hpa_cost'] is None)),
+        'mean_ratio': (sum(r['ratio'] for r in found) / len(found)) if found else None,
+        'max_ratio': max((r['ratio'] for r in found), default=None),
+        'flat_ms': round(sum(r['flat_ms'] for r in rows), 3),
+        'hpa_ms': round(sum(r['hpa_ms'] for r in rows), 3),
+    }
+    return summary, rows
@@ -1,35 +1,135 @@
+import asyncio
 import json
-from openai import OpenAI
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agent.core.util import optional_import
+from agent.core.llm_cache import cache_key
+from agent.core import trace
+
+openai = optional_import('openai')
 
 API_KEY = None
 BASE_URL = 'https://api.openai.com/v1'
 CLIENT = None
+CACHE = None
+MODEL = 'gpt-4o-mini'
+TEMPERATURE = 0.2
+# in-flight limit, per-attempt timeout (s), extra attempts and first backoff (s)
+MAX_CONCURRENCY = 4
+TIMEOUT = 30.0
+RETRIES = 2
+BACKOFF = 0.5
+
+_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_POOL = None
+_POOL_LOCK = threading.Lock()
+STATS = {'calls': 0, 'attempts': 0, 'retries': 0, 'failures': 0}
 
-def configure(api_key: str, base_url: str):
-    global API_KEY, BASE_URL, CLIENT
+def configure(api_key: str, base_url: str, max_concurrency: int = None, timeout: float = None, retries: int = None):
+    global API_KEY, BASE_URL, CLIENT, MAX_CONCURRENCY, TIMEOUT, RETRIES, _SLOTS, _POOL
     API_KEY = api_key
     BASE_URL = base_url.rstrip('/')
-    CLIENT = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+    if timeout is not None:
+        TIMEOUT = float(timeout)
+    if retries is not None:
+        RETRIES = max(0, int(retries))
+    if max_concurrency is not None and int(max_concurrency) != MAX_CONCURRENCY:
+        MAX_CONCURRENCY = max(1, int(max_concurrency))
+        _SLOTS = threading.BoundedSemaphore(MAX_CONCURRENCY)
+        with _POOL_LOCK:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+                _POOL = None
+    # retries are done here, not by the SDK, so they share the backoff policy
+    CLIENT = openai.OpenAI(api_key=API_KEY, base_url=BASE_URL, max_retries=0) if openai is not None else None
+
+def set_cache(cache):
+    # cache: llm_cache.ResponseCache or None
+    global CACHE
+    CACHE = cache if cache is not None and cache.mode != 'off' else None
+
+def _pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='llm')
+        return _POOL
+
+def _complete(system: str, user: str, max_tokens: int):
+    r = CLIENT.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {'role':'system','content':system},
+            {'role':'user','content':user}
+        ],
+        max_tokens=max_tokens,
+        temperature=TEMPERATURE,
+        timeout=TIMEOUT
+    )
+    usage = getattr(r, 'usage', None)
+    if usage is not None:
+        trace.count('llm.tokens', getattr(usage, 'total_tokens', 0) or 0)
+    return r.choices[0].message.content
 
 def chat(system: str, user: str, max_tokens: int = 512):
+    # Blocking call; at most MAX_CONCURRENCY run at once across threads.
+    # Failed attempts are retried with jittered exponential backoff; None
+    # when unconfigured or every attempt failed. With a response cache set,
+    # hits skip the network; replay mode raises CacheMiss instead of calling.
+    with trace.span('llm.chat', max_tokens=max_tokens):
+        return _chat(system, user, max_tokens)
+
+def _chat(system: str, user: str, max_tokens: int):
+    cache = CACHE
+    key = None
+    if cache is not None:
+        key = cache_key(MODEL, system, user, {'max_tokens': max_tokens, 'temperature': TEMPERATURE})
+        if cache.readable:
+            content = cache.get(key)
+            if content is not None:
+                trace.count('llm.cache_hits')
+                return content
     if CLIENT is None:
         return None
-    try:
-        r = CLIENT.chat.completions.create(
-            model='gpt-4o-mini',
-            messages=[
-                {'role':'system','content':system},
-                {'role':'user','content':user}
-            ],
-            max_tokens=max_tokens,
-            temperature=0.2
-        )
-        return r.choices[0].message.content
-    except Exception:
-        return None
+    STATS['calls'] += 1
+    trace.count('llm.calls')
+    for attempt in range(RETRIES + 1):
+        if attempt:
+            STATS['retries'] += 1
+            trace.count('llm.retries')
+            time.sleep(BACKOFF * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        STATS['attempts'] += 1
+        with _SLOTS:
+            try:
+                content = _complete(system, user, max_tokens)
+            except Exception:
+                continue
+        if cache is not None and cache.writable and content is not None:
+            cache.put(key, content, {'model': MODEL, 'max_tokens': max_tokens, 'temperature': TEMPERATURE})
+        return content
+    STATS['failures'] += 1
+    trace.count('llm.failures')
+    return None
 
-def json_response(system: str, user: str, schema_hint: str):
-    content = chat(system, user + "\n" + schema_hint, max_tokens=800)
+def submit(fn, *args, **kwargs):
+    # Runs fn on the LLM thread pool; returns a Future.
+    return _pool().submit(fn, *args, **kwargs)
+
+def submit_chat(system: str, user: str, max_tokens: int = 512):
+    return submit(chat, system, user, max_tokens)
+
+def chat_many(requests: list):
+    # requests: dicts of chat() keyword arguments; results keep their order.
+    futures = [submit_chat(**r) for r in requests]
+    return [f.result() for f in futures]
+
+async def achat(system: str, user: str, max_tokens: int = 512):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool(), chat, system, user, max_tokens)
+
+def parse_json(content):
     if not content:
         return None
     try:
@@ -43,3 +143,9 @@ def json_response(system: str, user: str, schema_hint: str):
         except Exception:
             return None
     return None
+
+def json_response(system: str, user: str, schema_hint: str):
+    return parse_json(chat(system, user + "\n" + schema_hint, max_tokens=800))
+
+async def ajson_response(system: str, user: str, schema_hint: str):
+    return parse_json(await achat(system, user + "\n" + schema_hint, max_tokens=800))
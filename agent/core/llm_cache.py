@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+MODES = ('off', 'on', 'record', 'replay')
+
+class CacheMiss(LookupError):
+    pass
+
+def cache_key(model: str, system: str, user: str, params: dict) -> str:
+    blob = json.dumps({'model': model, 'system': system, 'user': user, 'params': params},
+                      ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    # Content-addressed LLM responses, one JSON file per key under
+    # root/<key[:2]>/<key>.json. Modes: 'on' reads and writes, 'record'
+    # always calls the model and overwrites, 'replay' only reads and raises
+    # CacheMiss instead of calling out. Bounded by entry count and bytes with
+    # LRU eviction; file mtimes carry recency across runs.
+    def __init__(self, root: Path, mode: str = 'on', max_entries: int = 5000, max_bytes: int = 64 << 20):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}')
+        self.root = Path(root)
+        self.mode = mode
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        if mode != 'off':
+            self._scan()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / (key + '.json')
+
+    def _scan(self):
+        found = []
+        if self.root.exists():
+            for p in self.root.glob('*/*.json'):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                found.append((st.st_mtime, p.stem, st.st_size))
+        found.sort()
+        for _, key, size in found:
+            self.entries[key] = size
+            self.bytes += size
+        self._evict()
+
+    @property
+    def readable(self) -> bool:
+        return self.mode in ('on', 'replay')
+
+    @property
+    def writable(self) -> bool:
+        return self.mode in ('on', 'record')
+
+    def get(self, key: str):
+        # Cached response text or None. Strict replay raises CacheMiss.
+        with self.lock:
+            known = key in self.entries
+        data = None
+        if known:
+            p = self._path(key)
+            try:
+                data = json.loads(p.read_text(encoding='utf-8'))
+                os.utime(p)
+            except (OSError, ValueError):
+                data = None
+        with self.lock:
+            if data is None:
+                self.misses += 1
+                if known:
+                    self.bytes -= self.entries.pop(key, 0)
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        if data is None:
+            if self.mode == 'replay':
+                raise CacheMiss(key)
+            return None
+        return data.get('response')
+
+    def put(self, key: str, response: str, meta: dict = None):
+        rec = dict(meta or {})
+        rec.update({'key': key, 'ts': int(time.time()), 'response': response})
+        text = json.dumps(rec, ensure_ascii=False)
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f'{p.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(text, encoding='utf-8')
+        os.replace(tmp, p)
+        size = len(text.encode('utf-8'))
+        with self.lock:
+            self.bytes += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            self.writes += 1
+            self._evict()
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            key, size = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'mode': self.mode, 'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits,
+                'misses': self.misses, 'writes': self.writes, 'evictions': self.evictions,
+                'hit_rate': (self.hits / total) if total else 0.0}
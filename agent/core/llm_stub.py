@@ -0,0 +1,127 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local OpenAI-compatible stub for exercising agent.core.llm without a real
+# endpoint: POST {base}/chat/completions answers after `latency` seconds
+# (plus up to `jitter`), fails with HTTP 500 at `fail_rate`. Planner prompts
+# get a navigate/inspect plan over the places named in the task; anything
+# else gets a one-line tip.
+
+def default_reply(system: str, user: str) -> str:
+    try:
+        payload = json.loads(user.split('\n', 1)[0])
+    except Exception:
+        payload = None
+    if isinstance(payload, dict) and 'task' in payload and 'locations' in payload:
+        names = payload['locations']
+        order = [n for n in re.findall(r'[A-Za-z_]+', payload['task']) if n in names]
+        order = list(dict.fromkeys(order)) or names
+        steps = []
+        for n in order:
+            steps.append({'type': 'navigate', 'target': n})
+            steps.append({'type': 'inspect', 'target': n})
+        return json.dumps({'order': order, 'steps': steps, 'milestones': [], 'notes': [], 'rationale': 'stub', 'errors': []}, ensure_ascii=False)
+    return '下次应先确认动态阻塞再导航。'
+
+class StubServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 fail_rate: float = 0.0, reply=default_reply):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.reply = reply
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.latency + random.random() * stub.jitter)
+                    if not self.path.rstrip('/').endswith('/chat/completions'):
+                        return self._send(404, {'error': {'message': 'not found'}})
+                    if random.random() < stub.fail_rate:
+                        return self._send(500, {'error': {'message': 'injected failure'}})
+                    req = json.loads(body or b'{}')
+                    msgs = {m.get('role'): m.get('content', '') for m in req.get('messages', [])}
+                    content = stub.reply(msgs.get('system', ''), msgs.get('user', ''))
+                    # rough counts (~4 chars a token) so usage-based counters see something
+                    pt = sum(len(m) for m in msgs.values()) // 4
+                    ct = len(content) // 4
+                    self._send(200, {
+                        'id': f'stub-{stub.requests}',
+                        'object': 'chat.completion',
+                        'created': int(time.time()),
+                        'model': req.get('model', 'stub'),
+                        'choices': [{'index': 0, 'finish_reason': 'stop',
+                                     'message': {'role': 'assistant', 'content': content}}],
+                        'usage': {'prompt_tokens': pt, 'completion_tokens': ct, 'total_tokens': pt + ct},
+                    })
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def _send(self, code, obj):
+                data = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency_ms', type=float, default=200)
+    parser.add_argument('--jitter_ms', type=float, default=0)
+    parser.add_argument('--fail_rate', type=float, default=0.0)
+    args = parser.parse_args()
+    stub = StubServer(args.host, args.port, args.latency_ms / 1000.0, args.jitter_ms / 1000.0, args.fail_rate)
+    print('LLM stub at', stub.base_url)
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
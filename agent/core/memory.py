@@ -1,10 +1,19 @@
 import json
+import threading
 import time
+from concurrent.futures import Future
 from pathlib import Path
 from agent.core.llm import chat
+from agent.core.llm_cache import CacheMiss
+from agent.core.episodic import EpisodicIndex, EpisodicWriter
+from agent.core.persist import JsonDocument
+from agent.core.dynblocks import DynamicBlocks
+from agent.core.reflection import ReflectionQueue
+from agent.core.records import as_dicts
+from agent.core import trace
 
 class MemoryStore:
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, options: dict = None):
         self.root = Path(root)
         self.root.mkdir(parents=True, exist_ok=True)
         self.ep_path = self.root / 'episodic.jsonl'
@@ -12,52 +21,56 @@ class MemoryStore:
         self.proc_path = self.root / 'procedural.json'
         if not self.ep_path.exists():
             self.ep_path.write_text('', encoding='utf-8')
-        if not self.sem_path.exists():
-            self.sem_path.write_text(json.dumps({"aliases":{},"obstacles":[],"high_cost_zones":[],"time_windows":[],"dynamic_blocks":[]}, ensure_ascii=False), encoding='utf-8')
-        if not self.proc_path.exists():
-            self.proc_path.write_text(json.dumps({"skills":{}}, ensure_ascii=False), encoding='utf-8')
-        self.semantic = json.loads(self.sem_path.read_text(encoding='utf-8'))
-        if 'dynamic_blocks' not in self.semantic:
-            self.semantic['dynamic_blocks'] = []
-        self.procedural = json.loads(self.proc_path.read_text(encoding='utf-8'))
+        self.sem_doc = JsonDocument.for_path(self.sem_path)
+        self.proc_doc = JsonDocument.for_path(self.proc_path)
+        self.semantic = self.sem_doc.load({"aliases":{},"obstacles":[],"high_cost_zones":[],"time_windows":[],"dynamic_blocks":[]})
+        self.semantic['dynamic_blocks'] = DynamicBlocks(self.semantic.get('dynamic_blocks', []))
+        self.procedural = self.proc_doc.load({"skills":{}})
+        self.episodic_index = EpisodicIndex.for_path(self.ep_path)
+        opts = options or {}
+        self.episodic_writer = EpisodicWriter.for_path(
+            self.ep_path,
+            durability=opts.get('durability', 'flush'),
+            max_records=opts.get('batch_records', 64),
+            max_bytes=opts.get('batch_bytes', 1 << 16),
+            max_delay=opts.get('batch_ms', 1000) / 1000.0,
+        )
+        self.coalesce = opts.get('save_coalesce_ms', 0) / 1000.0
+        # guards semantic/procedural against the reflection worker
+        self.lock = threading.RLock()
+        self.reflections = None
 
-    def append_episodic(self, record: dict):
+    def append_episodic(self, record):
+        if not isinstance(record, dict):
+            record = record.to_dict()
         record['ts'] = record.get('ts') or int(time.time())
-        with self.ep_path.open('a', encoding='utf-8') as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.episodic_writer.write(record)
+
+    def flush(self):
+        self.episodic_writer.flush(sync=True)
 
-    def save(self):
-        self.sem_path.write_text(json.dumps(self.semantic, ensure_ascii=False, indent=2), encoding='utf-8')
-        self.proc_path.write_text(json.dumps(self.procedural, ensure_ascii=False, indent=2), encoding='utf-8')
+    def save(self, semantic=None, procedural=None):
+        # Section names that changed; None marks the whole document dirty.
+        self.sem_doc.mark(*(self.semantic if semantic is None else semantic))
+        self.proc_doc.mark(*(self.procedural if procedural is None else procedural))
+        self.sem_doc.save(self.semantic, self.coalesce)
+        self.proc_doc.save(self.procedural, self.coalesce)
 
-    def _load_episodic(self):
-        items = []
-        with self.ep_path.open('r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    items.append(json.loads(line))
-                except Exception:
-                    continue
-        return items
+    def commit(self):
+        self.drain()
+        self.flush()
+        self.sem_doc.commit()
+        self.proc_doc.commit()
+
+    def close(self):
+        self.commit()
+        self.episodic_writer.close()
 
     def retrieve(self, task_text: str, locations: dict, k: int = 5):
-        episodes = self._load_episodic()
-        now = int(time.time())
-        def score(e):
-            recency = max(0, 1.0 - (now - int(e.get('ts', now))) / 86400.0)
-            tag = 0.0
-            place = e.get('place')
-            for p in locations.get('places', []):
-                if p.get('name') == place:
-                    tag = 1.0
-                    break
-            fail_penalty = 0.5 if e.get('result') in ('blocked','fail') else 0.0
-            return recency * 0.6 + tag * 0.3 - fail_penalty * 0.4
-        episodes.sort(key=score, reverse=True)
-        top = episodes[:k]
+        with trace.span('memory.retrieve'):
+            self.flush()
+            names = [p.get('name') for p in locations.get('places', [])]
+            top = self.episodic_index.top(k, names, int(time.time()))
         ctx = {
             'episodes': top,
             'semantic': self.semantic,
@@ -66,27 +79,53 @@ class MemoryStore:
         return ctx
 
     def reflect(self, logs: list):
-        fail_tips = []
-        for l in logs:
-            if l.get('type') == 'navigate' and l.get('result') == 'blocked':
-                fail_tips.append('prefer_alt_route')
-        if fail_tips:
-            skills = self.procedural.get('skills', {})
-            nav = skills.get('navigate', {'success':0,'fail':0,'avg_time':0.0,'tips':[]})
-            nav['tips'] = list(set(nav.get('tips', []) + fail_tips))
-            skills['navigate'] = nav
-            self.procedural['skills'] = skills
+        with trace.span('memory.reflect'):
+            logs = as_dicts(logs)
+            self.flush()
+            with self.lock:
+                fail_tips, active, dirty = self._reflect_local(logs, int(time.time()))
+            tip_line = self._reflect_tip([logs])
+            with self.lock:
+                self._add_tip(tip_line)
+                self.save(semantic=dirty, procedural=['skills'])
+        return {'tips': list(set(fail_tips + ([tip_line] if tip_line else []))), 'new_dynamic_blocks': active}
+
+    def submit_reflection(self, logs: list):
+        # Like reflect(), but only the local updates (tips, dynamic blocks,
+        # stats) happen now; the LLM tip and the save run on the reflection
+        # queue, merged with other pending runs. Returns a Future of the
+        # reflect() result; drain() waits for all of them.
+        with trace.span('memory.submit_reflection'):
+            logs = as_dicts(logs)
+            self.flush()
+            with self.lock:
+                fail_tips, active, dirty = self._reflect_local(logs, int(time.time()))
+        if self.reflections is None:
+            self.reflections = ReflectionQueue(self)
+        return self.reflections.submit(logs, fail_tips, active, dirty)
+
+    def drain(self, timeout: float = None):
+        if self.reflections is not None:
+            self.reflections.drain(timeout)
+
+    def _reflect_tip(self, runs: list):
+        # One LLM tip for the logs of one or more runs.
         tip_line = None
         try:
             content = chat(
                 system='你是机器人自反思模块。根据执行日志总结一句"下次应怎样"的建议，要求精炼且具体。',
-                user=json.dumps({'logs': logs}, ensure_ascii=False),
+                user=json.dumps({'logs': runs[0]} if len(runs) == 1 else {'runs': runs}, ensure_ascii=False),
                 max_tokens=60
             )
             if content:
                 tip_line = content.strip().split('\n')[0]
+        except CacheMiss:
+            raise
         except Exception:
             tip_line = None
+        return tip_line
+
+    def _add_tip(self, tip_line):
         if tip_line:
             skills = self.procedural.get('skills', {})
             nav = skills.get('navigate', {'success':0,'fail':0,'avg_time':0.0,'tips':[]})
@@ -94,9 +133,39 @@ class MemoryStore:
                 nav['tips'] = nav.get('tips', []) + [tip_line]
             skills['navigate'] = nav
             self.procedural['skills'] = skills
-        now = int(time.time())
-        ttl_sec = 3600
-        dyn = self.semantic.get('dynamic_blocks', [])
+
+    def note_block(self, x: int, y: int, now: int = None, ttl_sec: int = 3600):
+        # One dynamic block sighting: a known block gains confidence, an
+        # unknown cell gets a new block. Watching cost maps (every Navigator on
+        # this memory) see the change at once. Returns the block.
+        now = int(time.time()) if now is None else now
+        with self.lock:
+            dyn = self.semantic['dynamic_blocks']
+            found = dyn.get(x, y)
+            if found:
+                conf = float(found.get('confidence', 0.5))
+                conf = min(0.99, conf * 0.8 + 0.2)
+                dyn.update(found, confidence=conf, ts=now, expire_ts=now + ttl_sec)
+                return found
+            o = {'x': int(x), 'y': int(y), 'label': 'dynamic', 'ts': now, 'expire_ts': now + ttl_sec, 'confidence': 0.6}
+            dyn.add(o)
+            return o
+
+    def _reflect_local(self, logs: list, now: int):
+        # Updates that need no LLM: failure tips, dynamic blocks and the
+        # decayed per-place stats. Returns the failure tips, the touched
+        # blocks and the dirty semantic sections.
+        fail_tips = []
+        for l in logs:
+            if l.get('type') == 'navigate' and l.get('result') == 'blocked':
+                fail_tips.append('prefer_alt_route')
+        if fail_tips:
+            skills = self.procedural.get('skills', {})
+            nav = skills.get('navigate', {'success':0,'fail':0,'avg_time':0.0,'tips':[]})
+            nav['tips'] = list(dict.fromkeys(nav.get('tips', []) + fail_tips))
+            skills['navigate'] = nav
+            self.procedural['skills'] = skills
+        dyn = self.semantic['dynamic_blocks']
         active = []
         for l in logs:
             if l.get('type') == 'navigate' and l.get('result') == 'blocked':
@@ -104,26 +173,16 @@ class MemoryStore:
                 if reason == 'dynamic':
                     pos = l.get('pos')
                     if pos:
-                        key = (int(pos[0]), int(pos[1]))
-                        found = None
-                        for o in dyn:
-                            if int(o.get('x')) == key[0] and int(o.get('y')) == key[1]:
-                                found = o
-                                break
-                        if found:
-                            conf = float(found.get('confidence', 0.5))
-                            conf = min(0.99, conf * 0.8 + 0.2)
-                            found['confidence'] = conf
-                            found['ts'] = now
-                            found['expire_ts'] = now + ttl_sec
-                            active.append(found)
-                        else:
-                            o = {'x': key[0], 'y': key[1], 'label': 'dynamic', 'ts': now, 'expire_ts': now + ttl_sec, 'confidence': 0.6}
-                            dyn.append(o)
-                            active.append(o)
-        dyn = [o for o in dyn if int(o.get('expire_ts', 0)) > now]
-        self.semantic['dynamic_blocks'] = dyn
-        self.semantic['obstacles'] = [o for o in self.semantic.get('obstacles', []) if o.get('label') == 'pillar']
+                        active.append(self.note_block(pos[0], pos[1], now))
+        expired = dyn.expire(now)
+        dirty = []
+        if active or expired:
+            dirty.append('dynamic_blocks')
+        obstacles = self.semantic.get('obstacles', [])
+        pillars = [o for o in obstacles if o.get('label') == 'pillar']
+        if len(pillars) != len(obstacles) or 'obstacles' not in self.semantic:
+            dirty.append('obstacles')
+        self.semantic['obstacles'] = pillars
         skills = self.procedural.get('skills', {})
         nav = skills.get('navigate', {'success':0,'fail':0,'avg_time':0.0,'tips':[]})
         stats = nav.get('stats', {})
@@ -149,13 +208,16 @@ class MemoryStore:
         nav['stats'] = stats
         skills['navigate'] = nav
         self.procedural['skills'] = skills
-        self.save()
-        return {'tips': list(set(fail_tips + ([tip_line] if tip_line else []))), 'new_dynamic_blocks': active}
+        return fail_tips, active, dirty
 
 class NoOpMemory(MemoryStore):
-    def __init__(self, root: Path):
-        super().__init__(root)
+    def __init__(self, root: Path, options: dict = None):
+        super().__init__(root, options)
     def append_episodic(self, record: dict):
         pass
     def reflect(self, logs: list):
         return {'tips': [], 'new_obstacles': []}
+    def submit_reflection(self, logs: list):
+        f = Future()
+        f.set_result(self.reflect(logs))
+        return f
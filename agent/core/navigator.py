@@ -1,64 +1,169 @@
-import heapq
+from agent.core.costmap import CostMap
+from agent.core.search import GridAStar, GridJPS
+from agent.core.dstar import DStarLite
+from agent.core.hpa import HierarchicalRouter
+from agent.core.pathcache import PATH_CACHE
+from agent.core.dynblocks import DynamicBlocks
+from agent.core import trace
 
 class Navigator:
-    def __init__(self, grid: dict, semantic: dict):
+    def __init__(self, grid: dict, semantic: dict, cache=PATH_CACHE, mode: str = 'astar', hpa_store=None):
         self.grid = grid
         self.semantic = semantic
+        self.mode = mode
+        self.costmap = CostMap(grid, semantic)
+        blocks = semantic.get('dynamic_blocks')
+        if isinstance(blocks, DynamicBlocks):
+            # memory's live block set: reflect() patches this cost map directly
+            blocks.watch(self.costmap)
+        self.astar = GridAStar(self.costmap)
+        self.searcher = GridJPS(self.costmap) if mode == 'jps' else self.astar
+        self.hierarchy = HierarchicalRouter(self.costmap, store=hpa_store) if mode == 'hpa' else None
+        self.cache = cache
+        if cache is not None:
+            cache.track(self.costmap, self.costmap.fingerprint())
+        self.incremental = None
+        self.sightings = {}
+        self.last_stats = {'expanded': 0, 'pushes': 0, 'cached': False}
+        self.stats = {'routes': 0, 'expanded': 0, 'pushes': 0, 'cache_hits': 0, 'replans': 0, 'repaired': 0, 'reexpanded': 0}
 
     def route(self, start, goal):
-        w = self.grid['width']
-        H = self.grid['height']
-        g = self.grid['grid']
-        def in_bounds(x,y):
-            return 0 <= x < w and 0 <= y < H
-        def passable(x,y):
-            if g[y][x] != 0:
-                return False
-            for ob in self.semantic.get('obstacles', []):
-                ox = int(ob.get('x'))
-                oy = int(ob.get('y'))
-                label = ob.get('label')
-                if label == 'pillar' and ox == x and oy == y:
-                    return False
-            return True
-        def cost(x,y):
-            c = 1
-            for z in self.semantic.get('high_cost_zones', []):
-                if z['xmin'] <= x <= z['xmax'] and z['ymin'] <= y <= z['ymax']:
-                    c += z.get('cost',1)
-            dyn = self.semantic.get('dynamic_blocks', [])
-            for ob in dyn:
-                if int(ob.get('x')) == x and int(ob.get('y')) == y:
-                    c += int(max(1, round(10 * float(ob.get('confidence', 0.5)))))
-            return c
-        def heuristic(a,b):
-            return abs(a[0]-b[0]) + abs(a[1]-b[1])
-        frontier = []
-        heapq.heappush(frontier, (0, start))
-        came = {tuple(start): None}
-        cost_so_far = {tuple(start): 0}
-        while frontier:
-            _, current = heapq.heappop(frontier)
-            if current == goal:
+        with trace.span('navigator.route', mode=self.mode):
+            path = self._route(start, goal)
+        st = self.last_stats
+        trace.count('navigator.routes')
+        if st.get('cached'):
+            trace.count('navigator.cache_hits')
+        else:
+            trace.count('navigator.expanded', st.get('expanded', 0))
+        return path
+
+    def _cache_key(self, start, goal):
+        if self.cache is None:
+            return None
+        fp = self.costmap.fingerprint()
+        self.cache.track(self.costmap, fp)
+        return ((int(start[0]), int(start[1])), (int(goal[0]), int(goal[1])), self.mode, fp)
+
+    def _cached(self, key):
+        path = self.cache.get(key) if key is not None else None
+        if path is not None:
+            self.stats['cache_hits'] += 1
+            self.last_stats = {'expanded': 0, 'pushes': 0, 'cached': True}
+            return list(path)
+        return None
+
+    def _route(self, start, goal):
+        self.stats['routes'] += 1
+        key = self._cache_key(start, goal)
+        path = self._cached(key)
+        if path is not None:
+            return path
+        if self.hierarchy is not None:
+            path = self.hierarchy.route(start, goal)
+            self.last_stats = {'expanded': self.hierarchy.expanded, 'pushes': 0, 'refined': self.hierarchy.refined, 'clusters_rebuilt': self.hierarchy.rebuilt, 'cached': False}
+        else:
+            path = self.searcher.search(start, goal)
+            self.last_stats = {'expanded': self.searcher.expanded, 'pushes': self.searcher.pushes, 'cached': False}
+        self.stats['expanded'] += self.last_stats['expanded']
+        self.stats['pushes'] += self.last_stats['pushes']
+        if key is not None:
+            self.cache.put(key, tuple(path))
+        return path
+
+    def iter_route(self, start, goal):
+        # route() for a consumer that walks the path: an iterator over its
+        # cells, or None when there is no path. In hpa mode only the abstract
+        # route is searched here and each segment is refined when the walk
+        # reaches it; the full path is cached once walked to the end.
+        if self.hierarchy is None:
+            path = self.route(start, goal)
+            return iter(path) if path else None
+        with trace.span('navigator.route', mode=self.mode):
+            self.stats['routes'] += 1
+            key = self._cache_key(start, goal)
+            path = self._cached(key)
+            if path is None:
+                h = self.hierarchy
+                abstract = h.abstract_route(start, goal)
+                self.last_stats = {'expanded': h.expanded, 'pushes': 0, 'refined': 0, 'clusters_rebuilt': h.rebuilt, 'cached': False}
+                self.stats['expanded'] += h.expanded
+        trace.count('navigator.routes')
+        if path is not None:
+            trace.count('navigator.cache_hits')
+            return iter(path) if path else None
+        trace.count('navigator.expanded', self.last_stats['expanded'])
+        if not abstract:
+            if key is not None:
+                self.cache.put(key, ())
+            return None
+        return self._walk(h.iter_refined(abstract), key, self.last_stats)
+
+    def _walk(self, cells, key, st):
+        # refinement work is added to the stats as it happens
+        h = self.hierarchy
+        out = []
+        while True:
+            e0, r0 = h.expanded, h.refined
+            c = next(cells, None)
+            d = h.expanded - e0
+            if d:
+                st['expanded'] += d
+                self.stats['expanded'] += d
+                trace.count('navigator.expanded', d)
+            st['refined'] += h.refined - r0
+            if c is None:
                 break
-            for dx,dy in [(1,0),(-1,0),(0,1),(0,-1)]:
-                nx,ny = current[0]+dx, current[1]+dy
-                if not in_bounds(nx,ny):
-                    continue
-                if not passable(nx,ny):
-                    continue
-                new_cost = cost_so_far[tuple(current)] + cost(nx,ny)
-                if (nx,ny) not in cost_so_far or new_cost < cost_so_far[(nx,ny)]:
-                    cost_so_far[(nx,ny)] = new_cost
-                    priority = new_cost + heuristic((nx,ny), goal)
-                    heapq.heappush(frontier, (priority, (nx,ny)))
-                    came[(nx,ny)] = current
-        path = []
-        cur = goal
-        if tuple(cur) not in came:
-            return []
-        while cur is not None:
-            path.append(cur)
-            cur = came.get(tuple(cur))
-        path.reverse()
+            out.append(c)
+            yield c
+        # a path refined partly on a patched map is not cached
+        if key is not None and key[3] == self.costmap.fingerprint():
+            self.cache.put(key, tuple(out))
+
+    def note_block(self, x: int, y: int, confidence: float = 0.6):
+        # A block seen during this run, patched into this cost map only (so
+        # the next replan repairs around it); memory learns blocks on
+        # reflection. A cell seen again keeps its first patch.
+        cell = (int(x), int(y))
+        if cell in self.sightings or not self.costmap.in_bounds(*cell):
+            return None
+        ob = {'x': cell[0], 'y': cell[1], 'label': 'dynamic', 'confidence': confidence}
+        self.sightings[cell] = ob
+        self.costmap.add_block(ob)
+        return ob
+
+    def replan(self, start, goal, blocked=None):
+        # Incremental replanning toward one goal at a time: the D* Lite state
+        # is kept while the goal stays the same and repaired from cost map
+        # patches instead of searching again from scratch. blocked: the cell
+        # that stopped the robot, patched in (note_block) before planning.
+        # Flat in every mode, hpa included: a replan follows a local block,
+        # and repairing the kept D* Lite state touches fewer cells than
+        # rebuilding the dirty cluster and refining a new abstract route.
+        with trace.span('navigator.replan'):
+            path = self._replan(start, goal, blocked)
+        trace.count('navigator.replans')
+        trace.count('navigator.expanded', self.last_stats['expanded'])
+        trace.count('navigator.repaired', self.last_stats['repaired'])
         return path
+
+    def _replan(self, start, goal, blocked=None):
+        goal = (int(goal[0]), int(goal[1]))
+        if self.incremental is None or self.incremental.goal != goal:
+            if self.incremental is not None:
+                self.incremental.close()
+            self.incremental = DStarLite(self.costmap, goal)
+        d = self.incremental
+        if blocked is not None:
+            # after the D* Lite exists, so the patch reaches it as a repair
+            self.note_block(*blocked)
+        path = d.plan(start)
+        self.last_stats = {'expanded': d.expanded, 'repaired': d.repaired, 'cached': False}
+        self.stats['replans'] += 1
+        self.stats['repaired'] += d.repaired
+        self.stats['reexpanded'] += d.expanded
+        return path
+
+    def path_cost(self, path):
+        cm = self.costmap
+        return sum(cm.cost(x, y) for (x, y) in path[1:])
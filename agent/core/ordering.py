@@ -0,0 +1,225 @@
+import re
+import time
+from typing import Any, Dict, List
+
+UNREACHABLE = 10 ** 9
+
+def split_stops(steps: List[Dict[str, Any]]):
+    # Group plan steps into stops keyed (target, occurrence): consecutive
+    # steps on one target form a stop, and a later return to it (A, B, A) is
+    # a new stop rather than merged into the first. Steps without a target
+    # (note/wait) travel with the next targeted step; those after the last
+    # target are returned separately and stay at the end.
+    stops = {}
+    order = []
+    pending = []
+    seen = {}
+    for s in steps:
+        t = s.get('target')
+        if not t:
+            pending.append(s)
+            continue
+        if not order or order[-1][0] != t:
+            key = (t, seen.get(t, 0))
+            seen[t] = key[1] + 1
+            stops[key] = []
+            order.append(key)
+        stops[order[-1]].extend(pending)
+        stops[order[-1]].append(s)
+        pending = []
+    return order, stops, pending
+
+def precedence_ranks(names: List[str], locations: Dict[str, Any], task_text: str, priority_tags: List[str]):
+    # 0: named by 优先X, 1: carries a priority tag, 2: everything else.
+    first = set(re.findall(r'优先([A-Z])', task_text or ''))
+    tags = {p['name']: p.get('tags', []) for p in locations.get('places', [])}
+    ranks = {}
+    for n in names:
+        if n in first:
+            ranks[n] = 0
+        elif any(t in tags.get(n, []) for t in priority_tags or []):
+            ranks[n] = 1
+        else:
+            ranks[n] = 2
+    return ranks
+
+class OrderOptimizer:
+    def __init__(self, locations: Dict[str, Any], start, distances=None, exact_max: int = 11, time_budget: float = 0.2):
+        self.xy = {p['name']: (int(p['x']), int(p['y'])) for p in locations.get('places', [])}
+        self.start = (int(start.get('x', 0)), int(start.get('y', 0))) if isinstance(start, dict) else tuple(start)
+        self.distances = distances
+        self.exact_max = exact_max
+        self.time_budget = time_budget
+
+    def _d(self, a, b):
+        if self.distances is not None:
+            c = self.distances.cost_from(self.start, b) if a is None else self.distances.cost(a, b)
+            if c is not None:
+                return c
+            if b in self.xy and (a is None or a in self.xy):
+                return UNREACHABLE
+        pa = self.start if a is None else self.xy.get(a)
+        pb = self.xy.get(b)
+        if pa is None or pb is None:
+            return 0
+        return abs(pa[0] - pb[0]) + abs(pa[1] - pb[1])
+
+    def route_cost(self, seq, D=None):
+        if not seq:
+            return 0
+        if D is None:
+            total = self._d(None, seq[0])
+            for a, b in zip(seq, seq[1:]):
+                total += self._d(a, b)
+            return total
+        total = D[0][seq[0] + 1]
+        for a, b in zip(seq, seq[1:]):
+            total += D[a + 1][b + 1]
+        return total
+
+    def solve(self, names: List[str], ranks: Dict[str, int]):
+        n = len(names)
+        # D[0] is the start; D[i + 1] is names[i]
+        nodes = [None] + names
+        D = [[0 if i == j else self._d(nodes[i], nodes[j]) for j in range(n + 1)] for i in range(n + 1)]
+        rk = [ranks.get(x, 2) for x in names]
+        # stable sort by rank makes the incoming order feasible
+        init = sorted(range(n), key=lambda i: rk[i])
+        if n <= 1:
+            return [names[i] for i in init], 'trivial'
+        if n <= self.exact_max:
+            seq = self._held_karp(n, D, rk)
+            method = 'held_karp'
+        else:
+            seq = self._local_search(init, D, rk)
+            method = 'local_search'
+        if self.route_cost(seq, D) > self.route_cost(init, D):
+            seq = init
+        return [names[i] for i in seq], method
+
+    def _held_karp(self, n, D, rk):
+        full = (1 << n) - 1
+        need = []
+        for k in range(n):
+            m = 0
+            for j in range(n):
+                if rk[j] < rk[k]:
+                    m |= 1 << j
+            need.append(m)
+        INF = float('inf')
+        dp = [[INF] * n for _ in range(1 << n)]
+        par = [[-1] * n for _ in range(1 << n)]
+        for k in range(n):
+            if need[k] == 0:
+                dp[1 << k][k] = D[0][k + 1]
+        for mask in range(1, 1 << n):
+            row = dp[mask]
+            for j in range(n):
+                cj = row[j]
+                if cj == INF:
+                    continue
+                Dj = D[j + 1]
+                for k in range(n):
+                    bit = 1 << k
+                    if mask & bit or (need[k] & mask) != need[k]:
+                        continue
+                    nm = mask | bit
+                    c = cj + Dj[k + 1]
+                    if c < dp[nm][k]:
+                        dp[nm][k] = c
+                        par[nm][k] = j
+        last = min(range(n), key=lambda j: dp[full][j])
+        seq = []
+        mask = full
+        while last != -1:
+            seq.append(last)
+            prev = par[mask][last]
+            mask ^= 1 << last
+            last = prev
+        seq.reverse()
+        return seq
+
+    def _local_search(self, seq, D, rk):
+        # 2-opt segment reversal and Or-opt segment moves (length 1-3); a move
+        # is kept only if it lowers the cost and ranks stay non-decreasing.
+        deadline = time.perf_counter() + self.time_budget
+        best = list(seq)
+        best_c = self.route_cost(best, D)
+        n = len(best)
+        def feasible(s):
+            return all(rk[a] <= rk[b] for a, b in zip(s, s[1:]))
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for i in range(n - 1):
+                for j in range(i + 1, n):
+                    cand = best[:i] + best[i:j + 1][::-1] + best[j + 1:]
+                    if feasible(cand):
+                        c = self.route_cost(cand, D)
+                        if c < best_c:
+                            best, best_c, improved = cand, c, True
+                if time.perf_counter() >= deadline:
+                    return best
+            for L in (1, 2, 3):
+                for i in range(n - L + 1):
+                    seg = best[i:i + L]
+                    rest = best[:i] + best[i + L:]
+                    for j in range(len(rest) + 1):
+                        if j == i:
+                            continue
+                        cand = rest[:j] + seg + rest[j:]
+                        if feasible(cand):
+                            c = self.route_cost(cand, D)
+                            if c < best_c:
+                                best, best_c, improved = cand, c, True
+                                break
+                    if time.perf_counter() >= deadline:
+                        return best
+        return best
+
+def optimize_plan_order(plan: Dict[str, Any], locations: Dict[str, Any], start, distances=None, exact_max: int = 11, time_budget: float = 0.2):
+    steps = plan.get('steps') or []
+    keys, stops, tail = split_stops(steps)
+    # a revisit makes the order part of what the plan means (fetch at A,
+    # bring it back to A), so such plans are kept as given
+    if len(keys) < 2 or any(k for _, k in keys):
+        return plan
+    order = [t for t, _ in keys]
+    stops = {t: stops[(t, 0)] for t in order}
+    cons = plan.get('constraints') or {}
+    ranks = precedence_ranks(order, locations, plan.get('task', ''), cons.get('priority_tags') or [])
+    opt = OrderOptimizer(locations, start, distances, exact_max, time_budget)
+    t0 = time.perf_counter()
+    best, method = opt.solve(order, ranks)
+    # the baseline is the incoming order with precedence repaired (what
+    # solve() starts from and never does worse than); the raw incoming
+    # order may break precedence and be cheaper, so it is reported apart
+    given = opt.route_cost(order)
+    before = opt.route_cost(sorted(order, key=lambda n: ranks.get(n, 2)))
+    after = opt.route_cost(best)
+    new_steps = []
+    for n in best:
+        new_steps.extend(stops[n])
+    new_steps.extend(tail)
+    out = dict(plan)
+    out['steps'] = new_steps
+    out['order'] = best
+    out['order_opt'] = {
+        'method': method,
+        'stops': len(order),
+        'cost_given': given,
+        'cost_before': before,
+        'cost_after': after,
+        'improvement': before - after,
+        'improvement_pct': round(100.0 * (before - after) / before, 2) if before else 0.0,
+        'ms': round((time.perf_counter() - t0) * 1000, 3),
+    }
+    return out
+
+def describe_order_opt(oo: Dict[str, Any]) -> str:
+    # cost_before respects precedence, so the saving is never negative
+    s = f"route cost {oo['cost_before']} -> {oo['cost_after']} (saved {oo['improvement']}, {oo['improvement_pct']}%)"
+    given = oo.get('cost_given', oo['cost_before'])
+    if given != oo['cost_before']:
+        s += f"; the incoming order costs {given} but breaks precedence"
+    return s
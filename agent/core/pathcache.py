@@ -0,0 +1,76 @@
+import weakref
+from collections import OrderedDict
+
+class PathCache:
+    # LRU of routed paths keyed by (start, goal, mode, cost map fingerprint).
+    # Bounded by entry count and by the total cells stored, since one path
+    # on a large map can hold thousands of cells. Navigators report the
+    # fingerprint their cost map is at (track()); when no live cost map is
+    # left at a fingerprint, its entries can never hit again and are dropped.
+    def __init__(self, capacity: int = 4096, max_cells: int = 1 << 20):
+        self.capacity = capacity
+        self.max_cells = max_cells
+        self.entries = OrderedDict()
+        self.by_fp = {}
+        self.cells = 0
+        self.users = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def get(self, key):
+        path = self.entries.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def put(self, key, path):
+        if len(path) > self.max_cells:
+            return
+        if key in self.entries:
+            self._pop(key)
+        self.entries[key] = path
+        self.cells += len(path)
+        self.by_fp.setdefault(key[-1], set()).add(key)
+        while len(self.entries) > self.capacity or self.cells > self.max_cells:
+            self._pop(next(iter(self.entries)))
+
+    def _pop(self, key):
+        path = self.entries.pop(key)
+        self.cells -= len(path)
+        keys = self.by_fp.get(key[-1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_fp[key[-1]]
+
+    def track(self, costmap, fp: str):
+        # costmap now routes at fingerprint fp; entries of the one it left
+        # go if no other live cost map is still there
+        old = self.users.get(costmap)
+        if old == fp:
+            return
+        self.users[costmap] = fp
+        if old is not None and old in self.by_fp and old not in self.users.values():
+            keys = list(self.by_fp[old])
+            for key in keys:
+                self._pop(key)
+            self.dropped += len(keys)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_fp.clear()
+        self.cells = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'size': len(self.entries), 'capacity': self.capacity, 'cells': self.cells, 'max_cells': self.max_cells,
+                'dropped_stale': self.dropped, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0}
+
+# Shared by every Navigator in the process, so repeated cmd_eval runs on an
+# unchanged map reuse earlier searches. Keys carry the cost map fingerprint.
+PATH_CACHE = PathCache()
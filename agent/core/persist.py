@@ -0,0 +1,113 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from agent.core import trace
+
+def _digest(text: str):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+class JsonDocument:
+    # A top-level JSON object persisted with the same bytes as
+    # json.dumps(doc, indent=2, ensure_ascii=False). Each top-level section is
+    # serialized on its own and cached, so a save only re-serializes sections
+    # marked dirty; an unchanged document is not written at all. Writes go to
+    # a temp file that is fsynced and renamed over the target. With a
+    # coalesce window, saves closer together than the window are deferred to
+    # the next save past it, commit() or interpreter exit.
+    _shared = {}
+
+    @classmethod
+    def for_path(cls, path: Path):
+        key = str(Path(path).resolve())
+        d = cls._shared.get(key)
+        if d is None:
+            d = cls(path)
+            cls._shared[key] = d
+        return d
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        self.frags = {}
+        self.dirty = set()
+        self.disk = None
+        self.pending = None
+        self.last_write = 0.0
+        self.writes = 0
+        self.skipped = 0
+        self.deferred = 0
+        atexit.register(self.commit)
+
+    def load(self, default: dict):
+        with self.lock:
+            self.commit()
+            if not self.path.exists():
+                self._write(json.dumps(default, ensure_ascii=False))
+            text = self.path.read_text(encoding='utf-8')
+            self.disk = _digest(text)
+            self.frags = {}
+            self.dirty.clear()
+            return json.loads(text)
+
+    def mark(self, *keys):
+        with self.lock:
+            self.dirty.update(keys)
+
+    def _fragment(self, v):
+        return json.dumps(v, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+
+    def render(self, doc: dict):
+        frags = self.frags
+        for k in list(frags):
+            if k not in doc:
+                del frags[k]
+        for k, v in doc.items():
+            if k in self.dirty or k not in frags:
+                frags[k] = self._fragment(v)
+        self.dirty.clear()
+        if not doc:
+            return '{}'
+        return '{\n' + ',\n'.join('  ' + json.dumps(k, ensure_ascii=False) + ': ' + frags[k] for k in doc) + '\n}'
+
+    def save(self, doc: dict, coalesce: float = 0.0):
+        # Returns True when the file was written by this call.
+        with self.lock:
+            text = self.render(doc)
+            digest = _digest(text)
+            if digest == self.disk:
+                self.pending = None
+                self.skipped += 1
+                return False
+            if coalesce > 0 and time.monotonic() - self.last_write < coalesce:
+                self.pending = (text, digest)
+                self.deferred += 1
+                return False
+            self._write(text, digest)
+            return True
+
+    def commit(self):
+        with self.lock:
+            if self.pending is not None:
+                self._write(*self.pending)
+
+    def _write(self, text: str, digest=None):
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with tmp.open('w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        if trace.active():
+            trace.count('io.bytes_written', len(text.encode('utf-8')))
+        self.disk = digest if digest is not None else _digest(text)
+        self.pending = None
+        self.last_write = time.monotonic()
+        self.writes += 1
+
+    def stats(self):
+        return {'writes': self.writes, 'skipped': self.skipped, 'deferred': self.deferred,
+                'pending': self.pending is not None}
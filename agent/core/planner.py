@@ -1,20 +1,131 @@
 import re
 import json
+import copy
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Dict, Any
-from agent.core.llm import json_response
+from agent.core.llm import json_response, submit
+from agent.core import trace
+
+_ARROW = re.compile(r'\s*(?:→|->|-)\s*')
+_LETTER = re.compile(r'[A-Z]')
+_LETTERS = re.compile(r'([A-Z])')
+_MINUTES = re.compile(r'(\d+)分钟')
+_WINDOW = re.compile(r'(\d{2}:\d{2})\s*[-–—]\s*(\d{2}:\d{2})')
+_FIRST = re.compile(r'优先([A-Z])')
+
+@lru_cache(maxsize=1024)
+def _parse_constraints(task_text: str):
+    m = _MINUTES.search(task_text)
+    deadline = int(m.group(1)) if m else None
+    tw = None
+    m2 = _WINDOW.search(task_text)
+    if m2:
+        tw = {'start': m2.group(1), 'end': m2.group(2), 'avoid_tags': ['corridor']}
+    pr_tags = []
+    if 'battery_zone' in task_text:
+        pr_tags.append('battery_zone')
+    if 'tools' in task_text:
+        pr_tags.append('tools')
+    return {'deadline_minutes': deadline, 'time_window': tw, 'priority_tags': pr_tags}
+
+def normalize_task(task_text: str) -> str:
+    return ' '.join(unicodedata.normalize('NFKC', task_text).split())
+
+class PlanCache:
+    # LLM plans keyed on the normalized task text plus a digest of everything
+    # else the planner sends (locations, tags, tips, semantic view). Entries live for ttl seconds; the least recently used is
+    # evicted past capacity. get() returns a copy, callers may mutate it.
+    def __init__(self, capacity: int = 256, ttl: float = 300.0):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, capacity: int = None, ttl: float = None):
+        with self.lock:
+            if capacity is not None:
+                self.capacity = max(1, int(capacity))
+            if ttl is not None:
+                self.ttl = float(ttl)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    @staticmethod
+    def key(task_text: str, payload: Dict[str, Any]) -> tuple:
+        rest = {k: v for k, v in payload.items() if k != 'task'}
+        blob = json.dumps(rest, ensure_ascii=False, sort_keys=True, default=str)
+        return normalize_task(task_text), hashlib.blake2b(blob.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            e = self.entries.get(key)
+            if e is None or time.monotonic() - e[0] > self.ttl:
+                if e is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            plan = e[1]
+        return copy.deepcopy(plan)
+
+    def put(self, key, plan: Dict[str, Any]):
+        plan = copy.deepcopy(plan)
+        with self.lock:
+            self.entries[key] = (time.monotonic(), plan)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self.entries), 'capacity': self.capacity, 'ttl': self.ttl, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': (self.hits / total) if total else 0.0}
 
 class Planner:
+    cache = PlanCache()
+
     def plan(self, task_text: str, memory_ctx: Dict[str, Any], locations: Dict[str, Any], config: Dict[str, Any]):
+        with trace.span('planner.plan'):
+            return self._plan(task_text, memory_ctx, locations, config)
+
+    def _plan(self, task_text: str, memory_ctx: Dict[str, Any], locations: Dict[str, Any], config: Dict[str, Any]):
+        constraints = self._extract_constraints(task_text)
+        payload = {
+            "task": task_text,
+            "locations": [p['name'] for p in locations.get('places', [])],
+            "location_tags": {p['name']: p.get('tags', []) for p in locations.get('places', [])},
+            "memory_tips": memory_ctx.get('procedural', {}).get('skills', {}).get('navigate', {}).get('tips', []),
+            "semantic": self._semantic_view(memory_ctx.get('semantic', {})),
+            "constraints": constraints
+        }
+        # road costs stay out of the prompt (N x N grows past the context on
+        # large maps); optimize_plan_order applies them to the LLM's plan
+        pc = (config or {}).get('plan_cache', {})
+        cache = self.cache if pc.get('enabled', True) else None
+        key = None
+        if cache is not None:
+            cache.configure(pc.get('capacity'), pc.get('ttl_s'))
+            key = PlanCache.key(task_text, payload)
+            hit = cache.get(key)
+            if hit is not None:
+                trace.count('planner.cache_hits')
+                hit['task'] = task_text
+                return hit
         llm_out = json_response(
             system="你是一个机器人任务规划器。严格返回JSON，不要解释。必须：1) 显式体现时间窗（例如 08:00-09:00 避免 corridor）；2) 体现优先级（battery_zone、tools 优先）；3) 当遇设备占用/连续阻塞时，给出拍相邻点的 fallback；4) rationale 需解释时间窗、优先级与fallback；",
-            user=json.dumps({
-                "task": task_text,
-                "locations": [p['name'] for p in locations.get('places', [])],
-                "location_tags": {p['name']: p.get('tags', []) for p in locations.get('places', [])},
-                "memory_tips": memory_ctx.get('procedural', {}).get('skills', {}).get('navigate', {}).get('tips', []),
-                "semantic": memory_ctx.get('semantic', {}),
-                "constraints": self._extract_constraints(task_text)
-            }, ensure_ascii=False),
+            user=json.dumps(payload, ensure_ascii=False),
             schema_hint='返回形如{"order":["A","B"],"steps":[{"type":"navigate","target":"A"},{"type":"inspect","target":"A"},{"type":"wait","duration":10,"reason":"08:00-09:00 避免 corridor"},{"type":"navigate_alt","target":"B","reason":"避开拥堵"},{"type":"inspect_or_adjacent","target":"B"}],"milestones":[{"name":"到达A","eta_min":5}],"notes":[],"rationale":"解释时间窗/优先级/绕行与fallback","errors":["约束冲突解释或不可达原因"]}'
         )
         if not llm_out or not isinstance(llm_out, dict):
@@ -35,15 +146,37 @@ class Planner:
             'notes': notes,
             'rationale': rationale,
             'errors': errors,
-            'constraints': self._extract_constraints(task_text)
+            'constraints': copy.deepcopy(constraints)
         }
         plan = self._augment_with_constraints(plan, locations)
+        if key is not None:
+            cache.put(key, plan)
         return plan
 
+    def _semantic_view(self, semantic: Dict[str, Any]) -> Dict[str, Any]:
+        # Wall-clock fields of dynamic blocks are left out of the prompt, so
+        # the same memory state always gives the same prompt (and cache key).
+        view = dict(semantic)
+        if 'dynamic_blocks' in view:
+            view['dynamic_blocks'] = [{k: v for k, v in o.items() if k not in ('ts', 'expire_ts')} for o in view['dynamic_blocks']]
+        return view
+
+    def plan_many(self, jobs: List[Dict[str, Any]]) -> List[Any]:
+        # jobs: plan() keyword arguments. The prompts go out together on the
+        # LLM thread pool; each result is a plan or the exception plan raised.
+        futures = [submit(self.plan, **j) for j in jobs]
+        out = []
+        for f in futures:
+            try:
+                out.append(f.result())
+            except Exception as e:
+                out.append(e)
+        return out
+
     def _extract_order(self, task_text: str, locations: Dict[str, Any]) -> List[str]:
-        arrow = re.split(r'\s*(?:→|->|-)\s*', task_text)
-        names = [s.strip() for s in arrow if re.fullmatch(r'[A-Z]', s.strip())]
-        tokens = re.findall(r'([A-Z])', task_text)
+        arrow = _ARROW.split(task_text)
+        names = [s.strip() for s in arrow if _LETTER.fullmatch(s.strip())]
+        tokens = _LETTERS.findall(task_text)
         if names or tokens:
             seen = set()
             ordered = []
@@ -60,21 +193,10 @@ class Planner:
         return [p['name'] for p in locations.get('places', [])]
 
     def _extract_constraints(self, task_text: str) -> Dict[str, Any]:
-        m = re.search(r'(\d+)分钟', task_text)
-        deadline = int(m.group(1)) if m else None
-        tw = None
-        m2 = re.search(r'(\d{2}:\d{2})\s*[-–—]\s*(\d{2}:\d{2})', task_text)
-        if m2:
-            tw = {'start': m2.group(1), 'end': m2.group(2), 'avoid_tags': ['corridor']}
-        pr_tags = []
-        if 'battery_zone' in task_text:
-            pr_tags.append('battery_zone')
-        if 'tools' in task_text:
-            pr_tags.append('tools')
-        return {'deadline_minutes': deadline, 'time_window': tw, 'priority_tags': pr_tags}
+        return copy.deepcopy(_parse_constraints(task_text))
 
     def _apply_priority(self, task_text: str, order: List[str]) -> List[str]:
-        m = re.search(r'优先([A-Z])', task_text)
+        m = _FIRST.search(task_text)
         if not m or not order:
             return order
         p = m.group(1)
@@ -0,0 +1,112 @@
+from array import array
+
+# Compact containers for the execution path. The executor produces these;
+# Reporter and MemoryStore turn them back into the plain list/dict shapes
+# that go to JSON, the LLM and the episodic file.
+
+class Trajectory:
+    # (x, y) cells stored as interleaved int32 in one array('i'), which
+    # over-allocates as it grows. Iterating yields tuples as before.
+    __slots__ = ('coords',)
+
+    def __init__(self, points=()):
+        self.coords = array('i')
+        for p in points:
+            self.append(p)
+
+    def append(self, p):
+        c = self.coords
+        c.append(p[0])
+        c.append(p[1])
+
+    def __len__(self):
+        return len(self.coords) >> 1
+
+    def __getitem__(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('trajectory index out of range')
+        return (self.coords[2 * i], self.coords[2 * i + 1])
+
+    def __iter__(self):
+        c = self.coords
+        return zip(c[0::2], c[1::2])
+
+    def __eq__(self, other):
+        if isinstance(other, Trajectory):
+            return self.coords == other.coords
+        return list(self) == [tuple(p) for p in other]
+
+    def to_list(self) -> list:
+        return list(self)
+
+# Key order of LogRecord.to_dict() per log type; it matches the dict
+# literals the executor used to build, so JSON output and LLM prompts are
+# byte-for-byte unchanged. Fields never passed are left out; an explicit
+# None is kept, as it was in the dicts.
+_ORDER = {
+    'replan': ('type', 'target', 'pos', 'result', 'repaired', 'expanded'),
+    'fallback': ('type', 'target', 'action', 'adjacent', 'result'),
+    'inspect_adjacent': ('type', 'target', 'adjacent', 'result'),
+    'wait': ('type', 'duration', 'result', 'reason'),
+    'note': ('type', 'text'),
+}
+_DEFAULT_ORDER = ('type', 'target', 'result', 'reason', 'pos')
+_UNSET = object()
+
+class LogRecord:
+    __slots__ = ('type', 'target', 'result', 'reason', 'pos', 'action', 'adjacent',
+                 'repaired', 'expanded', 'duration', 'text')
+
+    def __init__(self, type, target=_UNSET, result=_UNSET, reason=_UNSET, pos=_UNSET, action=_UNSET, adjacent=_UNSET,
+                 repaired=_UNSET, expanded=_UNSET, duration=_UNSET, text=_UNSET):
+        self.type = type
+        self.target = target
+        self.result = result
+        self.reason = reason
+        self.pos = pos
+        self.action = action
+        self.adjacent = adjacent
+        self.repaired = repaired
+        self.expanded = expanded
+        self.duration = duration
+        self.text = text
+
+    def get(self, key, default=None):
+        v = getattr(self, key, _UNSET)
+        return default if v is _UNSET else v
+
+    def __getitem__(self, key):
+        v = getattr(self, key, _UNSET)
+        if v is _UNSET:
+            raise KeyError(key)
+        return v
+
+    def to_dict(self) -> dict:
+        d = {}
+        for k in _ORDER.get(self.type, _DEFAULT_ORDER):
+            v = getattr(self, k)
+            if v is not _UNSET:
+                d[k] = v
+        return d
+
+class Episode:
+    __slots__ = ('place', 'action', 'result', 'cost', 'reason')
+
+    def __init__(self, place, action, result, cost, reason):
+        self.place = place
+        self.action = action
+        self.result = result
+        self.cost = cost
+        self.reason = reason
+
+    def to_dict(self) -> dict:
+        return {'place': self.place, 'action': self.action, 'result': self.result, 'cost': self.cost, 'reason': self.reason}
+
+def as_dicts(logs: list) -> list:
+    return [l if isinstance(l, dict) else l.to_dict() for l in logs]
+
+def as_list(trajectory) -> list:
+    return trajectory.to_list() if isinstance(trajectory, Trajectory) else list(trajectory)
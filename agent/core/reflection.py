@@ -0,0 +1,77 @@
+import atexit
+import threading
+from concurrent.futures import Future
+from agent.core import trace
+
+class ReflectionQueue:
+    # Background half of MemoryStore.submit_reflection. The worker takes
+    # every pending job (up to max_batch) at once, asks the LLM for a single
+    # tip over all of their logs, then adds the tip and saves memory under
+    # memory.lock. Jobs are resolved in submission order.
+    def __init__(self, memory, max_batch: int = 8):
+        self.memory = memory
+        self.max_batch = max(1, int(max_batch))
+        self.cond = threading.Condition()
+        self.pending = []
+        self.busy = False
+        self.error = None
+        self.jobs = 0
+        self.batches = 0
+        self.thread = threading.Thread(target=self._loop, name='reflection', daemon=True)
+        self.thread.start()
+        atexit.register(self.drain)
+
+    def submit(self, logs, fail_tips, active, dirty):
+        f = Future()
+        with self.cond:
+            self.pending.append((logs, fail_tips, active, dirty, f))
+            self.jobs += 1
+            self.cond.notify_all()
+        return f
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                batch = self.pending[:self.max_batch]
+                del self.pending[:self.max_batch]
+                self.busy = True
+            try:
+                self._apply(batch)
+            except BaseException as e:
+                for job in batch:
+                    if not job[-1].done():
+                        job[-1].set_exception(e)
+                with self.cond:
+                    self.error = e
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.batches += 1
+                    self.cond.notify_all()
+
+    def _apply(self, batch):
+        m = self.memory
+        with trace.span('memory.reflect_batch', runs=len(batch)):
+            tip_line = m._reflect_tip([job[0] for job in batch])
+            dirty = set()
+            for job in batch:
+                dirty.update(job[3])
+            with m.lock:
+                m._add_tip(tip_line)
+                m.save(semantic=sorted(dirty), procedural=['skills'])
+        for logs, fail_tips, active, _, f in batch:
+            f.set_result({'tips': list(set(fail_tips + ([tip_line] if tip_line else []))), 'new_dynamic_blocks': active})
+
+    def drain(self, timeout: float = None):
+        # Waits until every submitted job is applied; re-raises the first
+        # worker error (e.g. a strict-replay CacheMiss) once.
+        with self.cond:
+            self.cond.wait_for(lambda: not self.pending and not self.busy, timeout)
+            e, self.error = self.error, None
+        if e is not None:
+            raise e
+
+    def stats(self):
+        return {'jobs': self.jobs, 'batches': self.batches, 'pending': len(self.pending)}
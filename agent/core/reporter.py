@@ -2,23 +2,65 @@ import json
 from pathlib import Path
 from .visual import draw_map_and_trajectory
 from .visual import draw_animated_sim
+from .binlog import write_run
+from .records import as_dicts, as_list
+from .ordering import describe_order_opt
+from . import trace
 
 class Reporter:
-    def export(self, plan: dict, trajectory: list, logs: list, memory_ctx: dict, out_dir: Path):
+    def export(self, plan: dict, trajectory: list, logs: list, memory_ctx: dict, out_dir: Path, options: dict = None, fmt: str = 'json',
+               maps_dir: Path = None, run_trace=None):
+        # fmt 'binary' writes run.bin (see binlog) instead of trajectory.json
+        # and logs.json; each format removes the other's files left in
+        # out_dir by an earlier run. maps_dir holds grid.json/locations.json for the SVGs
+        # (./maps by default)
+        # options: config['visual']; simplify_epsilon (cells) enables RDP on
+        # top of the lossless collinear collapse
+        # run_trace: the run's trace.Trace; its summary (up to the rendering)
+        # goes into the report and logs.json, or trace_summary.json next to
+        # run.bin
+        with trace.span('reporter.export', fmt=fmt):
+            self._export(plan, trajectory, logs, memory_ctx, out_dir, options, fmt, maps_dir, run_trace)
+
+    def _export(self, plan, trajectory, logs, memory_ctx, out_dir, options, fmt, maps_dir, run_trace):
+        eps = float((options or {}).get('simplify_epsilon', 0.0))
+        maps = Path(maps_dir or 'maps')
+        logs = as_dicts(logs)
+        render = {}
         with (out_dir / 'plan.json').open('w', encoding='utf-8') as f:
             json.dump(plan, f, ensure_ascii=False, indent=2)
-        with (out_dir / 'trajectory.json').open('w', encoding='utf-8') as f:
-            json.dump({'trajectory': trajectory}, f, ensure_ascii=False, indent=2)
-        with (out_dir / 'logs.json').open('w', encoding='utf-8') as f:
-            json.dump({'logs': logs}, f, ensure_ascii=False, indent=2)
-        try:
-            draw_map_and_trajectory(Path('maps/grid.json'), Path('maps/locations.json'), trajectory, memory_ctx.get('semantic', {}), out_dir / 'map_trajectory.svg', logs)
-        except Exception:
-            pass
-        try:
-            draw_animated_sim(Path('maps/grid.json'), Path('maps/locations.json'), trajectory, memory_ctx.get('semantic', {}), out_dir / 'anim.svg')
-        except Exception:
-            pass
+        if fmt == 'binary':
+            trace.count('io.bytes_written', write_run(out_dir / 'run.bin', trajectory, logs))
+        else:
+            with (out_dir / 'trajectory.json').open('w', encoding='utf-8') as f:
+                json.dump({'trajectory': as_list(trajectory)}, f, ensure_ascii=False, indent=2)
+                trace.count('io.bytes_written', f.tell())
+        with trace.span('reporter.render'):
+            try:
+                with trace.span('render.map_trajectory'):
+                    render['map_trajectory.svg'] = draw_map_and_trajectory(maps / 'grid.json', maps / 'locations.json', trajectory, memory_ctx.get('semantic', {}), out_dir / 'map_trajectory.svg', logs, epsilon=eps)
+            except Exception:
+                pass
+            try:
+                with trace.span('render.anim'):
+                    render['anim.svg'] = draw_animated_sim(maps / 'grid.json', maps / 'locations.json', trajectory, memory_ctx.get('semantic', {}), out_dir / 'anim.svg', epsilon=eps)
+            except Exception:
+                pass
+        summary = run_trace.summary() if run_trace is not None else None
+        if fmt == 'binary':
+            stale = ['trajectory.json', 'logs.json']
+            if summary:
+                with (out_dir / 'trace_summary.json').open('w', encoding='utf-8') as f:
+                    json.dump(summary, f, ensure_ascii=False, indent=2)
+            else:
+                stale.append('trace_summary.json')
+        else:
+            with (out_dir / 'logs.json').open('w', encoding='utf-8') as f:
+                json.dump({'logs': logs, 'trace': summary} if summary else {'logs': logs}, f, ensure_ascii=False, indent=2)
+                trace.count('io.bytes_written', f.tell())
+            stale = ['run.bin', 'trace_summary.json']
+        for name in stale:
+            (out_dir / name).unlink(missing_ok=True)
         report = []
         report.append('# Agent Report')
         report.append('## Task')
@@ -30,6 +72,10 @@ class Reporter:
             report.append('## Errors')
             for e in plan.get('errors', []):
                 report.append(f"- {e}")
+        oo = plan.get('order_opt')
+        if oo:
+            report.append('## Order Optimization')
+            report.append(f"- {oo['method']}: {oo['stops']} stops, {describe_order_opt(oo)} in {oo['ms']} ms")
         report.append('## Steps')
         for s in plan.get('steps', []):
             t = s.get('type','')
@@ -48,11 +94,24 @@ class Reporter:
                 reason = l.get('reason','')
                 pos = l.get('pos','')
                 report.append(f"- {t} {target} {r} {reason} {pos}")
+            elif t == 'replan':
+                report.append(f"- replan {target} {r} repaired={l.get('repaired', 0)} expanded={l.get('expanded', 0)} {l.get('pos','')}")
             elif t == 'fallback':
                 adj = l.get('adjacent','')
                 report.append(f"- fallback {target} -> inspect_adjacent {adj} {r}")
             else:
                 report.append(f"- {t} {target} {r}")
+        if render:
+            report.append('## Rendering')
+            for name, r in render.items():
+                report.append(f"- {name}: {r['points_in']} -> {r['points_out']} path points (-{r['reduction_pct']}%, collinear {r['points_collinear']}, eps {r['epsilon']}), {r['svg_bytes']} bytes in {r['ms']} ms")
+        if summary:
+            report.append('## Trace')
+            report.append(f"- wall {summary['wall_ms']} ms")
+            for name, s in list(summary['spans'].items())[:15]:
+                report.append(f"- {name}: {s['calls']} calls, {s['total_ms']} ms (self {s['self_ms']} ms, max {s['max_ms']} ms)")
+            if summary['counters']:
+                report.append('- counters: ' + ', '.join(f'{k}={v}' for k, v in summary['counters'].items()))
         report.append('## Memory References')
         dyn = memory_ctx.get('semantic', {}).get('dynamic_blocks', [])
         for o in dyn[:5]:
@@ -0,0 +1,307 @@
+import heapq
+from array import array
+
+class GridAStar:
+    # A* over CostMap cell indices. Buffers are allocated once per map and
+    # invalidated per query with a search stamp, so a query only touches the
+    # cells it reaches. Heap entries are (f, h, cell): ties on f go to the
+    # entry closer to the goal; entries for already closed cells are skipped.
+    def __init__(self, costmap):
+        self.cm = costmap
+        n = costmap.width * costmap.height
+        self.g = array('i', bytes(4 * n))
+        self.parent = array('i', bytes(4 * n))
+        self.seen = array('I', bytes(4 * n))
+        self.closed = array('I', bytes(4 * n))
+        self.search_id = 0
+        self.expanded = 0
+        self.pushes = 0
+
+    def search(self, start, goal):
+        cm = self.cm
+        w = cm.width
+        H = cm.height
+        self.expanded = 0
+        self.pushes = 0
+        sx, sy = int(start[0]), int(start[1])
+        gx, gy = int(goal[0]), int(goal[1])
+        if (sx, sy) == (gx, gy):
+            return [(sx, sy)]
+        if not (0 <= sx < w and 0 <= sy < H and 0 <= gx < w and 0 <= gy < H):
+            return []
+        passable = cm.passable
+        step = cm.step
+        g = self.g
+        parent = self.parent
+        seen = self.seen
+        closed = self.closed
+        self.search_id += 1
+        sid = self.search_id
+        s = sy * w + sx
+        t = gy * w + gx
+        g[s] = 0
+        parent[s] = -1
+        seen[s] = sid
+        h0 = abs(sx - gx) + abs(sy - gy)
+        heap = [(h0, h0, s)]
+        push = heapq.heappush
+        pop = heapq.heappop
+        expanded = 0
+        pushes = 1
+        while heap:
+            _, _, cur = pop(heap)
+            if closed[cur] == sid:
+                continue
+            closed[cur] = sid
+            expanded += 1
+            if cur == t:
+                break
+            gc = g[cur]
+            cy, cx = divmod(cur, w)
+            for ni, nx, ny in ((cur + 1, cx + 1, cy) if cx + 1 < w else (-1, 0, 0),
+                               (cur - 1, cx - 1, cy) if cx > 0 else (-1, 0, 0),
+                               (cur + w, cx, cy + 1) if cy + 1 < H else (-1, 0, 0),
+                               (cur - w, cx, cy - 1) if cy > 0 else (-1, 0, 0)):
+                if ni < 0 or not passable[ni] or closed[ni] == sid:
+                    continue
+                ng = gc + step[ni]
+                if seen[ni] != sid or ng < g[ni]:
+                    seen[ni] = sid
+                    g[ni] = ng
+                    parent[ni] = cur
+                    hn = (nx - gx if nx > gx else gx - nx) + (ny - gy if ny > gy else gy - ny)
+                    push(heap, (ng + hn, hn, ni))
+                    pushes += 1
+        self.expanded = expanded
+        self.pushes = pushes
+        if closed[t] != sid:
+            return []
+        path = []
+        cur = t
+        while cur != -1:
+            y, x = divmod(cur, w)
+            path.append((x, y))
+            cur = parent[cur]
+        path.reverse()
+        return path
+
+class GridJPS(GridAStar):
+    # Jump Point Search for the 4-connected grid. Unit-cost cells are jumped
+    # over; a jump stops at the goal, at forced neighbours and next to (or on)
+    # any cell whose step cost is not 1. Weighted cells are expanded like plain
+    # A* nodes, so results stay optimal under the full CostMap costs.
+    # Horizontal jump results are precomputed per row (JPS+ style) and
+    # recomputed lazily for rows next to patched cells.
+    def __init__(self, costmap):
+        super().__init__(costmap)
+        n = costmap.width * costmap.height
+        self.dirs = array('b', bytes(n))
+        # per cell and direction: first stop cell (or -1) and last cell the
+        # scan reaches (the stop, or the cell before a wall; -1 if blocked)
+        self.stop_r = array('i', bytes(4 * n))
+        self.end_r = array('i', bytes(4 * n))
+        self.stop_l = array('i', bytes(4 * n))
+        self.end_l = array('i', bytes(4 * n))
+        self.epoch = 1
+        self.row_epoch = array('I', bytes(4 * costmap.height))
+        costmap.listeners.append(self._on_change)
+
+    def close(self):
+        try:
+            self.cm.listeners.remove(self._on_change)
+        except ValueError:
+            pass
+
+    def _on_change(self, i):
+        if i is None:
+            self.epoch += 1
+            return
+        y = i // self.cm.width
+        for r in (y - 1, y, y + 1):
+            if 0 <= r < self.cm.height:
+                self.row_epoch[r] = 0
+
+    def _uniform(self, x, y):
+        if 0 <= x < self.cm.width and 0 <= y < self.cm.height:
+            i = y * self.cm.width + x
+            return self.cm.passable[i] == 1 and self.cm.step[i] == 1
+        return False
+
+    def _weighted(self, x, y):
+        if 0 <= x < self.cm.width and 0 <= y < self.cm.height:
+            i = y * self.cm.width + x
+            return self.cm.passable[i] == 1 and self.cm.step[i] != 1
+        return False
+
+    def _row(self, y):
+        if self.row_epoch[y] == self.epoch:
+            return
+        cm = self.cm
+        w = cm.width
+        passable = cm.passable
+        step = cm.step
+        U = self._uniform
+        Wt = self._weighted
+        off = y * w
+        for dx, stop, end, xs in ((1, self.stop_r, self.end_r, range(w - 1, -1, -1)),
+                                  (-1, self.stop_l, self.end_l, range(w))):
+            nxt = -1
+            for x in xs:
+                i = off + x
+                if not passable[i]:
+                    stop[i] = -1
+                    end[i] = -1
+                    nxt = -1
+                    continue
+                if (step[i] != 1 or Wt(x, y - 1) or Wt(x, y + 1)
+                        or (U(x, y - 1) and not U(x - dx, y - 1))
+                        or (U(x, y + 1) and not U(x - dx, y + 1))):
+                    stop[i] = i
+                    end[i] = i
+                elif nxt < 0:
+                    stop[i] = -1
+                    end[i] = i
+                else:
+                    stop[i] = stop[nxt]
+                    end[i] = end[nxt]
+                nxt = i
+        self.row_epoch[y] = self.epoch
+
+    def _hjump(self, x, y, dx, t):
+        w = self.cm.width
+        if not 0 <= x < w:
+            return None
+        self._row(y)
+        i = y * w + x
+        end = (self.end_r if dx > 0 else self.end_l)[i]
+        if end < 0:
+            return None
+        ty = t // w
+        if ty == y:
+            tx = t - ty * w
+            if (x <= tx <= end - y * w) if dx > 0 else (end - y * w <= tx <= x):
+                return t, abs(tx - x) + self.cm.step[t]
+        stop = (self.stop_r if dx > 0 else self.stop_l)[i]
+        if stop < 0:
+            return None
+        return stop, abs(stop - i) + self.cm.step[stop]
+
+    def _vjump(self, x, y, dy, t):
+        cm = self.cm
+        w = cm.width
+        H = cm.height
+        passable = cm.passable
+        step = cm.step
+        U = self._uniform
+        Wt = self._weighted
+        stop_r = self.stop_r
+        stop_l = self.stop_l
+        cost = 0
+        while 0 <= y < H:
+            i = y * w + x
+            if not passable[i]:
+                return None
+            cost += step[i]
+            if i == t or step[i] != 1:
+                return i, cost
+            if ((U(x - 1, y) and not U(x - 1, y - dy)) or (U(x + 1, y) and not U(x + 1, y - dy))
+                    or Wt(x - 1, y) or Wt(x + 1, y)):
+                return i, cost
+            self._row(y)
+            if (x + 1 < w and stop_r[i + 1] >= 0) or (x > 0 and stop_l[i - 1] >= 0):
+                return i, cost
+            if t // w == y and (self._hjump(x + 1, y, 1, t) or self._hjump(x - 1, y, -1, t)):
+                return i, cost
+            y += dy
+        return None
+
+    def search(self, start, goal):
+        cm = self.cm
+        w = cm.width
+        H = cm.height
+        self.expanded = 0
+        self.pushes = 0
+        sx, sy = int(start[0]), int(start[1])
+        gx, gy = int(goal[0]), int(goal[1])
+        if (sx, sy) == (gx, gy):
+            return [(sx, sy)]
+        if not (0 <= sx < w and 0 <= sy < H and 0 <= gx < w and 0 <= gy < H):
+            return []
+        step = cm.step
+        g = self.g
+        parent = self.parent
+        seen = self.seen
+        closed = self.closed
+        dirs = self.dirs
+        self.search_id += 1
+        sid = self.search_id
+        s = sy * w + sx
+        t = gy * w + gx
+        g[s] = 0
+        parent[s] = -1
+        seen[s] = sid
+        dirs[s] = 0
+        h0 = abs(sx - gx) + abs(sy - gy)
+        heap = [(h0, h0, s)]
+        push = heapq.heappush
+        pop = heapq.heappop
+        expanded = 0
+        pushes = 1
+        # direction codes: 1 = +x, 2 = -x, 3 = +y, 4 = -y, 0 = expand all
+        natural = {0: (1, 2, 3, 4), 1: (1, 3, 4), 2: (2, 3, 4), 3: (3, 1, 2), 4: (4, 1, 2)}
+        while heap:
+            _, _, cur = pop(heap)
+            if closed[cur] == sid:
+                continue
+            closed[cur] = sid
+            expanded += 1
+            if cur == t:
+                break
+            gc = g[cur]
+            cy, cx = divmod(cur, w)
+            d = dirs[cur] if cur != s and step[cur] == 1 else 0
+            for code in natural[d]:
+                if code == 1:
+                    jp = self._hjump(cx + 1, cy, 1, t)
+                elif code == 2:
+                    jp = self._hjump(cx - 1, cy, -1, t)
+                elif code == 3:
+                    jp = self._vjump(cx, cy + 1, 1, t)
+                else:
+                    jp = self._vjump(cx, cy - 1, -1, t)
+                if jp is None:
+                    continue
+                ni, c = jp
+                if closed[ni] == sid:
+                    continue
+                ng = gc + c
+                if seen[ni] != sid or ng < g[ni]:
+                    seen[ni] = sid
+                    g[ni] = ng
+                    parent[ni] = cur
+                    dirs[ni] = code
+                    ny, nx = divmod(ni, w)
+                    hn = abs(nx - gx) + abs(ny - gy)
+                    push(heap, (ng + hn, hn, ni))
+                    pushes += 1
+        self.expanded = expanded
+        self.pushes = pushes
+        if closed[t] != sid:
+            return []
+        jumps = []
+        cur = t
+        while cur != -1:
+            jumps.append(cur)
+            cur = parent[cur]
+        jumps.reverse()
+        path = [(sx, sy)]
+        for a, b in zip(jumps, jumps[1:]):
+            ay, ax = divmod(a, w)
+            by, bx = divmod(b, w)
+            dx = (bx > ax) - (bx < ax)
+            dy = (by > ay) - (by < ay)
+            while (ax, ay) != (bx, by):
+                ax += dx
+                ay += dy
+                path.append((ax, ay))
+        return path
@@ -0,0 +1,62 @@
+import math
+
+def collapse_collinear(points: list) -> list:
+    # Lossless: drops repeated points and the interior points of straight
+    # runs, keeping both ends and every turn (including reversals).
+    out = []
+    for p in points or []:
+        p = (p[0], p[1])
+        if out and out[-1] == p:
+            continue
+        if len(out) >= 2:
+            (ax, ay), (bx, by) = out[-2], out[-1]
+            dx1, dy1 = bx - ax, by - ay
+            dx2, dy2 = p[0] - bx, p[1] - by
+            if dx1 * dy2 == dy1 * dx2 and dx1 * dx2 + dy1 * dy2 > 0:
+                out[-1] = p
+                continue
+        out.append(p)
+    return out
+
+def _seg_dist(p, a, b) -> float:
+    ax, ay = a
+    dx, dy = b[0] - ax, b[1] - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(p[0] - ax, p[1] - ay)
+    t = ((p[0] - ax) * dx + (p[1] - ay) * dy) / (dx * dx + dy * dy)
+    t = 0.0 if t < 0 else 1.0 if t > 1 else t
+    return math.hypot(p[0] - ax - t * dx, p[1] - ay - t * dy)
+
+def rdp(points: list, epsilon: float) -> list:
+    # Ramer-Douglas-Peucker with an explicit stack; every dropped point lies
+    # within epsilon (in cells) of the kept polyline. Distances are to the
+    # segment, not the infinite line, so back-and-forth moves survive.
+    n = len(points)
+    if n < 3 or epsilon <= 0:
+        return list(points)
+    keep = bytearray(n)
+    keep[0] = keep[-1] = 1
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        a, b = points[i], points[j]
+        best, idx = -1.0, -1
+        for k in range(i + 1, j):
+            d = _seg_dist(points[k], a, b)
+            if d > best:
+                best, idx = d, k
+        if idx >= 0 and best > epsilon:
+            keep[idx] = 1
+            stack.append((i, idx))
+            stack.append((idx, j))
+    return [p for p, kp in zip(points, keep) if kp]
+
+def simplify(points: list, epsilon: float = 0.0):
+    # Returns (points, stats). epsilon 0 keeps the exact geometry.
+    pts = collapse_collinear(points)
+    collinear = len(pts)
+    if epsilon and epsilon > 0:
+        pts = rdp(pts, float(epsilon))
+    n = len(points or [])
+    return pts, {'points_in': n, 'points_collinear': collinear, 'points_out': len(pts), 'epsilon': float(epsilon or 0),
+                 'reduction_pct': round(100.0 * (n - len(pts)) / n, 1) if n else 0.0}
@@ -0,0 +1,182 @@
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+# Seeded synthetic worlds for benchmarks: a warehouse-style grid, named
+# places, semantic memory and episodic history, written in the same layout
+# as the repo (maps/, memory/). The same arguments give the same world,
+# except that timestamps are relative to the time of generation.
+#
+# Grid layout, period 6 rows: shelf rows 2 and 3 (with a 2-cell gap every
+# 12 columns), pillars only in rows 5 and 0, rows 1 and 4 always free, and
+# a free 2-cell border. Every free cell therefore touches a free row that
+# reaches the border, so the free space is connected without a flood fill
+# (which would be slow on 2000x2000).
+
+TAGS = ['battery_zone', 'high_priority', 'corridor', 'tools', 'fragile', 'storage', 'rush_0809']
+
+def place_name(i: int) -> str:
+    # A..Z, AA..AZ, BA.. -- letters only, so place names survive the
+    # planner's and the LLM stub's [A-Za-z_]+ tokenising
+    s = ''
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+def _inner(x: int, y: int, w: int, h: int) -> bool:
+    return 2 <= x < w - 2 and 0 < y < h - 1
+
+def make_grid(width: int, height: int, rng, pillar_rate: float = 0.02) -> dict:
+    w, h = int(width), int(height)
+    rows = []
+    for y in range(h):
+        row = bytearray(w)
+        phase = y % 6
+        if phase in (2, 3) and 0 < y < h - 1:
+            for x in range(2, w - 2):
+                if x % 12 not in (0, 1):
+                    row[x] = 1
+        elif phase in (5, 0) and 0 < y < h - 1 and pillar_rate > 0:
+            for x in range(2, w - 2):
+                if rng.random() < pillar_rate:
+                    row[x] = 1
+        rows.append(row)
+    return {'width': w, 'height': h, 'grid': [list(r) for r in rows]}
+
+def free_cells(grid: dict, rows=(1, 4)):
+    # Cells on the always-free rows (phase 1 and 4) by default.
+    g = grid['grid']
+    w = grid['width']
+    return [(x, y) for y in range(len(g)) if y % 6 in rows for x in range(w) if g[y][x] == 0]
+
+def make_locations(grid: dict, count: int, rng) -> dict:
+    cells = free_cells(grid)
+    picks = rng.sample(cells, min(count, len(cells)))
+    places = []
+    for i, (x, y) in enumerate(picks):
+        places.append({'name': place_name(i), 'x': x, 'y': y, 'r': 2, 'tags': rng.sample(TAGS, rng.randint(1, 2))})
+    return {'places': places}
+
+def make_semantic(grid: dict, rng, pillars: int = 0, zones: int = 0, blocks: int = 0, now: int = None) -> dict:
+    now = int(time.time()) if now is None else now
+    w, h = grid['width'], grid['height']
+    g = grid['grid']
+    cells = [c for c in free_cells(grid, (5, 0)) if _inner(c[0], c[1], w, h)]
+    obstacles = [{'x': x, 'y': y, 'label': 'pillar'} for x, y in rng.sample(cells, min(pillars, len(cells)))]
+    high = []
+    for _ in range(zones):
+        zw, zh = rng.randint(3, max(3, w // 8)), rng.randint(3, max(3, h // 8))
+        x0, y0 = rng.randrange(0, max(1, w - zw)), rng.randrange(0, max(1, h - zh))
+        high.append({'xmin': x0, 'xmax': x0 + zw - 1, 'ymin': y0, 'ymax': y0 + zh - 1, 'cost': rng.randint(1, 3)})
+    # blocks stay live for a year so a cached world benchmarks the same
+    # tomorrow (real ones expire after an hour)
+    dyn = []
+    cells = free_cells(grid)
+    for x, y in rng.sample(cells, min(blocks, len(cells))):
+        if g[y][x] == 0:
+            dyn.append({'x': x, 'y': y, 'label': 'dynamic', 'ts': now, 'expire_ts': now + 365 * 86400,
+                        'confidence': round(rng.uniform(0.5, 0.95), 2)})
+    return {'aliases': {}, 'obstacles': obstacles, 'high_cost_zones': high, 'time_windows': [], 'dynamic_blocks': dyn}
+
+def make_episodes(locations: dict, count: int, rng, now: int = None, span_days: float = 30.0):
+    # Generator of episodic records in the executor's shape, oldest first.
+    now = int(time.time()) if now is None else now
+    names = [p['name'] for p in locations.get('places', [])] or ['A']
+    t0 = now - int(span_days * 86400)
+    step = (now - t0) / max(1, count)
+    for i in range(count):
+        place = rng.choice(names)
+        r = rng.random()
+        if r < 0.1:
+            rec = {'place': place, 'action': 'navigate', 'result': 'blocked', 'cost': 0, 'reason': 'dynamic'}
+        elif r < 0.15:
+            rec = {'place': place, 'action': 'inspect_adjacent', 'result': 'ok', 'cost': 1, 'reason': 'busy'}
+        elif r < 0.55:
+            rec = {'place': place, 'action': 'navigate', 'result': 'ok', 'cost': rng.randint(5, 200), 'reason': 'none'}
+        else:
+            rec = {'place': place, 'action': 'inspect', 'result': 'ok', 'cost': 1, 'reason': 'none'}
+        rec['ts'] = t0 + int(i * step)
+        yield rec
+
+def make_logs(locations: dict, count: int, rng) -> list:
+    # Executor-shaped log dicts for reflect() and export benchmarks.
+    places = locations.get('places', []) or [{'name': 'A', 'x': 0, 'y': 0}]
+    logs = []
+    while len(logs) < count:
+        p = rng.choice(places)
+        pos = [p['x'], p['y']]
+        r = rng.random()
+        if r < 0.15:
+            logs.append({'type': 'navigate', 'target': p['name'], 'result': 'blocked', 'reason': 'dynamic', 'pos': pos})
+            logs.append({'type': 'replan', 'target': p['name'], 'pos': pos, 'result': 'ok', 'repaired': rng.randint(0, 50), 'expanded': rng.randint(10, 500)})
+        elif r < 0.2:
+            logs.append({'type': 'navigate', 'target': p['name'], 'result': 'fail', 'reason': 'no_path', 'pos': pos})
+        else:
+            logs.append({'type': 'navigate', 'target': p['name'], 'result': 'ok', 'pos': pos})
+            logs.append({'type': 'inspect', 'target': p['name'], 'result': 'ok'})
+    return logs[:count]
+
+def _write_text(path: Path, text: str):
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+def _grid_json(grid: dict) -> str:
+    # one row per line, like maps/grid.json; json.dumps on millions of ints
+    # is several times slower
+    rows = ',\n    '.join('[' + ','.join('1' if v else '0' for v in row) + ']' for row in grid['grid'])
+    return f'{{\n  "width": {grid["width"]},\n  "height": {grid["height"]},\n  "grid": [\n    {rows}\n  ]\n}}\n'
+
+def write_world(root: Path, width: int, height: int, places: int, episodes: int, seed: int = 0,
+                pillar_rate: float = 0.02, now: int = None) -> dict:
+    # Writes root/maps/{grid,locations}.json and root/memory/*; returns the
+    # spec with file sizes and generation time. A world already generated
+    # from the same spec is reused as is.
+    root = Path(root)
+    spec = {'width': int(width), 'height': int(height), 'places': int(places), 'episodes': int(episodes),
+            'seed': int(seed), 'pillar_rate': float(pillar_rate)}
+    meta_path = root / 'world.json'
+    if meta_path.exists():
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if meta.get('spec') == spec:
+                return meta
+        except Exception:
+            pass
+    t0 = time.perf_counter()
+    now = int(time.time()) if now is None else now
+    rng = random.Random(seed)
+    (root / 'maps').mkdir(parents=True, exist_ok=True)
+    (root / 'memory').mkdir(parents=True, exist_ok=True)
+    grid = make_grid(width, height, rng, pillar_rate)
+    locations = make_locations(grid, places, rng)
+    cells = width * height
+    semantic = make_semantic(grid, rng, pillars=max(2, cells // 2000), zones=max(2, cells // 20000),
+                             blocks=max(3, cells // 4000), now=now)
+    _write_text(root / 'maps' / 'grid.json', _grid_json(grid))
+    _write_text(root / 'maps' / 'locations.json', json.dumps(locations, ensure_ascii=False, indent=2))
+    _write_text(root / 'memory' / 'semantic.json', json.dumps(semantic, ensure_ascii=False, indent=2))
+    _write_text(root / 'memory' / 'procedural.json', json.dumps({'skills': {}}, ensure_ascii=False, indent=2))
+    ep = root / 'memory' / 'episodic.jsonl'
+    tmp = ep.with_name(f'{ep.name}.{os.getpid()}.tmp')
+    with tmp.open('w', encoding='utf-8') as f:
+        buf = []
+        for rec in make_episodes(locations, episodes, rng, now):
+            buf.append(json.dumps(rec, ensure_ascii=False))
+            if len(buf) >= 4096:
+                f.write('\n'.join(buf) + '\n')
+                buf = []
+        if buf:
+            f.write('\n'.join(buf) + '\n')
+    os.replace(tmp, ep)
+    for stale in (root / 'maps' / 'distances.json', root / 'maps' / 'hpa.json'):
+        if stale.exists():
+            stale.unlink()
+    meta = {'spec': spec, 'now': now, 'gen_s': round(time.perf_counter() - t0, 3),
+            'bytes': {p: (root / p).stat().st_size for p in ('maps/grid.json', 'maps/locations.json', 'memory/semantic.json', 'memory/episodic.jsonl')}}
+    _write_text(meta_path, json.dumps(meta, ensure_ascii=False, indent=2))
+    return meta
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Per-run tracing: nested timing spans and counters. Off unless start() was
+# called; then span() returns a shared no-op context manager and count()
+# returns at once, so instrumented hot paths pay one global read and a call.
+#
+#   with trace.span('navigator.route', mode='astar'):
+#       ...
+#   trace.count('navigator.expanded', n)
+#
+# summary() aggregates spans by name (calls, total, self time without child
+# spans, max) next to the counters; chrome() is the Chrome trace-event
+# format (chrome://tracing, Perfetto, speedscope) for flame graphs.
+
+_TRACE = None
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _Noop()
+
+class _Span:
+    __slots__ = ('trace', 'name', 'args', 't0', 'child', 'frame')
+
+    def __init__(self, trace, name: str, args: dict):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = self.trace._stack()
+        stack.append(self)
+        self.child = 0
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        dur = time.perf_counter_ns() - self.t0
+        stack = self.trace._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if stack:
+            stack[-1].child += dur
+        self.trace._record(self, dur)
+        return False
+
+class Trace:
+    # Keeps up to max_events spans for chrome(); aggregates are kept for all.
+    def __init__(self, name: str = 'run', max_events: int = 200000):
+        self.name = name
+        self.max_events = max_events
+        self.t0 = time.perf_counter_ns()
+        self.wall = time.time()
+        self.events = []
+        self.dropped = 0
+        self.spans = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.end = None
+
+    def _stack(self) -> list:
+        s = getattr(self.local, 'stack', None)
+        if s is None:
+            s = self.local.stack = []
+        return s
+
+    def _record(self, sp: _Span, dur: int):
+        with self.lock:
+            a = self.spans.get(sp.name)
+            if a is None:
+                a = self.spans[sp.name] = [0, 0, 0, 0]
+            a[0] += 1
+            a[1] += dur
+            a[2] += dur - sp.child
+            if dur > a[3]:
+                a[3] = dur
+            if len(self.events) < self.max_events:
+                self.events.append((sp.name, sp.t0, dur, threading.get_ident(), sp.args))
+            else:
+                self.dropped += 1
+
+    def count(self, name: str, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> dict:
+        end = self.end or time.perf_counter_ns()
+        with self.lock:
+            spans = {k: {'calls': a[0], 'total_ms': round(a[1] / 1e6, 3), 'self_ms': round(a[2] / 1e6, 3),
+                         'max_ms': round(a[3] / 1e6, 3)}
+                     for k, a in sorted(self.spans.items(), key=lambda kv: -kv[1][1])}
+            counters = dict(sorted(self.counters.items()))
+        return {'name': self.name, 'wall_ms': round((end - self.t0) / 1e6, 3), 'spans': spans, 'counters': counters,
+                'dropped_events': self.dropped}
+
+    def chrome(self) -> dict:
+        # Complete ('X') events in microseconds from the trace start, one
+        # track per thread, plus the final counter values.
+        pid = os.getpid()
+        tids = {}
+        out = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': self.name}}]
+        with self.lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        for name, t0, dur, ident, args in events:
+            tid = tids.setdefault(ident, len(tids) + 1)
+            ev = {'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                  'ts': (t0 - self.t0) / 1000, 'dur': dur / 1000}
+            if args:
+                ev['args'] = args
+            out.append(ev)
+        main = threading.main_thread().ident
+        for ident, tid in tids.items():
+            out.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                        'args': {'name': 'main' if ident == main else f'thread-{tid}'}})
+        end = ((self.end or time.perf_counter_ns()) - self.t0) / 1000
+        for k, v in counters.items():
+            out.append({'name': k, 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': end, 'args': {'value': v}})
+        return {'traceEvents': out, 'displayTimeUnit': 'ms', 'otherData': {'wall_time': self.wall}}
+
+    def write_chrome(self, path: Path) -> int:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(self.chrome(), ensure_ascii=False)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        tmp.write_text(text, encoding='utf-8')
+        os.replace(tmp, path)
+        return len(text)
+
+def start(name: str = 'run', max_events: int = 200000) -> Trace:
+    global _TRACE
+    _TRACE = Trace(name, max_events)
+    return _TRACE
+
+def stop() -> Trace:
+    global _TRACE
+    t = _TRACE
+    _TRACE = None
+    if t is not None:
+        t.end = time.perf_counter_ns()
+    return t
+
+def active() -> Trace:
+    return _TRACE
+
+def span(name: str, **args):
+    t = _TRACE
+    if t is None:
+        return _NOOP
+    return _Span(t, name, args)
+
+def count(name: str, n=1):
+    t = _TRACE
+    if t is not None:
+        t.count(name, n)
+
+# Fixed per-run columns for metrics.csv: (column, 'span'|'counter', name).
+# Span columns are total ms; a tuple of names adds spans up (reflection is
+# either memory.reflect or, in the background, memory.reflect_batch).
+CSV_COLUMNS = (
+    ('retrieve_ms', 'span', 'memory.retrieve'),
+    ('plan_ms', 'span', 'planner.plan'),
+    ('route_ms', 'span', 'navigator.route'),
+    ('replan_ms', 'span', 'navigator.replan'),
+    ('reflect_ms', 'span', ('memory.reflect', 'memory.reflect_batch')),
+    ('llm_ms', 'span', 'llm.chat'),
+    ('render_ms', 'span', 'reporter.render'),
+    ('routes', 'counter', 'navigator.routes'),
+    ('route_cache_hits', 'counter', 'navigator.cache_hits'),
+    ('replans', 'counter', 'navigator.replans'),
+    ('expanded', 'counter', 'navigator.expanded'),
+    ('llm_calls', 'counter', 'llm.calls'),
+    ('llm_cache_hits', 'counter', 'llm.cache_hits'),
+    ('llm_tokens', 'counter', 'llm.tokens'),
+    ('bytes_written', 'counter', 'io.bytes_written'),
+)
+
+def csv_values(summary: dict) -> list:
+    spans = summary.get('spans', {})
+    counters = summary.get('counters', {})
+    out = []
+    for _, kind, name in CSV_COLUMNS:
+        if kind == 'span':
+            names = name if isinstance(name, tuple) else (name,)
+            out.append(round(sum(spans.get(n, {}).get('total_ms', 0.0) for n in names), 3))
+        else:
+            out.append(counters.get(name, 0))
+    return out
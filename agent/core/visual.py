@@ -1,29 +1,153 @@
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
+from agent.core.simplify import simplify
+from agent.core import trace
 
-def draw_map_and_trajectory(grid_path: Path, locations_path: Path, trajectory: list, semantic: dict, out_svg: Path, logs: list = None):
-    with grid_path.open('r', encoding='utf-8') as f:
-        grid = json.load(f)
-    with locations_path.open('r', encoding='utf-8') as f:
-        locs = json.load(f)
-    w = grid['width']
-    h = grid['height']
-    cell = 20
-    W = w*cell
-    H = h*cell
-    svg = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{W}" height="{H}">']
-    svg.append(f'<rect x="0" y="0" width="{W}" height="{H}" fill="#ffffff"/>')
+CELL = 20
+BASE_CAPACITY = 8
+
+_FILES = {}
+_BASE = OrderedDict()
+_LOCK = threading.Lock()
+STATS = {'base_hits': 0, 'base_misses': 0}
+
+def _load_json(path: Path):
+    # Parsed once per (path, mtime, size); callers must not mutate the result.
+    st = path.stat()
+    key = str(path.resolve())
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _LOCK:
+        e = _FILES.get(key)
+        if e is not None and e[0] == stamp:
+            return e[1]
+    with path.open('r', encoding='utf-8') as f:
+        data = json.load(f)
+    with _LOCK:
+        _FILES[key] = (stamp, data)
+    return data
+
+def _wall_mask(grid: dict) -> list:
+    # width x height rows of 0/1; like CostMap, short or missing rows count
+    # as wall.
+    w = int(grid['width'])
     g = grid['grid']
+    mask = []
+    for y in range(int(grid['height'])):
+        row = g[y] if y < len(g) else []
+        n = min(w, len(row))
+        mask.append(bytes(1 if row[x] != 0 else 0 for x in range(n)) + b'\x01' * (w - n))
+    return mask
+
+def wall_rects(mask: list) -> list:
+    # Greedy cover of the wall cells with disjoint rectangles: take the
+    # longest run from the first uncovered cell, then grow it downwards while
+    # the whole span below is still uncovered wall. (x, y, w, h) in cells.
+    h = len(mask)
+    w = len(mask[0]) if h else 0
+    used = [bytearray(w) for _ in range(h)]
+    rects = []
     for y in range(h):
-        for x in range(w):
-            if g[y][x] != 0:
-                svg.append(f'<rect x="{x*cell}" y="{y*cell}" width="{cell}" height="{cell}" fill="#333"/>')
-    for z in semantic.get('high_cost_zones', []):
+        row = mask[y]
+        urow = used[y]
+        x = 0
+        while x < w:
+            if not row[x] or urow[x]:
+                x += 1
+                continue
+            x1 = x + 1
+            while x1 < w and row[x1] and not urow[x1]:
+                x1 += 1
+            y1 = y + 1
+            while y1 < h:
+                r = mask[y1]
+                u = used[y1]
+                if any(not r[i] or u[i] for i in range(x, x1)):
+                    break
+                y1 += 1
+            for yy in range(y, y1):
+                used[yy][x:x1] = b'\x01' * (x1 - x)
+            rects.append((x, y, x1 - x, y1 - y))
+            x = x1
+    return rects
+
+def _fingerprint(grid: dict, zones: list, places: list, cell: int) -> str:
+    # The grid goes in by identity, not content: hashing its cells is as
+    # slow as drawing them. Grids come from _load_json, one object per file
+    # version and never mutated; cache entries hold a reference, so the id
+    # is not reused while the entry lives.
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{grid["width"]}x{grid["height"]}@{cell}'.encode())
+    h.update(json.dumps([zones, places], ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    return f'{id(grid):x}-{h.hexdigest()}'
+
+def base_layer(grid: dict, locs: dict, semantic: dict, cell: int = CELL) -> dict:
+    # Static part of both SVGs: background, merged walls and high cost zones
+    # ('under', both), place markers ('places', map_trajectory only, drawn
+    # above the heat map). Cached per grid object, zones and places.
+    zones = [{k: z[k] for k in ('xmin', 'ymin', 'xmax', 'ymax')} for z in semantic.get('high_cost_zones', [])]
+    places = [(p['name'], int(p['x']), int(p['y'])) for p in locs.get('places', [])]
+    fp = _fingerprint(grid, zones, places, cell)
+    with _LOCK:
+        e = _BASE.get(fp)
+        if e is not None:
+            _BASE.move_to_end(fp)
+            STATS['base_hits'] += 1
+            trace.count('svg.base_hits')
+            return e[1]
+    mask = _wall_mask(grid)
+    W = grid['width']*cell
+    H = grid['height']*cell
+    under = [f'<rect x="0" y="0" width="{W}" height="{H}" fill="#ffffff"/>']
+    rects = wall_rects(mask)
+    if rects:
+        under.append('<g fill="#333">')
+        for (x, y, ww, hh) in rects:
+            under.append(f'<rect x="{x*cell}" y="{y*cell}" width="{ww*cell}" height="{hh*cell}"/>')
+        under.append('</g>')
+    for z in zones:
         x = z['xmin']*cell
         y = z['ymin']*cell
         ww = (z['xmax']-z['xmin']+1)*cell
         hh = (z['ymax']-z['ymin']+1)*cell
-        svg.append(f'<rect x="{x}" y="{y}" width="{ww}" height="{hh}" fill="#ffcc00" opacity="0.3"/>')
+        under.append(f'<rect x="{x}" y="{y}" width="{ww}" height="{hh}" fill="#ffcc00" opacity="0.3"/>')
+    over = []
+    for name, px, py in places:
+        px *= cell
+        py *= cell
+        over.append(f'<circle cx="{px+cell/2}" cy="{py+cell/2}" r="{cell/3}" fill="#1e88e5"/>')
+        over.append(f'<text x="{px+cell/2}" y="{py+cell/2}" font-size="10" text-anchor="middle" dominant-baseline="middle" fill="#000">{name}</text>')
+    base = {'fingerprint': fp, 'width': W, 'height': H, 'walls': len(rects),
+            'under': '\n'.join(under), 'places': '\n'.join(over)}
+    with _LOCK:
+        STATS['base_misses'] += 1
+        _BASE[fp] = (grid, base)
+        while len(_BASE) > BASE_CAPACITY:
+            _BASE.popitem(last=False)
+    return base
+
+def _load_base(grid_path: Path, locations_path: Path, semantic: dict) -> dict:
+    return base_layer(_load_json(grid_path), _load_json(locations_path), semantic)
+
+def _finish(svg: list, out_svg: Path, stats: dict, t0: float) -> dict:
+    text = '\n'.join(svg)
+    out_svg.write_text(text, encoding='utf-8')
+    stats['svg_bytes'] = len(text.encode('utf-8'))
+    trace.count('io.bytes_written', stats['svg_bytes'])
+    stats['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+    return stats
+
+def draw_map_and_trajectory(grid_path: Path, locations_path: Path, trajectory: list, semantic: dict, out_svg: Path, logs: list = None, epsilon: float = 0.0):
+    # Returns simplify() stats plus svg_bytes and ms. The heat map counts the
+    # raw trajectory; the polyline uses the simplified one.
+    t0 = time.perf_counter()
+    base = _load_base(grid_path, locations_path, semantic)
+    line, stats = simplify(trajectory, epsilon)
+    cell = CELL
+    svg = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{base["width"]}" height="{base["height"]}">', base['under']]
     for ob in semantic.get('obstacles', []):
         ox = int(ob.get('x'))*cell
         oy = int(ob.get('y'))*cell
@@ -36,13 +160,10 @@ def draw_map_and_trajectory(grid_path: Path, locations_path: Path, trajectory: l
         for (x,y), c in visits.items():
             op = 0.2 + 0.6 * (c / m)
             svg.append(f'<rect x="{x*cell}" y="{y*cell}" width="{cell}" height="{cell}" fill="#4caf50" opacity="{op}"/>')
-    for p in locs.get('places', []):
-        px = int(p['x'])*cell
-        py = int(p['y'])*cell
-        svg.append(f'<circle cx="{px+cell/2}" cy="{py+cell/2}" r="{cell/3}" fill="#1e88e5"/>')
-        svg.append(f'<text x="{px+cell/2}" y="{py+cell/2}" font-size="10" text-anchor="middle" dominant-baseline="middle" fill="#000">{p["name"]}</text>')
-    if trajectory:
-        pts = ' '.join([f'{x*cell+cell/2},{y*cell+cell/2}' for (x,y) in trajectory])
+    if base['places']:
+        svg.append(base['places'])
+    if line:
+        pts = ' '.join([f'{x*cell+cell/2},{y*cell+cell/2}' for (x,y) in line])
         svg.append(f'<polyline points="{pts}" fill="none" stroke="#2e7d32" stroke-width="2"/>')
     if logs:
         for l in logs:
@@ -53,33 +174,17 @@ def draw_map_and_trajectory(grid_path: Path, locations_path: Path, trajectory: l
                 svg.append(f'<line x1="{bx-d}" y1="{by-d}" x2="{bx+d}" y2="{by+d}" stroke="#d32f2f" stroke-width="2"/>')
                 svg.append(f'<line x1="{bx-d}" y1="{by+d}" x2="{bx+d}" y2="{by-d}" stroke="#d32f2f" stroke-width="2"/>')
     svg.append('</svg>')
-    out_svg.write_text('\n'.join(svg), encoding='utf-8')
+    return _finish(svg, out_svg, stats, t0)
 
-def draw_animated_sim(grid_path: Path, locations_path: Path, trajectory: list, semantic: dict, out_svg: Path):
-    with grid_path.open('r', encoding='utf-8') as f:
-        grid = json.load(f)
-    with locations_path.open('r', encoding='utf-8') as f:
-        locs = json.load(f)
-    w = grid['width']
-    h = grid['height']
-    cell = 20
-    W = w*cell
-    H = h*cell
-    svg = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{W}" height="{H}">']
-    svg.append(f'<rect x="0" y="0" width="{W}" height="{H}" fill="#ffffff"/>')
-    g = grid['grid']
-    for y in range(h):
-        for x in range(w):
-            if g[y][x] != 0:
-                svg.append(f'<rect x="{x*cell}" y="{y*cell}" width="{cell}" height="{cell}" fill="#333"/>')
-    for z in semantic.get('high_cost_zones', []):
-        x = z['xmin']*cell
-        y = z['ymin']*cell
-        ww = (z['xmax']-z['xmin']+1)*cell
-        hh = (z['ymax']-z['ymin']+1)*cell
-        svg.append(f'<rect x="{x}" y="{y}" width="{ww}" height="{hh}" fill="#ffcc00" opacity="0.3"/>')
+def draw_animated_sim(grid_path: Path, locations_path: Path, trajectory: list, semantic: dict, out_svg: Path, epsilon: float = 0.0):
+    t0 = time.perf_counter()
+    base = _load_base(grid_path, locations_path, semantic)
+    line, stats = simplify(trajectory, epsilon)
+    cell = CELL
+    # no place markers here, as before the base layer was shared
+    svg = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{base["width"]}" height="{base["height"]}">', base['under']]
     path_cmds = []
-    for i, (x,y) in enumerate(trajectory or []):
+    for i, (x,y) in enumerate(line):
         px = x*cell + cell/2
         py = y*cell + cell/2
         if i == 0:
@@ -95,4 +200,4 @@ def draw_animated_sim(grid_path: Path, locations_path: Path, trajectory: list, s
     svg.append('</circle>')
     svg.append('</g>')
     svg.append('</svg>')
-    out_svg.write_text('\n'.join(svg), encoding='utf-8')
+    return _finish(svg, out_svg, stats, t0)
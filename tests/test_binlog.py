@@ -0,0 +1,36 @@
+import json
+from agent.core.binlog import BinaryRun, encode_run, read_run, write_run
+from agent.core.records import LogRecord, Trajectory
+
+LOGS = [
+    {'type': 'navigate', 'target': 'A', 'result': 'ok', 'pos': [3, 4], 'expanded': 12},
+    {'type': 'wait', 'duration': 2.5, 'reason': '避开 corridor'},
+    {'type': 'navigate', 'target': 'B', 'result': 'blocked', 'pos': [-1, 70000], 'repaired': True},
+    {'type': 'note', 'text': 'x', 'extra': {'k': [1, 'two', None]}},
+    {'type': 'inspect', 'target': 'B', 'extra': 7, 'expanded': 1 << 40},
+]
+
+def as_json(x):
+    return json.loads(json.dumps(x, ensure_ascii=False))
+
+def test_round_trip(tmp_path):
+    traj = [(0, 0), (1, 0), (1, 1), (2, 1)]
+    path = tmp_path / 'run.bin'
+    n = write_run(path, traj, LOGS)
+    assert n == path.stat().st_size == len(encode_run(traj, LOGS))
+    run = read_run(path)
+    assert run['trajectory'] == traj
+    assert run['logs'] == as_json(LOGS)
+
+def test_round_trip_wide_coords_and_records(tmp_path):
+    traj = Trajectory([(0, 0), (40000, 1), (40000, -5)])
+    logs = [LogRecord('navigate', target='A', result='ok', pos=(40000, 1)), LogRecord('wait', duration=5)]
+    write_run(tmp_path / 'run.bin', traj, logs)
+    with BinaryRun(tmp_path / 'run.bin') as r:
+        assert r.trajectory == traj.to_list()
+        assert r.logs == as_json([l.to_dict() for l in logs])
+        assert r.column('duration') == [None, 5]
+
+def test_empty_run(tmp_path):
+    write_run(tmp_path / 'run.bin', [], [])
+    assert read_run(tmp_path / 'run.bin') == {'trajectory': [], 'logs': []}
@@ -0,0 +1,102 @@
+import heapq
+import random
+import pytest
+from agent.core.costmap import CostMap
+from agent.core.search import GridAStar, GridJPS
+from agent.core.dstar import DStarLite
+from agent.core.hpa import GRAPHS, HierarchicalRouter
+
+def world(seed, w=36, h=28, walls=0.25):
+    rng = random.Random(seed)
+    grid = {'width': w, 'height': h, 'grid': [[1 if rng.random() < walls else 0 for _ in range(w)] for _ in range(h)]}
+    zones = []
+    for _ in range(4):
+        x0, y0 = rng.randrange(w - 6), rng.randrange(h - 6)
+        zones.append({'xmin': x0, 'xmax': x0 + rng.randint(2, 5), 'ymin': y0, 'ymax': y0 + rng.randint(2, 5), 'cost': rng.randint(1, 4)})
+    blocks = [{'x': rng.randrange(w), 'y': rng.randrange(h), 'confidence': rng.uniform(0.5, 0.95)} for _ in range(8)]
+    return CostMap(grid, {'high_cost_zones': zones, 'dynamic_blocks': blocks}), rng
+
+def dijkstra(cm, start):
+    w = cm.width
+    s = start[1] * w + start[0]
+    dist = {s: 0}
+    heap = [(0, s)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        uy, ux = divmod(u, w)
+        for nx, ny in ((ux + 1, uy), (ux - 1, uy), (ux, uy + 1), (ux, uy - 1)):
+            if cm.in_bounds(nx, ny) and cm.passable[ny * w + nx]:
+                v = ny * w + nx
+                if d + cm.step[v] < dist.get(v, d + cm.step[v] + 1):
+                    dist[v] = d + cm.step[v]
+                    heapq.heappush(heap, (dist[v], v))
+    return {divmod(i, w)[::-1]: d for i, d in dist.items()}
+
+def path_cost(cm, start, goal, path):
+    # None for no path; checks the path is a walk of passable 4-neighbours
+    if not path:
+        return None
+    assert tuple(path[0]) == tuple(start) and tuple(path[-1]) == tuple(goal)
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        assert abs(ax - bx) + abs(ay - by) == 1
+        assert cm.is_passable(bx, by)
+    return sum(cm.cost(x, y) for x, y in path[1:])
+
+def queries(cm, rng, n=25):
+    free = [(x, y) for y in range(cm.height) for x in range(cm.width) if cm.is_passable(x, y)]
+    return [(rng.choice(free), rng.choice(free)) for _ in range(n)]
+
+@pytest.mark.parametrize('seed', range(6))
+def test_astar_and_jps_match_dijkstra(seed):
+    cm, rng = world(seed)
+    for a, b in queries(cm, rng):
+        best = dijkstra(cm, a).get(b)
+        assert path_cost(cm, a, b, GridAStar(cm).search(a, b)) == best
+        assert path_cost(cm, a, b, GridJPS(cm).search(a, b)) == best
+
+@pytest.mark.parametrize('seed', range(6))
+def test_dstar_lite_matches_dijkstra_across_patches(seed):
+    cm, rng = world(seed)
+    for a, b in queries(cm, rng, 8):
+        d = DStarLite(cm, b)
+        assert path_cost(cm, a, b, d.plan(a)) == dijkstra(cm, a).get(b)
+        # block cells on the way and replan from the same start
+        path = d.plan(a)
+        for x, y in (path or [])[1:-1][::3][:3]:
+            cm.add_block({'x': x, 'y': y, 'confidence': 0.9})
+            assert path_cost(cm, a, b, d.plan(a)) == dijkstra(cm, a).get(b)
+        d.close()
+
+@pytest.mark.parametrize('seed', range(6))
+def test_hpa_finds_what_dijkstra_finds(seed):
+    # HPA* is not optimal: same reachability, never cheaper, close in cost
+    GRAPHS.clear()
+    cm, rng = world(seed)
+    h = HierarchicalRouter(cm, cluster_size=8)
+    ratios = []
+    for a, b in queries(cm, rng):
+        best = dijkstra(cm, a).get(b)
+        got = path_cost(cm, a, b, h.route(a, b))
+        assert (got is None) == (best is None)
+        if best:
+            assert got >= best
+            ratios.append(got / best)
+    assert not ratios or sum(ratios) / len(ratios) < 1.3
+
+def test_hpa_graph_reused_and_patched(tmp_path):
+    GRAPHS.clear()
+    cm, rng = world(7)
+    built = HierarchicalRouter(cm, cluster_size=8, store=tmp_path / 'hpa.json')
+    built.build()
+    GRAPHS.clear()
+    loaded = HierarchicalRouter(cm, cluster_size=8, store=tmp_path / 'hpa.json')
+    loaded.build()
+    assert loaded.rebuilt == 0 and loaded.edges == built.edges and loaded.inter == built.inter
+    x, y = next((x, y) for x, y in ((x, y) for y in range(cm.height) for x in range(cm.width)) if cm.is_passable(x, y))
+    cm.add_block({'x': x, 'y': y, 'confidence': 0.9})
+    loaded.refresh()
+    fresh = HierarchicalRouter(cm, cluster_size=8)
+    fresh.build()
+    assert fresh.edges == loaded.edges